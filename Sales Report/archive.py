@@ -0,0 +1,241 @@
+"""
+On-disk report archive that reports are streamed into as sites complete.
+
+Entries are compressed by an EntryPacker, which is small and picklable, so
+the render workers (threads or processes) can compress each report where
+it was produced, on every core, and the single archive writer only appends
+the finished bytes. Entries are written to a temporary ".part" file as soon
+as their site finishes, so memory use does not grow with the number of
+sites. When the run is over the archive is finalized and moved into place;
+if the temporary file lives in the destination folder the move is a plain
+rename.
+
+Formats (ARCHIVE_FORMATS):
+
+    zip      deflate at --compress-level 1 (fast) ... 9 (smallest), 0 stores
+    tar.gz   every entry is its own gzip member; the members concatenate to a valid .tar.gz
+    tar.xz   the same with xz streams (slowest, smallest)
+    tar.zst  the same with zstd frames (needs the zstandard package)
+
+The defaults come from $SALES_REPORT_ARCHIVE_FORMAT and
+$SALES_REPORT_COMPRESS_LEVEL, so a deployment can trade CPU for size
+without touching every entry point.
+"""
+import gzip  # Import gzip for tar.gz members
+import lzma  # Import lzma for tar.xz members
+import os  # Import os for paths and file removal
+import shutil  # Import shutil for moving the finished archive
+import struct  # Import struct for the ZIP records
+import tarfile  # Import tarfile for tar headers
+import tempfile  # Import tempfile for the spool file
+import threading  # Import threading for the write lock
+import time  # Import time for entry timestamps
+import zlib  # Import zlib for deflate and CRC-32
+
+ARCHIVE_FORMATS = {"zip": ".zip", "tar.gz": ".tar.gz", "tar.xz": ".tar.xz", "tar.zst": ".tar.zst"}  # Format -> extension
+LEVELS = {"zip": (0, 9, 6), "tar.gz": (1, 9, 6), "tar.xz": (0, 9, 6), "tar.zst": (1, 22, 3)}  # (min, max, default)
+DEFAULT_FORMAT = os.environ.get("SALES_REPORT_ARCHIVE_FORMAT") or "zip"  # Format used when none is given
+LEVEL_ENV = "SALES_REPORT_COMPRESS_LEVEL"  # Default compression level, read when a packer is created
+TAR_RECORD = 10240  # tar archives are padded to a multiple of this
+
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")  # Local file header
+_CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")  # Central directory file header
+_END_RECORD = struct.Struct("<4s4H2LH")  # End of central directory record
+_ZIP64_END_RECORD = struct.Struct("<4sQ2H2L4Q")  # ZIP64 end of central directory record
+_ZIP64_LOCATOR = struct.Struct("<4sLQL")  # ZIP64 end of central directory locator
+
+
+def unique_path(folder, base_filename, extension):
+    """Return folder/base_filename+extension, adding 1, 2, ... if the file exists."""
+    file_path = os.path.join(folder, base_filename + extension)  # Get the file path
+    counter = 1  # Initialize the counter
+    while os.path.exists(file_path):
+        file_path = os.path.join(folder, f"{base_filename}{counter}{extension}")  # Append the counter to the file name
+        counter += 1  # Increment the counter
+    return file_path
+
+
+def _dos_datetime(timestamp):
+    t = time.localtime(timestamp)
+    return ((t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+            ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday)
+
+
+class EntryPacker:
+    """
+    Compresses one entry for an archive format. Picklable, so it can be sent
+    to render processes; pack() is safe to call from many threads at once
+    (zlib, lzma and zstandard release the GIL while they compress).
+    """
+
+    def __init__(self, fmt=None, level=None):
+        self.fmt = fmt or DEFAULT_FORMAT
+        if self.fmt not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unknown archive format '{self.fmt}'; expected {', '.join(ARCHIVE_FORMATS)}.")
+        low, high, default = LEVELS[self.fmt]
+        if level is None:
+            level = _env_level()
+        if level is None:
+            level = default
+        self.level = level  # Compression level (see LEVELS)
+        if not low <= self.level <= high:
+            raise ValueError(f"Compression level for {self.fmt} must be {low}..{high}, not {self.level}.")
+        if self.fmt == "tar.zst":
+            _zstd_compressor(self.level)  # Fail up front when zstandard is missing
+
+    @property
+    def extension(self):
+        return ARCHIVE_FORMATS[self.fmt]
+
+    def pack(self, name, text):
+        """Return the packed entry for name: a tuple only ReportArchive.add_packed needs to understand."""
+        data = text.encode("utf-8") if isinstance(text, str) else text
+        mtime = time.time()
+        if self.fmt == "zip":
+            if self.level == 0:
+                return ("zip", name, data, zlib.crc32(data), len(data), mtime, 0)  # Stored
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)  # Raw deflate, as ZIP expects
+            body = compressor.compress(data) + compressor.flush()
+            return ("zip", name, body, zlib.crc32(data), len(data), mtime, 8)
+        info = tarfile.TarInfo(name)
+        info.size, info.mtime, info.mode = len(data), int(mtime), 0o644
+        member = info.tobuf(tarfile.PAX_FORMAT) + data + b"\0" * (-len(data) % tarfile.BLOCKSIZE)
+        return ("tar", name, self.compress(member), len(member))
+
+    def compress(self, raw):
+        """Compress raw tar bytes as one self-contained gzip member / xz stream / zstd frame."""
+        if self.fmt == "tar.gz":
+            return gzip.compress(raw, compresslevel=self.level, mtime=0)
+        if self.fmt == "tar.xz":
+            return lzma.compress(raw, preset=self.level)
+        return _zstd_compressor(self.level).compress(raw)
+
+
+def _env_level():
+    """$SALES_REPORT_COMPRESS_LEVEL as an int, or None when unset. Raises ValueError for anything else."""
+    value = os.environ.get(LEVEL_ENV, "").strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"${LEVEL_ENV} must be an integer compression level, not '{value}'.") from None
+
+
+def _zstd_compressor(level):
+    try:
+        import zstandard  # Optional: only tar.zst needs it
+    except ImportError:
+        raise ValueError("The tar.zst format needs the zstandard package (pip install zstandard).") from None
+    return zstandard.ZstdCompressor(level=level)
+
+
+class ReportArchive:
+    """
+    Thread-safe archive writer backed by a temporary file.
+
+    directory is where the temporary file is created; put it on the same
+    filesystem as the final destination so move_to() is a rename. fmt and
+    level select the format and compression level (see ARCHIVE_FORMATS).
+    """
+
+    def __init__(self, directory=None, fmt=None, level=None):
+        self.packer = EntryPacker(fmt, level)  # Hand this to the render workers
+        if directory:
+            os.makedirs(directory, exist_ok=True)  # Create the folder if needed
+        fd, self.path = tempfile.mkstemp(prefix=".SiteReports-", suffix=self.extension + ".part", dir=directory)  # Spool file
+        self._file = os.fdopen(fd, "wb")
+        self._lock = threading.Lock()  # Serializes writes
+        self._central = []  # ZIP: central directory records, written by close()
+        self._raw_size = 0  # tar: uncompressed bytes so far, for the end padding
+        self.count = 0  # Entries written so far
+
+    @property
+    def extension(self):
+        return self.packer.extension
+
+    def add(self, name, text):
+        """Compress and append one entry on the calling thread."""
+        self.add_packed(self.packer.pack(name, text))
+
+    def add_packed(self, entry):
+        """Append an entry already compressed by self.packer.pack() (possibly in another process)."""
+        with self._lock:
+            if self._file is None:
+                raise ValueError("The archive is closed.")
+            if entry[0] == "zip":
+                self._write_zip_entry(*entry[1:])
+            else:
+                _, _, member, raw_size = entry
+                self._file.write(member)
+                self._raw_size += raw_size
+            self.count += 1
+
+    def _write_zip_entry(self, name, body, crc, size, mtime, method):
+        offset = self._file.tell()
+        encoded = name.encode("utf-8")
+        flags = 0 if encoded.isascii() else 0x800  # UTF-8 names
+        dos_time, dos_date = _dos_datetime(mtime)
+        self._file.write(_LOCAL_HEADER.pack(b"PK\x03\x04", 20, flags, method, dos_time, dos_date,
+                                            crc, len(body), size, len(encoded), 0))
+        self._file.write(encoded)
+        self._file.write(body)
+        extra = b""
+        if offset >= 0xFFFFFFFF:
+            extra = struct.pack("<2HQ", 1, 8, offset)  # ZIP64 extra field with the real offset
+        self._central.append(_CENTRAL_HEADER.pack(
+            b"PK\x01\x02", (3 << 8) | 45, 45 if extra else 20, flags, method, dos_time, dos_date,
+            crc, len(body), size, len(encoded), len(extra), 0, 0, 0,
+            0o644 << 16, min(offset, 0xFFFFFFFF)) + encoded + extra)
+
+    def _finish_zip(self):
+        start = self._file.tell()
+        for record in self._central:
+            self._file.write(record)
+        size = self._file.tell() - start
+        count = len(self._central)
+        if count >= 0xFFFF or start >= 0xFFFFFFFF or size >= 0xFFFFFFFF:
+            zip64_end = self._file.tell()  # More entries or bytes than the classic record can hold
+            self._file.write(_ZIP64_END_RECORD.pack(b"PK\x06\x06", _ZIP64_END_RECORD.size - 12, 45, 45, 0, 0,
+                                                    count, count, size, start))
+            self._file.write(_ZIP64_LOCATOR.pack(b"PK\x06\x07", 0, zip64_end, 1))
+        self._file.write(_END_RECORD.pack(b"PK\x05\x06", 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+                                          min(size, 0xFFFFFFFF), min(start, 0xFFFFFFFF), 0))
+        self._central = []
+
+    def _finish_tar(self):
+        end = b"\0" * (2 * tarfile.BLOCKSIZE)  # End-of-archive marker
+        end += b"\0" * (-(self._raw_size + len(end)) % TAR_RECORD)  # Pad to a whole record like tar does
+        self._file.write(self.packer.compress(end))
+
+    def close(self):
+        """Write the ZIP central directory or the tar end marker. Further add() calls are not allowed."""
+        with self._lock:
+            if self._file is not None:
+                try:
+                    if self.packer.fmt == "zip":
+                        self._finish_zip()
+                    else:
+                        self._finish_tar()
+                finally:
+                    self._file.close()
+                    self._file = None
+
+    def move_to(self, destination):
+        """Finalize the archive and move it to destination. Returns the final path."""
+        self.close()
+        umask = os.umask(0)  # mkstemp creates the file private; give it normal permissions
+        os.umask(umask)
+        os.chmod(self.path, 0o666 & ~umask)
+        final_path = shutil.move(self.path, destination)  # A rename when on the same filesystem
+        self.path = None
+        return final_path
+
+    def discard(self):
+        """Close and delete the temporary file."""
+        try:
+            self.close()
+        finally:
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+            self.path = None
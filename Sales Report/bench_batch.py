@@ -0,0 +1,121 @@
+"""
+End-to-end throughput benchmark against simulated store servers.
+
+Runs engine.run_batch (connect -> query -> render/compress -> on-disk archive) with
+fakeodbc installed as pyodbc, for several batch sizes, and prints sites/sec,
+per-site latency percentiles, peak traced memory and the simulated failure
+counts. Needs no database or network:
+
+    python bench_batch.py --sizes 10,100,1000,5000 --connect-ms 40 --query-ms 250
+    python bench_batch.py --sizes 1000 --transient-rate 0.02 --down-rate 0.01 --json results.json
+    python bench_batch.py --sizes 1000 --archive-format tar.xz --compress-level 9
+"""
+import argparse  # Import argparse for command-line options
+import json  # Import json for the optional results file
+import math  # Import math for the percentile rank
+import os  # Import os for the temporary output folder
+import tempfile  # Import tempfile for the scratch folder
+import time  # Import time for the wall clock
+import tracemalloc  # Import tracemalloc for peak memory
+
+import fakeodbc  # Import the simulated pyodbc backend (installed before engine is imported)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))]
+
+
+def run_size(engine, size, args, scratch):
+    """Run one batch of size sites and return its result row."""
+    from archive import ReportArchive  # Imported after fakeodbc.install()
+    from metrics import RunMetrics
+    import reachability
+
+    engine.POOL.close_all()  # Every size starts with cold connections
+    reachability.UNREACHABLE.clear()
+    fakeodbc.reset_stats()
+    site_ids = [str(10000 + i) for i in range(size)]  # Hosts 10.16.100.0 ... 10.16.149.99
+    archive = ReportArchive(scratch, args.archive_format, args.compress_level)
+    run_metrics = RunMetrics()
+    if args.trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        successful, failed = engine.run_batch(site_ids, "2024-05-01", "2024-05-31", "bench", "bench", "AXDB",
+                                              args.ip_series, max_workers=args.workers, result_cache=None,
+                                              archive=archive, run_metrics=run_metrics,
+                                              render_processes=args.render_processes)
+        wall = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if args.trace_memory else 0
+        archive.close()
+        archive_bytes = os.path.getsize(archive.path)
+    finally:
+        if args.trace_memory:
+            tracemalloc.stop()
+        archive.discard()
+    latencies = sorted(site.seconds for site in run_metrics.sites.values())
+    return {
+        "sites": size, "ok": len(successful), "failed": len(failed), "retries": run_metrics.retries,
+        "wall_seconds": round(wall, 3), "sites_per_second": round(size / wall, 1),
+        "p50": round(percentile(latencies, 0.50), 4), "p95": round(percentile(latencies, 0.95), 4),
+        "p99": round(percentile(latencies, 0.99), 4), "max": round(latencies[-1] if latencies else 0.0, 4),
+        "peak_mb": round(peak / 1e6, 1), "archive_mb": round(archive_bytes / 1e6, 2),
+        "compress_seconds": round(sum(site.stages.get("compress", 0.0) for site in run_metrics.sites.values()), 3),
+        "connects": fakeodbc.STATS["connect"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000,5000", help="Comma-separated batch sizes (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=10, help="Starting concurrency (default: %(default)s)")
+    parser.add_argument("--render-processes", type=int, default=0,
+                        help="Worker processes for the render stage; 0 renders on one thread (default: %(default)s)")
+    parser.add_argument("--archive-format", default="zip", choices=["zip", "tar.gz", "tar.xz", "tar.zst"],
+                        help="Archive format to write (default: %(default)s)")
+    parser.add_argument("--compress-level", type=int, help="Compression level (default: the format's default)")
+    parser.add_argument("--ip-series", default="16", choices=["16", "28", "auto"], help="Server series (default: %(default)s)")
+    parser.add_argument("--connect-ms", type=float, default=30.0, help="Mean login latency (default: %(default)s)")
+    parser.add_argument("--query-ms", type=float, default=150.0, help="Mean report query latency (default: %(default)s)")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Latency spread as a fraction of the mean (default: %(default)s)")
+    parser.add_argument("--login-failure-rate", type=float, default=0.0, help="Chance a login times out (default: %(default)s)")
+    parser.add_argument("--transient-rate", type=float, default=0.0, help="Chance a query hits 08S01 (default: %(default)s)")
+    parser.add_argument("--down-rate", type=float, default=0.0, help="Fraction of unreachable hosts (default: %(default)s)")
+    parser.add_argument("--partners", type=int, default=200, help="Maximum partner rows per site (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed (default: %(default)s)")
+    parser.add_argument("--no-trace-memory", dest="trace_memory", action="store_false",
+                        help="Skip tracemalloc (it slows the run down somewhat)")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    fakeodbc.install(fakeodbc.FakeConfig(connect_ms=args.connect_ms, query_ms=args.query_ms, jitter=args.jitter,
+                                         login_failure_rate=args.login_failure_rate, transient_rate=args.transient_rate,
+                                         down_rate=args.down_rate, partners=args.partners, seed=args.seed))
+    import hostmap  # Imported after fakeodbc.install()
+    import reachability
+    reachability.probe = fakeodbc.probe  # No sockets: dead hosts come from --down-rate
+    scratch = tempfile.mkdtemp(prefix="sales-report-bench-")
+    hostmap.HOST_MAP.path = os.path.join(scratch, "site_hosts.json")  # Keep the user's host map untouched
+    import engine
+
+    results = []
+    print(f"{'sites':>6} {'ok':>6} {'failed':>6} {'retries':>7} {'wall s':>8} {'sites/s':>8} "
+          f"{'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'max s':>7} {'peak MB':>8} {'arch MB':>8} {'comp s':>7}")
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        row = run_size(engine, size, args, scratch)
+        results.append(row)
+        print(f"{row['sites']:>6} {row['ok']:>6} {row['failed']:>6} {row['retries']:>7} {row['wall_seconds']:>8.2f} "
+              f"{row['sites_per_second']:>8.1f} {row['p50']:>7.3f} {row['p95']:>7.3f} {row['p99']:>7.3f} "
+              f"{row['max']:>7.3f} {row['peak_mb']:>8.1f} {row['archive_mb']:>8.2f} {row['compress_seconds']:>7.2f}",
+              flush=True)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
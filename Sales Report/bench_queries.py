@@ -0,0 +1,179 @@
+"""
+Offline A/B harness for the report query variants (queries.VARIANTS).
+
+Seeds a local SQLite database that stands in for a store's AX tables
+(transactions, payments with IP collection receipts, tender types,
+HealingCard and OMS settlements), runs every variant for both profiles in
+range and daily form, checks that each returns exactly the rows of the
+default variant and prints the timings. Needs no store server.
+
+    python bench_queries.py --days 60 --receipts 1500 --repeat 5
+
+SQLite is only a stand-in: the SQL is translated to its dialect first (see
+to_sqlite) and its planner is not SQL Server's, so the timings show how the
+formulations compare, not what a store will take. Row equality is the part
+that must hold before a variant is enabled for real sites in
+query_variants.json (see queryconfig.py).
+"""
+import argparse  # Import argparse for command-line options
+import random  # Import random for the seed data
+import re  # Import re for the dialect translation
+import sqlite3  # Import sqlite3 for the stand-in database
+import statistics  # Import statistics for the median timing
+import time  # Import time for timing
+from datetime import date, datetime, timedelta  # Import date helpers for the seed data
+
+from bench_render import BILLTYPES  # Import the synthetic bill types
+from queries import DEFAULT_VARIANT, PROFILES, VARIANTS, build_report_query, report_params  # Import the variants
+
+_SCHEMA = """
+create table ax.retailtransactiontable (TRANSACTIONID integer, RECEIPTID text, ENTRYSTATUS integer,
+    ACXTRANSTYPE integer, BUSINESSDATE text, ACXCORPCODE text, ACXCREDIT integer, GROSSAMOUNT real,
+    DISCAMOUNT real, ACXLOYALTY real);
+create table ax.RETAILTRANSACTIONPAYMENTTRANS (TRANSACTIONID integer, RECEIPTID text, TENDERTYPE integer,
+    AMOUNTTENDERED real, TRANSACTIONSTATUS integer, BUSINESSDATE text);
+create table ax.ACXSETTLEMENTDETAILS (SETTLEMENTDATE text, COLLECTEDAMT real);
+create table RETAILTENDERTYPETABLE (TENDERTYPEID integer, NAME text);
+create table HEALING_CARD_TRANSACTION (ACTIONID integer, TRANSACTIONDATE text, PAYMENTCODE text,
+    PAYMENTTYPE text, TRANSAMT real);
+"""
+_INDEXES = """
+create index ax.rt_date on retailtransactiontable (BUSINESSDATE);
+create index ax.rt_receipt on retailtransactiontable (TRANSACTIONID, RECEIPTID);
+create index ax.rpt_date on RETAILTRANSACTIONPAYMENTTRANS (BUSINESSDATE);
+create index ax.rpt_receipt on RETAILTRANSACTIONPAYMENTTRANS (RECEIPTID);
+create index ax.settlement_date on ACXSETTLEMENTDETAILS (SETTLEMENTDATE);
+create index hc_date on HEALING_CARD_TRANSACTION (TRANSACTIONDATE);
+"""  # Roughly the indexes an AX store database has on these columns
+
+
+def to_sqlite(sql):
+    """
+    Translate the report's T-SQL into SQLite: alias = expr select items,
+    cast(... as date), dateadd, isnull, + string concatenation, the ax
+    function prefix and DECLAREd @from/@to (which become :d_from/:d_to).
+    Only covers the constructs the report query uses.
+    """
+    sql = re.sub(r"DECLARE @from date = \?, @to date = \?;", "", sql)
+    sql = sql.replace("@from", ":d_from").replace("@to", ":d_to")
+    sql = re.sub(r"\b(ISHEADER|ACXCORPCODE) = (CASE .*? END|-?\d+),", r"\2 AS \1,", sql)
+    sql = re.sub(r"cast\(([^()]*?) as date\)", r"date(\1)", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"dateadd\(day, 1, (date\([^()]*\))\)", r"date(\1, '+1 day')", sql)
+    sql = re.sub(r"\bisnull\(", "ifnull(", sql, flags=re.IGNORECASE)
+    sql = sql.replace("' + ", "' || ").replace("ax.getcorporatename(", "getcorporatename(")
+    return sql
+
+
+def seed(conn, start, days, receipts, rnd, indexes=True):
+    """Create the stand-in tables and fill them with `receipts` transactions per day for `days` days."""
+    conn.execute("attach database ':memory:' as ax")  # The ax schema of the store database
+    conn.executescript(_SCHEMA)
+    conn.create_function("getcorporatename", 1, lambda code: f"CORPORATE {code}", deterministic=True)
+    tender_ids = {name: index for index, name in enumerate(BILLTYPES, start=1)}
+    conn.executemany("insert into RETAILTENDERTYPETABLE values (?, ?)", [(i, name) for name, i in tender_ids.items()])
+    corp_codes = ["0", "172"] + [str(100 + i) for i in range(60)]
+    transactions, payments, healing, settlements = [], [], [], []
+    transaction_id = 0
+    for day in range(days):
+        business_date = (start + timedelta(days=day)).isoformat()
+        for _ in range(receipts):
+            transaction_id += 1
+            is_ip = rnd.random() < 0.03  # IP collection receipts are excluded from the billtype sales
+            receipt = f"{'IP' if is_ip else 'RC'}{transaction_id:08d}"
+            trans_type = 1 if rnd.random() < 0.05 else 0  # Returns
+            gross = rnd.randint(100, 500000) / 100
+            discount = rnd.randint(0, 2000) / 100
+            transactions.append((transaction_id, receipt, 0 if rnd.random() < 0.98 else 1, trans_type, business_date,
+                                 rnd.choice(corp_codes), rnd.randint(0, 1), -gross if trans_type == 0 else gross,
+                                 discount, rnd.randint(0, 300) / 100))
+            split = rnd.random() < 0.2  # Some receipts are paid with two tenders
+            for part in ((gross / 2, gross - gross / 2) if split else (gross,)):
+                tender = rnd.randint(1, 2) if is_ip else rnd.choice(list(tender_ids.values()))
+                payments.append((transaction_id, receipt, tender, part if trans_type == 0 else -part,
+                                 0 if rnd.random() < 0.99 else 1, business_date))
+        for _ in range(max(1, receipts // 50)):
+            stamp = datetime.fromisoformat(business_date) + timedelta(seconds=rnd.randint(0, 86399))
+            healing.append((rnd.choice((0, 1, 2)), stamp.isoformat(sep=" "), rnd.choice(("1", "2")),
+                            rnd.choice(("CASH", "CARD")), rnd.randint(100, 50000) / 100))
+            settlements.append((stamp.isoformat(sep=" "), rnd.randint(100, 90000) / 100))
+    conn.executemany("insert into ax.retailtransactiontable values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", transactions)
+    conn.executemany("insert into ax.RETAILTRANSACTIONPAYMENTTRANS values (?, ?, ?, ?, ?, ?)", payments)
+    conn.executemany("insert into HEALING_CARD_TRANSACTION values (?, ?, ?, ?, ?)", healing)
+    conn.executemany("insert into ax.ACXSETTLEMENTDETAILS values (?, ?)", settlements)
+    if indexes:
+        conn.executescript(_INDEXES)
+    conn.execute("analyze")  # Give the planner statistics, like a maintained store database
+    return len(transactions), len(payments)
+
+
+def _normalize(rows):
+    """Rows as sorted tuples with money rounded to cents, so summation order does not matter."""
+    return sorted((tuple(round(v, 2) if isinstance(v, float) else v for v in row) for row in rows), key=repr)
+
+
+def run_variant(conn, variant, sections, daily, from_date, to_date, repeat):
+    """Run one variant `repeat` times; return (normalized rows, [seconds per run])."""
+    query = build_report_query(sections, daily=daily, variant=variant)
+    sql = to_sqlite(query)
+    if VARIANTS[variant].declare_dates:
+        params = {"d_from": from_date, "d_to": to_date}  # Bound once, like the DECLARE
+    else:
+        params = report_params(from_date, to_date, sections, variant)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = conn.execute(sql, params).fetchall()
+        timings.append(time.perf_counter() - start)
+    return _normalize(rows), timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=60, help="Business days of seeded data (default: %(default)s)")
+    parser.add_argument("--receipts", type=int, default=1500, help="Transactions per day (default: %(default)s)")
+    parser.add_argument("--range-days", type=int, default=31,
+                        help="Days in the report range, ending on the last seeded day (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per variant (default: %(default)s)")
+    parser.add_argument("--no-indexes", action="store_true", help="Seed the tables without indexes")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    start = date(2024, 4, 1)
+    conn = sqlite3.connect(":memory:")
+    began = time.perf_counter()
+    n_transactions, n_payments = seed(conn, start, args.days, args.receipts, random.Random(args.seed),
+                                      indexes=not args.no_indexes)
+    to_date = start + timedelta(days=args.days - 1)
+    from_date = to_date - timedelta(days=args.range_days - 1)
+    print(f"seeded {n_transactions} transactions, {n_payments} payments in {time.perf_counter() - began:.1f}s; "
+          f"range {from_date} .. {to_date}")
+
+    mismatches = 0
+    variants = [DEFAULT_VARIANT] + [name for name in VARIANTS if name != DEFAULT_VARIANT]  # Reference first
+    for profile in sorted(PROFILES):
+        for daily in (False, True):
+            print(f"\n{profile} profile, {'daily' if daily else 'range'} query")
+            reference = None
+            for variant in variants:
+                rows, timings = run_variant(conn, variant, PROFILES[profile], daily, from_date.isoformat(),
+                                            to_date.isoformat(), args.repeat)
+                if reference is None:
+                    reference, baseline = rows, statistics.median(timings)
+                    verdict = f"reference, {len(rows)} rows"
+                elif rows == reference:
+                    verdict = "identical"
+                else:
+                    mismatches += 1
+                    verdict = f"MISMATCH ({len(rows)} rows vs {len(reference)})"
+                median = statistics.median(timings)
+                params = len(report_params(from_date, to_date, PROFILES[profile], variant))
+                print(f"  {variant:<10} {median * 1000:9.1f} ms median  {min(timings) * 1000:9.1f} ms best  "
+                      f"x{baseline / median:5.2f}  {params:2d} params  {verdict}")
+    for name in variants:
+        print(f"\n{name}: {VARIANTS[name].description}", end="")
+    print("\n\n" + ("all variants return identical rows" if not mismatches else f"{mismatches} MISMATCHES"))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
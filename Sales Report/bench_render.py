@@ -0,0 +1,77 @@
+"""
+Microbenchmark: report.format_report vs renderer.ReportRenderer (per site and batched).
+
+Builds synthetic query results (several BILLTYPEs, many partner rows),
+checks that both implementations produce byte-identical text and prints the
+time each takes. Needs no database.
+
+    python bench_render.py --sites 2000 --partners 300
+"""
+import argparse  # Import argparse for command-line options
+import random  # Import random for synthetic data
+import time  # Import time for timing
+from datetime import datetime  # Import datetime for a fixed header timestamp
+from decimal import Decimal  # Import Decimal to mimic pyodbc numeric columns
+
+from renderer import ReportRenderer  # Import the precompiled renderer
+from report import format_report  # Import the reference formatter
+
+BILLTYPES = ["CASH", "CARD", "CREDIT", "UPI", "WALLET", "GIFT", "CHEQUE", "HEALING CARD"]  # Synthetic bill types
+
+
+def _money(rnd, low, high):
+    return Decimal(rnd.randint(low * 100, high * 100)) / 100
+
+
+def synthetic_result(rnd, partners):
+    """Return rows shaped like REPORT_QUERY output."""
+    rows = []
+    for billtype in BILLTYPES:
+        rows.append((3 if billtype == "GIFT" else 1, -1, billtype,
+                     _money(rnd, 0, 500000), _money(rnd, 0, 5000), -_money(rnd, 0, 20000), -_money(rnd, 0, 500),
+                     rnd.randint(0, 3000), rnd.randint(0, 100)))
+    for i in range(partners):
+        rows.append((0, str(100 + i), f"PARTNER {i:04d} {'X' * rnd.randint(0, 40)}",
+                     _money(rnd, -1000, 90000), 0, 0, 0, rnd.randint(0, 400), 0))
+    rows.append((2, "1", "HEALINGCARD-CASH", _money(rnd, 0, 900), 0, 0, 0, 0, 0))
+    rows.append((4, 0, "OMS CASH COLLECTION", _money(rnd, 0, 900), 0, 0, 0, 0, 0))
+    rnd.shuffle(rows)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sites", type=int, default=1000, help="Reports to render (default: %(default)s)")
+    parser.add_argument("--partners", type=int, default=200, help="Partner rows per site (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    rnd = random.Random(args.seed)
+    now = datetime(2024, 5, 31, 9, 30)  # Fixed so both outputs carry the same header
+    batch = [(synthetic_result(rnd, rnd.randint(0, args.partners)), f"{13100 + i}", f"STORE {i}",
+              "2024-05-01", "2024-05-31") for i in range(args.sites)]
+
+    start = time.perf_counter()
+    expected = [format_report(result, sid, name, f, t, now=now) for result, sid, name, f, t in batch]
+    baseline = time.perf_counter() - start
+
+    renderer = ReportRenderer()
+    start = time.perf_counter()
+    single = [renderer.render(result, sid, name, f, t, now=now) for result, sid, name, f, t in batch]
+    per_site = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = renderer.render_many(batch, now=now)
+    many = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b, c in zip(expected, single, batched) if not a == b == c)
+    print(f"sites={args.sites} partners<= {args.partners}")
+    print(f"format_report               {baseline:8.3f}s  {args.sites / baseline:10.0f} reports/s")
+    print(f"ReportRenderer.render       {per_site:8.3f}s  {args.sites / per_site:10.0f} reports/s  x{baseline / per_site:.2f}")
+    print(f"ReportRenderer.render_many  {many:8.3f}s  {args.sites / many:10.0f} reports/s  x{baseline / many:.2f}")
+    print("output identical" if not mismatches else f"MISMATCH in {mismatches} reports")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,192 @@
+"""
+On-disk checkpoints for batch runs.
+
+Every run gets a folder under the runs directory named after its run ID:
+
+    manifest.json   run parameters and the full site list (never the password)
+    reports/        one <site>.txt per completed site (plus <site>_<date>.txt in
+                    daily mode), written atomically
+    state.jsonl     append-only log of site outcomes; the last line per site wins
+
+If a run is interrupted, resuming it only processes the sites that have no
+report yet. "Retry failed" re-queues just the sites whose last outcome was
+a failure. Either way the final ZIP is assembled from every report in the
+checkpoint, so earlier successes are not fetched from the stores again.
+
+Checkpoints hold a full copy of every report, so they do not live forever:
+creating a run deletes runs with no activity for KEEP_DAYS days, and the
+desktop app deletes a run as soon as it finishes without failures.
+"""
+import json  # Import json for the manifest and state log
+import os  # Import os for paths and atomic replace
+import shutil  # Import shutil to delete old runs
+import threading  # Import threading for the state log lock
+import time  # Import time for run ages
+from datetime import datetime  # Import datetime for run IDs and timestamps
+
+DEFAULT_DIR = os.environ.get("SALES_REPORT_RUNS_DIR") or os.path.join(
+    os.path.expanduser("~"), ".sales_report", "runs")  # Default location of run checkpoints
+PARAMETERS = ("from_date", "to_date", "username", "database", "ip_series_choice", "custom_ip", "daily",
+              "profile")  # Saved run parameters
+KEEP_DAYS = 7  # Runs untouched for this many days are deleted when a new run is created
+
+
+class RunCheckpoint:
+    """Thread-safe checkpoint of one run. Use create() or open() to get one."""
+
+    def __init__(self, run_id, root=DEFAULT_DIR):
+        self.run_id = run_id  # Folder name under root
+        self.path = os.path.join(root, run_id)  # Run folder
+        self._reports = os.path.join(self.path, "reports")  # Completed reports
+        self._state_path = os.path.join(self.path, "state.jsonl")  # Outcome log
+        self._lock = threading.Lock()  # Serializes state log appends
+        with open(os.path.join(self.path, "manifest.json"), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)  # Run parameters and site list
+
+    @classmethod
+    def create(cls, site_ids, root=DEFAULT_DIR, **parameters):
+        """Start a new checkpointed run for site_ids with the given PARAMETERS. Deletes expired runs first."""
+        prune_runs(root)  # Keep the runs folder from growing without limit
+        run_id = datetime.now().strftime("%Y%m%d-%H%M%S")  # Sortable run ID
+        suffix = 1
+        while os.path.exists(os.path.join(root, run_id)):
+            run_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{suffix}"  # Two runs in the same second
+            suffix += 1
+        path = os.path.join(root, run_id)
+        os.makedirs(os.path.join(path, "reports"))  # Create the run folder
+        manifest = {name: parameters.get(name) for name in PARAMETERS}
+        manifest.update(run_id=run_id, created=datetime.now().isoformat(timespec="seconds"), site_ids=list(site_ids))
+        _write_atomic(os.path.join(path, "manifest.json"), json.dumps(manifest, indent=1))
+        return cls(run_id, root)
+
+    @classmethod
+    def open(cls, run_id, root=DEFAULT_DIR):
+        """Open an existing run. Raises FileNotFoundError for an unknown run ID."""
+        if not os.path.isfile(os.path.join(root, run_id, "manifest.json")):
+            raise FileNotFoundError(f"No checkpointed run '{run_id}' in {root}.")
+        return cls(run_id, root)
+
+    @staticmethod
+    def latest(root=DEFAULT_DIR):
+        """Return the ID of the most recent run in root, or None."""
+        try:
+            runs = sorted(name for name in os.listdir(root) if os.path.isfile(os.path.join(root, name, "manifest.json")))
+        except OSError:
+            return None
+        return runs[-1] if runs else None
+
+    def delete(self):
+        """Remove the run's folder and every report in it."""
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    @property
+    def site_ids(self):
+        return self.manifest["site_ids"]
+
+    def parameters(self):
+        """Return the saved run parameters as a dict (see PARAMETERS)."""
+        return {name: self.manifest.get(name) for name in PARAMETERS}
+
+    def record_success(self, site_id, report_text):
+        """
+        Store a completed report, then log it as done. report_text may also be
+        {entry_name: text} (daily mode); <site>.txt is written last.
+        """
+        if isinstance(report_text, dict):
+            for entry_name, text in report_text.items():
+                if entry_name != f"{site_id}.txt":
+                    _write_atomic(os.path.join(self._reports, entry_name), text)  # Per-day reports first
+            report_text = report_text[f"{site_id}.txt"]
+        _write_atomic(self._report_path(site_id), report_text)  # The report exists before the log says so
+        self._append({"site": site_id, "status": "ok"})
+
+    def record_failure(self, site_id, error):
+        """Log a failed site."""
+        self._append({"site": site_id, "status": "failed", "error": str(error)})
+
+    def _append(self, entry):
+        entry["at"] = datetime.now().isoformat(timespec="seconds")
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            with open(self._state_path, "a", encoding="utf-8") as f:
+                f.write(line)  # One line per outcome; a torn last line is ignored when reading
+
+    def _report_path(self, site_id):
+        return os.path.join(self._reports, f"{site_id}.txt")
+
+    def outcomes(self):
+        """Return {site_id: (status, error)} from the state log; the last entry per site wins."""
+        outcomes = {}
+        try:
+            with open(self._state_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # Partial line from an interrupted write
+                    outcomes[entry["site"]] = (entry["status"], entry.get("error"))
+        except FileNotFoundError:
+            pass
+        return outcomes
+
+    def completed(self):
+        """Site IDs whose report is in the checkpoint."""
+        return {sid for sid, (status, _) in self.outcomes().items()
+                if status == "ok" and os.path.exists(self._report_path(sid))}
+
+    def failed(self):
+        """{site_id: error} for sites whose last outcome was a failure."""
+        return {sid: error for sid, (status, error) in self.outcomes().items() if status == "failed"}
+
+    def pending(self):
+        """Site IDs of the run that have no report yet, in the original order."""
+        done = self.completed()
+        return [sid for sid in self.site_ids if sid not in done]
+
+    def copy_reports_to(self, archive, skip=()):
+        """Add every checkpointed report (except the sites in skip) to archive. Returns the site count."""
+        skip = set(skip)
+        done = self.completed()
+        extra = {}  # site_id -> per-day entry names
+        for name in sorted(os.listdir(self._reports)):
+            sid, sep, _ = name.partition("_")
+            if sep and name.endswith(".txt"):
+                extra.setdefault(sid, []).append(name)
+        count = 0
+        for sid in self.site_ids:
+            if sid in skip or sid not in done:
+                continue
+            for entry_name in [f"{sid}.txt"] + extra.get(sid, []):
+                with open(os.path.join(self._reports, entry_name), "r", encoding="utf-8") as f:
+                    archive.add(entry_name, f.read())
+            count += 1
+        return count
+
+
+def prune_runs(root=DEFAULT_DIR, keep_days=KEEP_DAYS, now=None):
+    """
+    Delete runs in root whose manifest and state log were last written more
+    than keep_days days ago. Returns the deleted run IDs.
+    """
+    now = now or time.time()
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return []
+    deleted = []
+    for name in sorted(names):
+        path = os.path.join(root, name)
+        stamps = [os.path.getmtime(os.path.join(path, f)) for f in ("manifest.json", "state.jsonl")
+                  if os.path.isfile(os.path.join(path, f))]
+        if stamps and now - max(stamps) > keep_days * 86400:
+            shutil.rmtree(path, ignore_errors=True)
+            deleted.append(name)
+    return deleted
+
+
+def _write_atomic(path, text):
+    """Write text to path via a temporary file so a crash never leaves a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)  # Atomically swap it in
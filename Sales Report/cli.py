@@ -0,0 +1,269 @@
+"""
+Command-line entry point for the Sales Summary Report engine.
+
+Example:
+    python cli.py --username sa --password secret --database AXDB \
+        --sites 13100,13101 --from-date 2024-05-01 --to-date 2024-05-31 \
+        --output SiteReports.zip
+
+Checkpointed runs can be resumed or have only their failed sites retried:
+    python cli.py ... --checkpoint
+    python cli.py --password secret --resume latest --output SiteReports.zip
+    python cli.py --password secret --retry-failed 20240601-071500 --output SiteReports.zip
+"""
+import argparse  # Import argparse for command-line parsing
+import atexit  # Import atexit to flush the log file
+import os  # Import os for environment variables and file operations
+import sys  # Import sys for exit codes and stderr
+from datetime import datetime  # Import datetime for date validation and log timestamps
+
+import checkpoint  # Import the run checkpoints
+import daycache  # Import the per-day aggregate cache
+import engine  # Import the headless report engine
+import logpipe  # Import the rotating log file setup
+import metrics  # Import the run metrics
+import precompute  # Import the overnight pre-computed store
+import queries  # Import the report profiles
+import queryconfig  # Import the per-site query variant choice
+from archive import ARCHIVE_FORMATS, DEFAULT_FORMAT as ARCHIVE_DEFAULT_FORMAT, EntryPacker, ReportArchive  # Import the archive writer
+from exports import EXPORT_FORMATS, ReportExporter  # Import the data exports
+from rollup import RollupCollector  # Import the cross-site rollup
+from sitelist import parse_site_ids  # Import the site ID validation
+import hostmap  # Import the site -> host map defaults
+import reachability  # Import the reachability defaults
+
+
+def parse_date(value):
+    """argparse type: accept a YYYY-MM-DD date and return it unchanged."""
+    try:
+        datetime.strptime(value, "%Y-%m-%d")  # Validate the date format
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}', expected YYYY-MM-DD")  # Reject malformed dates
+    return value  # Return the validated date string
+
+
+def parse_subnet_caps(values):
+    """Turn ['10.28=8', ...] into a subnet cap dict layered over engine.SUBNET_CAPS."""
+    caps = dict(engine.SUBNET_CAPS)  # Start from the defaults
+    for value in values:
+        subnet, _, cap = value.partition("=")
+        try:
+            caps[subnet.strip()] = int(cap)  # Override one subnet
+        except ValueError:
+            raise ValueError(f"invalid --subnet-cap '{value}', expected SUBNET=N")
+    return caps
+
+
+def build_parser():
+    """Build the argument parser for the CLI."""
+    parser = argparse.ArgumentParser(description="Generate Sales Summary Reports for one or more sites without the GUI.")
+    parser.add_argument("--username", help="Database username (required unless resuming)")
+    parser.add_argument("--password", default=os.environ.get("SALES_REPORT_PASSWORD"),
+                        help="Database password (defaults to $SALES_REPORT_PASSWORD)")
+    parser.add_argument("--database", help="Database name (required unless resuming)")
+    sites = parser.add_mutually_exclusive_group()
+    sites.add_argument("--sites", help="Comma-separated list of site IDs")
+    sites.add_argument("--site-file", help="File with site IDs (.xlsx with a 'siteid' column, .csv or .txt)")
+    parser.add_argument("--ip-series", choices=["16", "28", "auto"], default="16",
+                        help="Server IP series; 'auto' tries both and remembers the winner (default: 16)")
+    parser.add_argument("--host-map", help="JSON file of remembered site -> host entries (default: %s)" % hostmap.DEFAULT_PATH)
+    parser.add_argument("--custom-ip", help="Connect to this host instead of deriving it from the site ID")
+    parser.add_argument("--from-date", type=parse_date, help="From date (YYYY-MM-DD; required unless resuming)")
+    parser.add_argument("--to-date", type=parse_date, help="To date (YYYY-MM-DD; required unless resuming)")
+    parser.add_argument("--profile", choices=sorted(queries.PROFILES), default=queries.DEFAULT_PROFILE,
+                        help="Report sections to query: 'standard' (sales and partners) or 'full' "
+                             "(also HealingCard collections and Paid In) (default: %(default)s)")
+    parser.add_argument("--query-variant", choices=sorted(queries.VARIANTS),
+                        help="Run every site with this report SQL variant instead of the per-site config")
+    parser.add_argument("--query-variants", metavar="PATH",
+                        help="JSON file choosing the SQL variant per site (default: %s)" % queryconfig.DEFAULT_PATH)
+    parser.add_argument("--daily", action="store_true",
+                        help="Also write one report per day ({site}_{date}.txt), fetched with a single query per site")
+    parser.add_argument("--output", help="Path of the archive to write (default: SiteReports plus the format's extension)")
+    parser.add_argument("--archive-format", choices=list(ARCHIVE_FORMATS), default=ARCHIVE_DEFAULT_FORMAT,
+                        help="Archive format: zip, or tar.gz / tar.xz / tar.zst (tar.zst needs zstandard) (default: %(default)s)")
+    parser.add_argument("--compress-level", type=int, metavar="N",
+                        help="Compression level: 0 (store) / 1 (fast) .. 9 (smallest), up to 22 for tar.zst "
+                             "(default: $SALES_REPORT_COMPRESS_LEVEL or the format's default)")
+    resume = parser.add_mutually_exclusive_group()
+    resume.add_argument("--checkpoint", action="store_true",
+                        help="Save each finished report and failure to disk so the run can be resumed")
+    resume.add_argument("--resume", metavar="RUN_ID",
+                        help="Continue a checkpointed run ('latest' for the most recent), skipping finished sites")
+    resume.add_argument("--retry-failed", metavar="RUN_ID",
+                        help="Re-run only the failed sites of a checkpointed run ('latest' for the most recent)")
+    parser.add_argument("--runs-dir", default=checkpoint.DEFAULT_DIR,
+                        help="Folder holding run checkpoints (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=engine.MAX_WORKERS,
+                        help="Starting number of sites processed in parallel; adapts during the run (default: %(default)s)")
+    parser.add_argument("--max-retries", type=int, default=engine.MAX_RETRIES,
+                        help="Retries per site for transient database errors (default: %(default)s)")
+    parser.add_argument("--render-processes", type=int, default=engine.RENDER_PROCESSES,
+                        help="Worker processes for rendering reports; 0 renders on one thread (default: %(default)s)")
+    parser.add_argument("--priority", default="", help="Comma-separated site IDs to process first (e.g. flagship stores)")
+    parser.add_argument("--subnet-cap", action="append", default=[], metavar="SUBNET=N",
+                        help="Maximum sites in flight for a subnet, e.g. 10.28=8 (repeatable)")
+    parser.add_argument("--connect-timeout", type=int, default=engine.CONNECT_TIMEOUT,
+                        help="ODBC login timeout in seconds (default: %(default)s)")
+    parser.add_argument("--query-timeout", type=int, default=engine.QUERY_TIMEOUT,
+                        help="Per-statement timeout in seconds, 0 for none (default: %(default)s)")
+    parser.add_argument("--probe-timeout", type=float, default=reachability.PROBE_TIMEOUT,
+                        help="TCP reachability probe timeout in seconds (default: %(default)s)")
+    parser.add_argument("--unreachable-ttl", type=float, default=reachability.UNREACHABLE_TTL,
+                        help="Seconds an unreachable host is skipped without retrying (default: %(default)s)")
+    parser.add_argument("--day-cache", nargs="?", const=daycache.DEFAULT_PATH, metavar="PATH",
+                        help="Reuse closed business days from a local SQLite cache (default path: %s)" % daycache.DEFAULT_PATH)
+    parser.add_argument("--refresh", action="store_true", help="Re-fetch every day in the range and overwrite the day cache")
+    parser.add_argument("--invalidate", action="store_true",
+                        help="Drop cached days for the selected sites and date range before running")
+    parser.add_argument("--no-result-cache", action="store_true",
+                        help="Do not reuse results of identical requests made earlier in this process")
+    parser.add_argument("--precomputed", nargs="?", const=precompute.DEFAULT_PATH, metavar="PATH",
+                        help="Serve sites fetched by the overnight warm-up (precompute.py) from its store (default path: %s)"
+                        % precompute.DEFAULT_PATH)
+    parser.add_argument("--rollup", action="store_true",
+                        help="Add a consolidated report (Consolidated.txt) and per-site ranking (SiteRanking.csv) to the ZIP")
+    parser.add_argument("--export", action="append", default=[], choices=EXPORT_FORMATS,
+                        help="Also export the report data as csv, jsonl or parquet (repeatable; parquet needs pyarrow)")
+    parser.add_argument("--export-dir", metavar="DIR",
+                        help="Write the exports to this folder instead of inside the ZIP")
+    parser.add_argument("--log-file", nargs="?", const=logpipe.DEFAULT_LOG_FILE, metavar="PATH",
+                        help="Also write the log to a rotating file (default path: %s)" % logpipe.DEFAULT_LOG_FILE)
+    parser.add_argument("--metrics-json", metavar="PATH", help="Write per-stage timings and the run summary as JSON")
+    parser.add_argument("--metrics-prom", metavar="PATH",
+                        help="Write the run summary as a Prometheus textfile (e.g. for node_exporter)")
+    parser.add_argument("--quiet", action="store_true", help="Only print errors and the final summary")
+    return parser
+
+
+def main(argv=None):
+    """Run a batch from the command line. Returns the process exit code."""
+    parser = build_parser()
+    args = parser.parse_args(argv)  # Parse the command-line arguments
+    resume_id = args.resume or args.retry_failed  # Run to continue, if any
+    if resume_id and (args.rollup or args.export):
+        parser.error("--rollup and --export cannot be combined with --resume/--retry-failed: the checkpoint only "
+                     "holds report texts, so they would cover just the re-run sites")  # Exits with code 2
+    if not resume_id:
+        missing = [flag for flag, value in (("--username", args.username), ("--database", args.database),
+                                            ("--from-date", args.from_date), ("--to-date", args.to_date),
+                                            ("--sites/--site-file", args.sites or args.site_file)) if not value]
+        if missing:
+            parser.error("the following arguments are required: " + ", ".join(missing))  # Exits with code 2
+    if args.password is None:
+        print("Error: --password or $SALES_REPORT_PASSWORD is required.", file=sys.stderr)  # Report the missing password
+        return 2
+    try:
+        EntryPacker(args.archive_format, args.compress_level)  # Check the format and level before connecting anywhere
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    if args.output is None:
+        args.output = "SiteReports" + ARCHIVE_FORMATS[args.archive_format]  # Default name matches the format
+
+    log_listener = logpipe.setup_file_logging(args.log_file) if args.log_file else None  # Start the log file writer
+    if log_listener is not None:
+        atexit.register(log_listener.stop)  # Flush the log file on exit
+
+    def log(message):
+        if log_listener is not None:
+            logpipe.LOGGER.info(message)  # Full log goes to the file
+        if not args.quiet:
+            print(f"{datetime.now().strftime('%H:%M:%S')} - {message}", flush=True)  # Print the message with a timestamp
+
+    if args.host_map:
+        hostmap.HOST_MAP.path = args.host_map  # Use the requested map file
+    if args.query_variants:
+        queryconfig.QUERY_CONFIG.path = args.query_variants  # Use the requested variant config
+    queryconfig.QUERY_CONFIG.override = args.query_variant  # Same variant for every site, if given
+    engine.set_timeouts(args.connect_timeout, args.query_timeout,
+                        args.probe_timeout, args.unreachable_ttl)  # Apply the timeouts
+
+    archive = None  # Created once the inputs are known
+    run = None  # Checkpoint of this run, if any
+    try:
+        if resume_id:
+            if resume_id == "latest":
+                resume_id = checkpoint.RunCheckpoint.latest(args.runs_dir)
+                if resume_id is None:
+                    raise FileNotFoundError(f"No checkpointed runs in {args.runs_dir}.")
+            run = checkpoint.RunCheckpoint.open(resume_id, args.runs_dir)  # Load the saved run
+            saved = run.parameters()  # Dates, username, database and series of the original run
+            args.from_date, args.to_date = saved["from_date"], saved["to_date"]
+            args.username, args.database = saved["username"], saved["database"]
+            args.ip_series, args.custom_ip = saved["ip_series_choice"], saved["custom_ip"]
+            args.daily = bool(saved["daily"])  # Runs saved before daily mode existed have None
+            args.profile = saved["profile"] or queries.DEFAULT_PROFILE  # Same sections as the original run
+            site_ids = list(run.failed()) if args.retry_failed else run.pending()  # Only what is left to do
+            log(f"{'Retrying' if args.retry_failed else 'Resuming'} run {run.run_id}: "
+                f"{len(site_ids)} of {len(run.site_ids)} sites to process.")  # Log what will be re-run
+        elif args.site_file:
+            site_ids = engine.read_site_ids(args.site_file, log=log, check_host=not args.custom_ip)  # Read, dedupe and validate the file
+        else:
+            sites = parse_site_ids(args.sites, check_host=not args.custom_ip)  # Split, dedupe and validate the site IDs
+            if sites.invalid or sites.duplicates:
+                engine.log_site_list(sites, log)  # Report what was dropped
+            site_ids = sites.site_ids
+        if not site_ids and not resume_id:
+            raise ValueError("No valid site IDs to process.")  # Nothing left after validation
+        if args.checkpoint:
+            run = checkpoint.RunCheckpoint.create(site_ids, args.runs_dir, from_date=args.from_date, to_date=args.to_date,
+                                                  username=args.username, database=args.database,
+                                                  ip_series_choice=args.ip_series, custom_ip=args.custom_ip,
+                                                  daily=args.daily, profile=args.profile)  # Start a checkpoint
+            log(f"Checkpointing as run {run.run_id}.")  # Tell the user which ID to resume
+
+        day_cache = daycache.DayCache(args.day_cache) if args.day_cache else None  # Open the day cache
+        if day_cache and args.invalidate:
+            removed = sum(day_cache.invalidate(sid, args.database, args.from_date, args.to_date) for sid in site_ids)  # Drop the cached days
+            log(f"Invalidated {removed} cached days.")  # Log the invalidation
+
+        archive = ReportArchive(os.path.dirname(os.path.abspath(args.output)),
+                                args.archive_format, args.compress_level)  # Spool next to the output so the final move is a rename
+        exporters = [ReportExporter(fmt, args.from_date, args.to_date,
+                                    archive=None if args.export_dir else archive, directory=args.export_dir)
+                     for fmt in dict.fromkeys(args.export)]  # One exporter per requested format
+        run_metrics = metrics.RunMetrics() if args.metrics_json or args.metrics_prom else None  # Time every stage if asked
+        successful_reports, failed_sites = {}, {}  # A resumed run may have nothing left to do
+        if site_ids:
+            successful_reports, failed_sites = engine.run_batch(
+                site_ids, args.from_date, args.to_date, args.username, args.password, args.database,
+                args.ip_series, args.custom_ip, log=log, max_workers=args.workers,
+                priority_sites=[s.strip() for s in args.priority.split(",") if s.strip()],
+                subnet_caps=parse_subnet_caps(args.subnet_cap), max_retries=args.max_retries,
+                day_cache=day_cache, refresh=args.refresh,
+                result_cache=None if args.no_result_cache else engine.RESULT_CACHE, archive=archive,
+                rollup=RollupCollector() if args.rollup else None, exporters=exporters,
+                run_metrics=run_metrics, render_processes=args.render_processes, checkpoint=run,
+                precomputed=precompute.PrecomputedStore(args.precomputed) if args.precomputed else None,
+                daily=args.daily, sections=queries.PROFILES[args.profile])  # Run the batch
+        reused = run.copy_reports_to(archive, skip=successful_reports) if run is not None else 0  # Earlier successes
+    except Exception as e:
+        if archive is not None:
+            archive.discard()  # Remove the partial archive
+        print(f"Error: {e}", file=sys.stderr)  # Report the error
+        return 1
+
+    if run_metrics is not None:
+        if args.metrics_json:
+            run_metrics.write_json(args.metrics_json)  # Save the JSON metrics
+        if args.metrics_prom:
+            run_metrics.write_prometheus(args.metrics_prom)  # Save the Prometheus textfile
+    if successful_reports or reused:
+        archive.move_to(args.output)  # Finalize the archive and move it into place
+    else:
+        archive.discard()  # Nothing to keep
+    for sid, err in failed_sites.items():
+        print(f"FAILED {sid}: {err}", file=sys.stderr)  # Report each failed site
+    print(f"{len(successful_reports)} succeeded, {len(failed_sites)} failed"
+          + (f", {reused} reused from run {run.run_id}" if reused else "")
+          + (f"; archive written to {args.output}" if successful_reports or reused else ""))  # Print the summary
+    if run is not None and failed_sites:
+        print(f"Retry the failed sites with: --retry-failed {run.run_id}", file=sys.stderr)  # Point at the next step
+    if not (successful_reports or reused):
+        return 1  # Nothing was produced
+    return 3 if failed_sites else 0  # Partial success is distinguishable from full success
+
+
+if __name__ == "__main__":
+    sys.exit(main())
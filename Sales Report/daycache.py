@@ -0,0 +1,248 @@
+"""
+Local SQLite cache of per-site, per-business-day report rows.
+
+A closed business day (any day before today) never changes once it has been
+fetched, so its aggregate rows are stored here and reused by every later
+range that covers it. Only days that are missing from the cache, or still
+open (today and later), are queried from the store server; the cached and
+fresh days are then summed back into the shape of REPORT_QUERY before
+format_report sees them.
+"""
+import os  # Import os for the default cache location
+import sqlite3  # Import sqlite3 for the local store
+import threading  # Import threading for the connection lock
+import time  # Import time for fetch timestamps
+from datetime import date  # Import date for the open/closed day check
+from decimal import Decimal  # Import Decimal to keep amounts exact
+
+from queries import DEFAULT_SECTIONS, SECTIONS, as_date, days_between, query_variant  # Import the query variant and date helpers
+
+DEFAULT_PATH = os.environ.get(
+    "SALES_REPORT_DAY_CACHE",
+    os.path.join(os.path.expanduser("~"), ".sales_report", "day_cache.sqlite3"))  # Default cache file
+
+AMOUNT_COLUMNS = (3, 4, 5, 6)  # NETSALEAMT, DISCAMT, NETRETAMT, RETDISC
+COUNT_COLUMNS = (7, 8)  # SALECOUNT, RETCNT / BILLCNT
+
+_SCHEMA = """
+create table if not exists cached_days (
+    site_id text not null,
+    database_name text not null,
+    query_version not null,
+    business_date text not null,
+    fetched_at real not null,
+    primary key (site_id, database_name, query_version, business_date)
+);
+create table if not exists day_rows (
+    site_id text not null,
+    database_name text not null,
+    query_version not null,
+    business_date text not null,
+    isheader integer,
+    corpcode,
+    name text,
+    amount1 text, amount2 text, amount3 text, amount4 text,
+    count1 integer, count2 integer
+);
+create index if not exists day_rows_key on day_rows (site_id, database_name, query_version, business_date);
+create table if not exists site_names (
+    site_id text not null,
+    database_name text not null,
+    site_name text,
+    primary key (site_id, database_name)
+);
+"""
+
+
+def to_decimal(value):
+    """Convert a stored amount (text or number) back to Decimal; None stays None."""
+    return None if value is None else Decimal(str(value))
+
+
+def _add(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a + b
+
+
+def split_daily_rows(daily_rows):
+    """
+    Split DAILY_REPORT_QUERY rows into {date: [row, ...]}, dropping the BDATE
+    column so every row has the REPORT_QUERY shape.
+    """
+    by_day = {}
+    for row in daily_rows:
+        row = tuple(row)
+        by_day.setdefault(as_date(row[1]), []).append((row[0],) + row[2:])  # Remove BDATE
+    return by_day
+
+
+def merge_rows(row_lists, sections=SECTIONS):
+    """
+    Sum REPORT_QUERY-shaped rows from several days into one range result.
+    Rows are matched on (ISHEADER, ACXCORPCODE, name) and keep the order in
+    which they first appear. sections are the report sections the rows were
+    queried with.
+    """
+    merged = {}  # key -> list of column values
+    for rows in row_lists:
+        for row in rows:
+            key = (row[0], row[1], row[2])
+            current = merged.get(key)
+            if current is None:
+                merged[key] = list(row)
+                continue
+            for i in AMOUNT_COLUMNS + COUNT_COLUMNS:
+                current[i] = _add(current[i], row[i])
+    if "oms" in sections and not any(key[0] == 4 for key in merged):
+        merged[(4, 0, "OMS CASH COLLECTION")] = [4, 0, "OMS CASH COLLECTION", Decimal("0"), 0, 0, 0, 0, 0]  # The range query always returns this row
+    return [tuple(row) for row in merged.values()]
+
+
+class DayCache:
+    """
+    Per-day aggregate store. get_report() is safe to call from several worker
+    threads; SQLite access is serialized through one connection.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path  # SQLite file location
+        self._lock = threading.Lock()  # Serializes access to _conn
+        self._conn = None  # Opened lazily
+
+    def _db(self):
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)  # Create the folder on first use
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)  # Shared across worker threads
+            self._conn.execute("pragma journal_mode=wal")  # Readers do not block the writer
+            self._conn.executescript(_SCHEMA)  # Create the tables
+        return self._conn
+
+    def close(self):
+        """Close the SQLite connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _load(self, site_id, database, days, variant):
+        """Return ({date: rows} for cached days among days, cached site name or None)."""
+        keys = [d.isoformat() for d in days]
+        cached = {}
+        with self._lock:
+            db = self._db()
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                for (day,) in db.execute(
+                        f"select business_date from cached_days where site_id = ? and database_name = ? "
+                        f"and query_version = ? and business_date in ({marks})",
+                        (site_id, database, variant, *chunk)):
+                    cached[day] = []
+                for day, *row in db.execute(
+                        f"select business_date, isheader, corpcode, name, amount1, amount2, amount3, amount4, "
+                        f"count1, count2 from day_rows where site_id = ? and database_name = ? "
+                        f"and query_version = ? and business_date in ({marks}) order by rowid",
+                        (site_id, database, variant, *chunk)):
+                    if day in cached:
+                        cached[day].append((row[0], row[1], row[2],
+                                            *(to_decimal(v) for v in row[3:7]), row[7], row[8]))
+            name_row = db.execute("select site_name from site_names where site_id = ? and database_name = ?",
+                                  (site_id, database)).fetchone()
+        return {date.fromisoformat(k): v for k, v in cached.items()}, (name_row[0] if name_row else None)
+
+    def _store(self, site_id, database, rows_by_day, site_name, variant):
+        """Save closed days (including empty ones) and the site name."""
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            with db:
+                for day, rows in rows_by_day.items():
+                    key = (site_id, database, variant, day.isoformat())
+                    db.execute("delete from day_rows where site_id = ? and database_name = ? "
+                               "and query_version = ? and business_date = ?", key)
+                    db.executemany(
+                        "insert into day_rows values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [key + (row[0], row[1], row[2],
+                                *(None if row[i] is None else str(row[i]) for i in AMOUNT_COLUMNS),
+                                row[7], row[8]) for row in rows])
+                    db.execute("insert or replace into cached_days values (?, ?, ?, ?, ?)", key + (now,))
+                db.execute("insert or replace into site_names values (?, ?, ?)", (site_id, database, site_name))
+
+    def get_report(self, site_id, database, from_date, to_date, fetch_days, refresh=False, today=None,
+                   sections=DEFAULT_SECTIONS):
+        """
+        Return (result, site_name) for the range, in REPORT_QUERY shape.
+
+        fetch_days(from_date, to_date) must return (daily_rows, site_name) for
+        DAILY_REPORT_QUERY over that sub-range; it is called once per
+        contiguous run of days that are missing or still open. With
+        refresh=True every day is fetched again and closed days overwritten.
+        Days are cached per set of report sections (see queries.PROFILES).
+        """
+        rows_by_day, site_name = self.get_days(site_id, database, from_date, to_date, fetch_days, refresh, today,
+                                               sections)
+        return merge_rows(rows_by_day.values(), sections), site_name
+
+    def get_days(self, site_id, database, from_date, to_date, fetch_days, refresh=False, today=None,
+                 sections=DEFAULT_SECTIONS):
+        """
+        Like get_report, but return ({date: rows}, site_name) with an entry
+        for every day of the range, in date order, instead of merging them.
+        """
+        today = today or date.today()  # Days from today on are still open
+        days = days_between(from_date, to_date)
+        variant = query_variant(sections)  # Rows of other section sets are cached separately
+        cached, site_name = ({}, None) if refresh else self._load(site_id, database, days, variant)
+        to_fetch = [d for d in days if d >= today or d not in cached]  # Missing or open days
+
+        runs = []  # Contiguous [start, end] runs of days to fetch
+        for d in to_fetch:
+            if runs and (d - runs[-1][1]).days == 1:
+                runs[-1][1] = d
+            else:
+                runs.append([d, d])
+
+        fresh = {}
+        for start, end in runs:
+            daily_rows, site_name = fetch_days(start.isoformat(), end.isoformat())  # Query the store server
+            by_day = split_daily_rows(daily_rows)
+            for d in days_between(start, end):
+                fresh[d] = by_day.get(d, [])  # Days without rows are cached as empty
+        closed = {d: rows for d, rows in fresh.items() if d < today}
+        if closed or (runs and site_name is not None):
+            self._store(site_id, database, closed, site_name, variant)  # Closed days are immutable from now on
+
+        all_days = {**cached, **fresh}
+        return {d: all_days[d] for d in days}, site_name if site_name is not None else "Unknown Site"
+
+    def invalidate(self, site_id=None, database=None, from_date=None, to_date=None):
+        """
+        Drop cached days. Any argument left as None matches everything, so
+        invalidate() clears the whole cache and invalidate("13100") one site.
+        Returns the number of days removed.
+        """
+        clauses, params = [], []
+        if site_id is not None:
+            clauses.append("site_id = ?")
+            params.append(site_id)
+        if database is not None:
+            clauses.append("database_name = ?")
+            params.append(database)
+        if from_date is not None:
+            clauses.append("business_date >= ?")
+            params.append(as_date(from_date).isoformat())
+        if to_date is not None:
+            clauses.append("business_date <= ?")
+            params.append(as_date(to_date).isoformat())
+        where = (" where " + " and ".join(clauses)) if clauses else ""
+        with self._lock:
+            db = self._db()
+            with db:
+                removed = db.execute("delete from cached_days" + where, params).rowcount
+                db.execute("delete from day_rows" + where, params)
+        return removed
@@ -0,0 +1,635 @@
+"""
+Headless report engine for the Sales Summary Report.
+
+Everything needed to turn a list of site IDs into a ZIP of fixed-width
+reports lives here, without any tkinter/tkcalendar imports, so the same
+pipeline can be driven from the desktop app, from cli.py, from cron or
+from any other Python code.
+"""
+import pyodbc  # Import pyodbc for database connection
+import concurrent.futures  # Import concurrent.futures for parallel processing
+import contextlib  # Import contextlib for the no-op metrics context
+import threading  # Import threading for locks shared by worker threads
+import time  # Import time for the ZIP write timing
+
+import metrics  # Import the per-site stage timers
+import reachability  # Import the TCP probe and negative cache
+from daycache import merge_rows, split_daily_rows  # Import the per-day row helpers
+from hostmap import HOST_MAP  # Import the persistent site -> host map
+from pipeline import QUEUE_SIZE as PIPELINE_QUEUE_SIZE, RenderArchiveStages  # Import the render/archive stages
+from pool import POOL  # Import the shared connection pool
+from queries import (DEFAULT_SECTIONS, build_report_query, days_between, query_variant, report_params,
+                     site_batch)  # Import the report SQL builders
+from queryconfig import QUERY_CONFIG  # Import the per-site query variant choice
+from reachability import HostUnreachableError  # Import the fast-fail error for dead hosts
+from renderer import render_report  # Import the precompiled report renderer
+from report import format_currency, format_report  # Import the reference report formatter (re-exported)
+from resultcache import RESULT_CACHE  # Import the shared query result cache
+from scheduler import AdaptiveScheduler  # Import the adaptive site scheduler
+from sitelist import read_site_list  # Import the streaming site list reader
+
+MAX_WORKERS = 10  # Default number of sites processed in parallel
+CONNECT_TIMEOUT = 10  # Seconds allowed for the ODBC login (0 = driver default)
+QUERY_TIMEOUT = 300  # Seconds allowed per statement (0 = no limit)
+MAX_RETRIES = 2  # Retries per site for transient errors
+FETCH_ARRAY_SIZE = 500  # Rows per fetchmany call when reading a report
+RENDER_PROCESSES = 0  # Worker processes for rendering (0 = one render thread in this process)
+SUBNET_CAPS = {"10.16": 24, "10.28": 24}  # Maximum sites in flight per store subnet
+TRANSIENT_SQLSTATES = {"08S01", "08001", "08007", "HYT00", "HYT01", "40001"}  # Link failures, timeouts, deadlocks
+
+# =============================================================================
+# Modified Connection Functions to Allow Manual IP Override
+# =============================================================================
+
+def set_timeouts(connect_timeout=None, query_timeout=None, probe_timeout=None, unreachable_ttl=None):
+    """
+    Override the connection/query timeouts (seconds) used by the engine.
+    Arguments left as None keep their current value; 0 disables a timeout.
+    """
+    global CONNECT_TIMEOUT, QUERY_TIMEOUT
+    if connect_timeout is not None:
+        CONNECT_TIMEOUT = connect_timeout  # ODBC login timeout
+    if query_timeout is not None:
+        QUERY_TIMEOUT = query_timeout  # Per-statement timeout
+    if probe_timeout is not None:
+        reachability.PROBE_TIMEOUT = probe_timeout  # TCP probe timeout
+    if unreachable_ttl is not None:
+        reachability.UNREACHABLE.ttl = unreachable_ttl  # Negative cache lifetime
+
+def open_connection(host, username, password, database):
+    """
+    Return a pooled connection to host, reusing an idle one when possible.
+    Returns None if the login fails; raises HostUnreachableError if the host
+    does not answer on its SQL Server port (or is in the negative cache).
+    """
+    def connect():
+        reachability.check_host(host)  # Fail fast before the ODBC login if the host is down
+        return pyodbc.connect(
+            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
+            f"SERVER={host};"
+            f"UID={username};"
+            f"PWD={password};"
+            f"DATABASE={database};",
+            timeout=CONNECT_TIMEOUT
+        )  # Attempt to connect to the database
+    try:
+        return POOL.acquire(host, database, username, password, connect)  # Return the pooled connection if successful
+    except pyodbc.Error:
+        return None  # Return None if the connection fails
+
+def try_connection(series, formatted_site_id, username, password, database):
+    """Attempt to connect using the given IP series."""
+    host = f"{series}{formatted_site_id}"  # Construct the host address
+    return open_connection(host, username, password, database)  # Return the connection object, or None if it fails
+
+def format_site_id(site_id):
+    """Format the site id for the host address (for example: '13100' becomes '131.0')."""
+    try:
+        return f"{site_id[:3]}.{int(site_id[3:])}"  # Format the site ID
+    except Exception as e:
+        raise ValueError(f"Error formatting Site ID: {e}")  # Raise an error if formatting fails
+
+def series_for_choice(ip_series_choice):
+    """Return the IP series prefixes for the choice ('16', '28' or 'auto' for both)."""
+    if ip_series_choice == "16":
+        return ["10.16."]  # Set the IP series to '10.16.'
+    elif ip_series_choice == "28":
+        return ["10.28."]  # Set the IP series to '10.28.'
+    elif ip_series_choice == "auto":
+        return ["10.16.", "10.28."]  # Try both series and keep whichever logs in first
+    return []  # Set the IP series to an empty list if the choice is invalid
+
+def candidate_hosts(site_id, ip_series_choice, custom_ip=None):
+    """Return the hosts connect_to_database would try for a site."""
+    if custom_ip:
+        return [custom_ip]  # The manually entered IP address overrides the series
+    formatted_site_id = format_site_id(site_id)  # Format the site ID
+    return [f"{series}{formatted_site_id}" for series in series_for_choice(ip_series_choice)]  # Build the host addresses
+
+def connect_to_database(site_id, username, password, database, ip_series_choice, custom_ip=None):
+    """
+    Attempt to connect to the server. The returned connection comes from the
+    shared pool; close() hands it back for reuse by later sites and runs.
+
+    If a custom_ip is provided (i.e. the user clicked EDIT/ALERT IP), then use it directly.
+    Otherwise, use the IP series ('16', '28' or 'auto') to build the host from the site_id.
+    A host remembered in HOST_MAP is tried first; discovery only runs when it fails.
+    The remembered host is only forgotten when it is unreachable, or replaced
+    when discovery logs in somewhere else.
+    Raises HostUnreachableError when no candidate host answers on its port.
+    """
+    if custom_ip:  # Use the manually entered IP address
+        host = custom_ip  # Set the host to the custom IP
+        return open_connection(host, username, password, database)  # Return the connection object, or None if it fails
+    else:
+        formatted_site_id = format_site_id(site_id)  # Format the site ID (e.g. '13100' becomes '131.0')
+        ip_series = series_for_choice(ip_series_choice)  # Get the IP series to try
+        if not ip_series:
+            return None  # Nothing to try for an invalid choice
+
+        # Go straight to the host that worked last time, if it belongs to the chosen series.
+        known_host = HOST_MAP.get(site_id)  # Look up the remembered host
+        if known_host and any(known_host.startswith(series) for series in ip_series):
+            try:
+                connection = open_connection(known_host, username, password, database)  # Connect to the known host
+            except HostUnreachableError:
+                connection = None  # Fall back to discovery
+                HOST_MAP.forget(site_id)  # The known host is down: rediscover it
+            if connection:
+                return connection  # Return the connection object if successful
+            # A failed login (wrong credentials, login timeout) says nothing about the host:
+            # keep it mapped unless discovery below finds a different one.
+
+        connection, unreachable = _race_series(ip_series, formatted_site_id, username, password, database)  # Try every series concurrently
+        if connection:
+            HOST_MAP.set(site_id, connection.host)  # Remember the winning host for later runs
+            return connection  # Return the connection object if successful
+        if unreachable:
+            raise unreachable  # Every host was down: report it as such
+        return None  # Return None if all connection attempts fail
+
+def _race_series(ip_series, formatted_site_id, username, password, database):
+    """
+    Try every IP series concurrently and return (connection, unreachable_error)
+    for the first successful login. Losing attempts are cancelled if they have
+    not started; ones that still log in later are handed back to the pool.
+    """
+    if len(ip_series) == 1:
+        try:
+            return try_connection(ip_series[0], formatted_site_id, username, password, database), None  # No race needed
+        except HostUnreachableError as e:
+            return None, e
+
+    def return_to_pool(future):
+        if not future.cancelled() and future.exception() is None and future.result():
+            future.result().close()  # A late winner is parked in the pool for reuse
+
+    unreachable = None  # First "host unreachable" error, reported if nothing connects
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(ip_series))  # One thread per series
+    futures = {executor.submit(try_connection, series, formatted_site_id, username, password, database): series
+               for series in ip_series}  # Submit connection attempts for each IP series
+    try:
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                connection = future.result()  # Get the result of each connection attempt
+            except HostUnreachableError as e:
+                unreachable = unreachable or e  # Remember why this host failed
+                continue
+            if connection:
+                for other in futures:
+                    if other is not future:
+                        other.cancel()  # Cancel attempts that have not started yet
+                        other.add_done_callback(return_to_pool)  # Release attempts that are still logging in
+                return connection, None
+        return None, unreachable
+    finally:
+        executor.shutdown(wait=False)  # Do not wait for a slow losing login
+
+def _fetch_rows(cursor):
+    """Read the current result set in fetchmany batches as plain tuples (cheap to cache, pickle and render)."""
+    cursor.arraysize = FETCH_ARRAY_SIZE  # Rows per round of fetchmany
+    rows = []
+    while True:
+        batch = cursor.fetchmany(FETCH_ARRAY_SIZE)  # Next block of rows
+        if not batch:
+            return rows
+        rows.extend(map(tuple, batch))  # Drop the pyodbc.Row wrappers right away
+
+def _query_site(site_id, query, params, username, password, database, ip_series_choice, custom_ip=None):
+    """
+    Connect and run the site name lookup and query as one batch (a single
+    round trip), returning (result, site_name).
+    """
+    with metrics.stage("connect"):
+        connection = connect_to_database(site_id, username, password, database, ip_series_choice, custom_ip)  # Connect to the database
+    if not connection:
+        raise ConnectionError(f"Could not connect to the server for site {site_id}.")  # Raise an error if the connection fails
+
+    try:
+        connection.timeout = QUERY_TIMEOUT  # Apply the per-statement timeout
+        cursor = connection.cursor()  # Create a cursor object
+        with metrics.stage("execute"):
+            cursor.execute(site_batch(query), (site_id, *params))  # Site name lookup and report in one batch
+        with metrics.stage("fetch"):
+            site_row = cursor.fetchone()  # First result set: the site name
+            site_name = site_row[0] if site_row else "Unknown Site"  # Get the site name from the row
+            if not cursor.nextset():
+                raise pyodbc.ProgrammingError("HY000", "The report query returned no result set.")  # Batch was cut short
+            result = _fetch_rows(cursor)  # Second result set: the report rows
+        metrics.count_rows(len(result))  # Count the rows for the run metrics
+        return result, site_name  # Return the result and site name
+    except pyodbc.Error:
+        connection.discard()  # Drop the connection instead of pooling a possibly broken one
+        raise
+    finally:
+        connection.close()  # Return the connection to the pool
+
+def get_report_data(site_id, from_date, to_date, username, password, database, ip_series_choice, custom_ip=None,
+                    sections=DEFAULT_SECTIONS):
+    """
+    Connect to the database, run the query, and return (result, site_name).
+    The custom_ip (if provided) overrides the IP series. Only the given
+    report sections (see queries.PROFILES) are queried, in the SQL variant
+    configured for the site (see queryconfig).
+    """
+    variant = QUERY_CONFIG.variant_for(site_id)  # Per-site SQL formulation
+    return _query_site(site_id, build_report_query(sections, variant=variant),
+                       report_params(from_date, to_date, sections, variant),
+                       username, password, database, ip_series_choice, custom_ip)  # Run the range report query
+
+def get_daily_report_data(site_id, from_date, to_date, username, password, database, ip_series_choice, custom_ip=None,
+                          sections=DEFAULT_SECTIONS):
+    """
+    Like get_report_data, but run the DAILY_REPORT_QUERY form: every row
+    carries its business date in the second column.
+    """
+    variant = QUERY_CONFIG.variant_for(site_id)  # Per-site SQL formulation
+    return _query_site(site_id, build_report_query(sections, daily=True, variant=variant),
+                       report_params(from_date, to_date, sections, variant),
+                       username, password, database, ip_series_choice, custom_ip)  # Run the per-day report query
+
+def get_report_data_cached(site_id, from_date, to_date, username, password, database, ip_series_choice,
+                           custom_ip=None, day_cache=None, refresh=False, sections=DEFAULT_SECTIONS):
+    """
+    get_report_data backed by a DayCache: closed days already in the cache are
+    not queried again. Without a day_cache this is plain get_report_data.
+    """
+    if day_cache is None:
+        return get_report_data(site_id, from_date, to_date, username, password, database, ip_series_choice, custom_ip,
+                               sections)
+
+    def fetch_days(start, end):
+        return get_daily_report_data(site_id, start, end, username, password, database, ip_series_choice, custom_ip,
+                                     sections)
+
+    return day_cache.get_report(site_id, database, from_date, to_date, fetch_days, refresh=refresh,
+                                sections=sections)  # Merge cached and fresh days
+
+def get_daily_breakdown(site_id, from_date, to_date, username, password, database, ip_series_choice,
+                        custom_ip=None, day_cache=None, refresh=False, sections=DEFAULT_SECTIONS):
+    """
+    Run DAILY_REPORT_QUERY once for the whole range and return
+    (result, site_name, days): result is the range report and days maps
+    every date of the range to that day's rows, all in REPORT_QUERY shape.
+    With a day_cache, closed days already in the cache are not queried again.
+    """
+    if day_cache is None:
+        daily_rows, site_name = get_daily_report_data(site_id, from_date, to_date, username, password, database,
+                                                      ip_series_choice, custom_ip, sections)  # One query for every day
+        by_day = split_daily_rows(daily_rows)  # Split the rows by business date
+        rows_by_day = {d: by_day.get(d, []) for d in days_between(from_date, to_date)}  # Quiet days still get a report
+    else:
+        def fetch_days(start, end):
+            return get_daily_report_data(site_id, start, end, username, password, database, ip_series_choice, custom_ip,
+                                         sections)
+
+        rows_by_day, site_name = day_cache.get_days(site_id, database, from_date, to_date, fetch_days,
+                                                    refresh=refresh, sections=sections)  # Cached and fresh days
+    days = {d: merge_rows([rows], sections) for d, rows in rows_by_day.items()}  # Each day in the shape of a one-day range
+    return merge_rows(rows_by_day.values(), sections), site_name, days
+
+def fetch_report_data(site_id, from_date, to_date, username, password, database, ip_series_choice,
+                      custom_ip=None, day_cache=None, refresh=False, result_cache=RESULT_CACHE, precomputed=None,
+                      sections=DEFAULT_SECTIONS):
+    """
+    Return (result, site_name) for a site, served from result_cache when an
+    identical request was answered recently, or from precomputed (see
+    precompute.PrecomputedStore) when the overnight warm-up fetched it.
+    Concurrent identical requests share one query. refresh=True bypasses
+    every cache.
+    """
+    def compute():
+        if precomputed is not None and not refresh:
+            hit = precomputed.get(site_id, database, from_date, to_date, sections)  # Fetched overnight?
+            if hit is not None:
+                return hit
+        return get_report_data_cached(site_id, from_date, to_date, username, password, database, ip_series_choice,
+                                      custom_ip, day_cache, refresh, sections)  # Run the query (or read the day cache)
+    if result_cache is None:
+        return compute()
+    key = result_cache.make_key(site_id, database, from_date, to_date, query_variant(sections))  # Cache key for this request
+    return result_cache.get_or_compute(key, compute, refresh=refresh)  # Serve from cache or run once
+
+# =============================================================================
+# Site List Loading
+# =============================================================================
+
+def _no_log(message):
+    """Default log callback: discard the message."""
+
+MAX_LOGGED_INVALID = 20  # Invalid site list rows listed individually in the log
+
+def log_site_list(sites, log=_no_log):
+    """Log what a sitelist.SiteList contains, including every dropped row (up to MAX_LOGGED_INVALID)."""
+    log(f"Site list: {sites.summary()}.")  # Log the counts
+    for row, value, reason in sites.invalid[:MAX_LOGGED_INVALID]:
+        log(f"Skipping invalid site ID {value!r} on row {row}: {reason}.")  # Report the bad row before connecting
+    if len(sites.invalid) > MAX_LOGGED_INVALID:
+        log(f"... and {len(sites.invalid) - MAX_LOGGED_INVALID} more invalid rows.")
+
+def read_site_ids(file_path, log=_no_log, check_host=True):
+    """
+    Read site IDs from an .xlsx file (column 'siteid', any case), or from a
+    .txt/.csv file containing comma- or newline-separated IDs (or a CSV
+    'siteid' column). Duplicates are dropped and invalid IDs are logged and
+    skipped before anything connects. Pass check_host=False when a custom IP
+    is used, so IDs need not map to a store address.
+    """
+    sites = read_site_list(file_path, check_host)  # Stream and validate the list
+    log_site_list(sites, log)
+    return sites.site_ids
+
+# =============================================================================
+# Batch Processing
+# =============================================================================
+
+def _site_reachable(sid, ip_series_choice, custom_ip):
+    """True if any candidate host of the site is not in the negative cache."""
+    try:
+        return any(host not in reachability.UNREACHABLE for host in candidate_hosts(sid, ip_series_choice, custom_ip))
+    except ValueError:
+        return False
+
+def fetch_site_rows(sid, from_date, to_date, username, password, database, ip_series_choice, custom_ip=None,
+                    day_cache=None, refresh=False, result_cache=RESULT_CACHE, on_rows=None, precomputed=None,
+                    sections=DEFAULT_SECTIONS):
+    """
+    Fetch (result, site_name) for one site, raising on failure.
+    on_rows(site_id, site_name, result), if given, receives the raw rows.
+    """
+    result, site_name = fetch_report_data(sid, from_date, to_date, username, password, database, ip_series_choice,
+                                          custom_ip, day_cache, refresh, result_cache, precomputed, sections)  # Get the report data for the site
+    if on_rows is not None:
+        on_rows(sid, site_name, result)  # Hand the raw rows to the caller (e.g. the rollup)
+    return result, site_name
+
+def fetch_site_days(sid, from_date, to_date, username, password, database, ip_series_choice, custom_ip=None,
+                    day_cache=None, refresh=False, on_rows=None, sections=DEFAULT_SECTIONS):
+    """
+    Fetch (result, site_name, days) for one site with get_daily_breakdown,
+    raising on failure. on_rows receives the range rows, as in fetch_site_rows.
+    """
+    result, site_name, days = get_daily_breakdown(sid, from_date, to_date, username, password, database,
+                                                  ip_series_choice, custom_ip, day_cache, refresh, sections)  # Get every day of the site
+    if on_rows is not None:
+        on_rows(sid, site_name, result)  # Hand the range rows to the caller (e.g. the rollup)
+    return result, site_name, days
+
+def build_site_report(sid, from_date, to_date, username, password, database, ip_series_choice, custom_ip=None,
+                      day_cache=None, refresh=False, result_cache=RESULT_CACHE, on_rows=None, precomputed=None,
+                      sections=DEFAULT_SECTIONS):
+    """Fetch and format the report for one site, raising on failure."""
+    result, site_name = fetch_site_rows(sid, from_date, to_date, username, password, database, ip_series_choice,
+                                        custom_ip, day_cache, refresh, result_cache, on_rows, precomputed,
+                                        sections)  # Get the report data for the site
+    with metrics.stage("render"):
+        return render_report(result, sid, site_name, from_date, to_date)  # Format the report data as a string
+
+def process_site(sid, from_date, to_date, username, password, database, ip_series_choice, custom_ip=None):
+    """
+    Fetch and format the report for one site.
+    Returns (site_id, report_text, error); exactly one of report_text/error is None.
+    """
+    try:
+        report_text = build_site_report(sid, from_date, to_date, username, password, database, ip_series_choice, custom_ip)  # Build the report
+        return (sid, report_text, None)  # Return the site ID, report text, and no error
+    except Exception as e:
+        return (sid, None, str(e))  # Return the site ID, no report text, and the error message
+
+def is_transient_error(error):
+    """
+    True for failures worth retrying: dropped links, timeouts, deadlocks and
+    failed logins after the test connection already proved the credentials.
+    Unreachable hosts and bad input are not retried.
+    """
+    if isinstance(error, HostUnreachableError):
+        return False  # Already known to be down
+    if isinstance(error, pyodbc.Error):
+        sqlstate = error.args[0] if error.args else ""  # pyodbc puts the SQLSTATE first
+        return sqlstate in TRANSIENT_SQLSTATES or isinstance(error, pyodbc.OperationalError)
+    return isinstance(error, ConnectionError)  # Login failed although the credentials are valid
+
+def subnet_of(sid, ip_series_choice, custom_ip=None):
+    """
+    Return the subnet key ('10.16', '10.28' or 'custom') used for per-subnet
+    caps. A remembered host only counts when it belongs to the chosen series,
+    as in connect_to_database. An auto-mode site whose host is not known yet
+    may be on either series, so it gets both keys and counts against both caps.
+    """
+    if custom_ip:
+        return "custom"  # Every site goes to the same host
+    series = series_for_choice(ip_series_choice)
+    known_host = HOST_MAP.get(sid)  # Auto mode learns the subnet per site
+    if known_host and any(known_host.startswith(prefix) for prefix in series):
+        return ".".join(known_host.split(".")[:2])  # Only used when connect_to_database would use it too
+    return series[0].rstrip(".") if len(series) == 1 else tuple(prefix.rstrip(".") for prefix in series)
+
+def run_batch(site_ids, from_date, to_date, username, password, database, ip_series_choice,
+              custom_ip=None, log=_no_log, max_workers=MAX_WORKERS, priority_sites=(),
+              subnet_caps=None, max_retries=MAX_RETRIES, day_cache=None, refresh=False,
+              result_cache=RESULT_CACHE, archive=None, rollup=None, exporters=(),
+              run_metrics=None, render_processes=RENDER_PROCESSES, queue_size=PIPELINE_QUEUE_SIZE,
+              checkpoint=None, precomputed=None, daily=False, sections=DEFAULT_SECTIONS, render=True):
+    """
+    Validate the credentials against the first site, then process every site
+    through a three-stage pipeline: sites are fetched in parallel, rendered
+    on a separate thread (or in render_processes worker processes) and
+    archived by one writer thread. The stages are joined by a bounded queue
+    of queue_size reports, so a slow stage throttles the fetches instead of
+    letting results pile up. max_workers is the starting concurrency; the scheduler
+    adjusts it to the observed latency and error rate. Sites in
+    priority_sites start first, subnet_caps limits sites in flight per
+    subnet (see SUBNET_CAPS) and transient errors are retried up to
+    max_retries times. With a DayCache, closed days are read from the cache
+    and only missing or open days are queried; refresh=True re-fetches them.
+    Identical requests answered recently are served from result_cache
+    (pass None to always query), and ranges fetched by the overnight warm-up
+    from precomputed (see precompute.PrecomputedStore).
+
+    With an archive (see archive.ReportArchive) each report is compressed in
+    the render stage with the archive's packer, written to the archive as
+    soon as its site completes, and successful_reports maps the site ID to
+    the archive entry name instead of holding the report text (the list of
+    entry names in daily mode).
+
+    With a rollup (see rollup.RollupCollector) the raw rows of every site are
+    collected; if there is also an archive, the consolidated report and the
+    per-site ranking are added to it at the end. Each of exporters (see
+    exports.ReportExporter) receives the raw rows of every site as well and
+    is closed at the end.
+
+    With run_metrics (see metrics.RunMetrics) every stage of every site is
+    timed; the summary is logged at the end and the caller can write it out.
+
+    sections (see queries.PROFILES) selects the parts of the report that are
+    queried and rendered; the default skips the collection branches.
+
+    With daily=True every site is fetched with one DAILY_REPORT_QUERY for the
+    whole range and gets a report per day ({site}_{YYYY-MM-DD}.txt) next to
+    its range report ({site}.txt); the successful_reports values are then
+    {entry_name: text}, or the list of entry names with an archive. The
+    result cache and the pre-computed store are not used in this mode.
+
+    With a checkpoint (see checkpoint.RunCheckpoint) every finished report
+    and every failure is saved to disk as it happens, so an interrupted run
+    can be resumed and failed sites retried without redoing the rest.
+
+    With render=False the sites are only fetched: the rows reach the rollup
+    and the exporters, nothing is rendered or kept, and successful_reports
+    maps each site ID to its site name. It cannot be combined with an
+    archive or a checkpoint, which store the rendered reports.
+
+    Returns (successful_reports, failed_sites), both dictionaries keyed by
+    site ID. Raises an exception if the test connection fails.
+    """
+    if not site_ids:
+        raise ValueError("No Site IDs to process.")  # Raise an error if there is nothing to do
+    if not render and (archive is not None or checkpoint is not None):
+        raise ValueError("An archive or a checkpoint needs the rendered reports.")  # Nothing to store without rendering
+    variants = QUERY_CONFIG.summary()  # Also validates the variant config before anything connects
+    if variants:
+        log(variants)  # Log which SQL formulations are in use
+
+    # Probe every candidate host in parallel so dead stores fail fast.
+    hosts = []  # Hosts to probe
+    for sid in site_ids:
+        try:
+            hosts.extend(candidate_hosts(sid, ip_series_choice, custom_ip))  # Collect the site's hosts
+        except ValueError:
+            pass  # Malformed site IDs are reported when the site is processed
+    reachable = reachability.probe_many(hosts)  # Probe the hosts and cache the unreachable ones
+    if len(reachable) < len(set(hosts)):
+        log(f"{len(set(hosts)) - len(reachable)} of {len(set(hosts))} hosts are unreachable.")  # Log the unreachable hosts
+
+    # Validate credentials using the first reachable site ID.
+    first_site = next((sid for sid in site_ids if _site_reachable(sid, ip_series_choice, custom_ip)), site_ids[0])  # Pick the site for the test connection
+    log("Validating connection with test connection...")  # Log the start of connection validation
+    test_conn = connect_to_database(first_site, username, password, database, ip_series_choice, custom_ip)  # Connect to the database using the first reachable site ID
+    if not test_conn:
+        raise Exception("Test connection failed.")  # Raise an error if the test connection fails
+    test_conn.close()  # Return the test connection to the pool so the first site reuses it
+    log("Test connection successful.")  # Log the successful test connection
+
+    successful_reports = {}  # Initialize a dictionary to store successful reports
+    failed_sites = {}  # Initialize a dictionary to store failed sites
+    results_lock = threading.Lock()  # The archive thread and the fetch loop both record outcomes
+    total_sites = len(site_ids)  # Get the total number of sites
+    positions = {}  # Site ID -> start order (for progress messages)
+    positions_lock = threading.Lock()  # Guards positions
+
+    sinks = [sink for sink in (rollup, *exporters) if sink is not None]  # Consumers of the raw rows
+
+    def on_rows(sid, site_name, result):
+        for sink in sinks:
+            sink.add(sid, site_name, result)  # Feed the rollup and the exports
+
+    def run_site(sid):
+        with positions_lock:
+            index = positions.setdefault(sid, len(positions) + 1)  # Retries keep their original position
+        log(f"Processing site {sid} ({index}/{total_sites})...")  # Log the start of processing for the site
+        with run_metrics.site(sid) if run_metrics is not None else contextlib.nullcontext():  # Time each stage if asked
+            if daily:
+                return fetch_site_days(sid, from_date, to_date, username, password, database, ip_series_choice,
+                                       custom_ip, day_cache, refresh, on_rows if sinks else None,
+                                       sections)  # Fetch stage: every day in one query
+            return (*fetch_site_rows(sid, from_date, to_date, username, password, database, ip_series_choice, custom_ip,
+                                     day_cache, refresh, result_cache,
+                                     on_rows if sinks else None, precomputed, sections), None)  # Fetch stage: connect and query
+
+    def site_failed(sid, error, attempts):
+        with results_lock:
+            failed_sites[sid] = str(error)  # Add the failed site to the dictionary
+        if checkpoint is not None:
+            checkpoint.record_failure(sid, error)  # Remember it for "retry failed"
+        log(f"Error processing site {sid}: {error}")  # Log the error processing the site
+        if run_metrics is not None:
+            run_metrics.finish_site(sid, False, attempts, error)  # Record the outcome and retries
+
+    def archive_site(sid, attempts, report_text, error, render_seconds, packed=None):
+        # Archive stage: runs on the pipeline's writer thread, in submission order.
+        if error is not None:
+            site_failed(sid, error, attempts)
+            return
+        if run_metrics is not None:
+            run_metrics.add_stage(sid, "render", render_seconds)  # Time spent in the render stage
+        if checkpoint is not None:
+            checkpoint.record_success(sid, report_text)  # Survives a crash or a closed window
+        if archive is not None:
+            write_start = time.perf_counter()
+            if packed is not None:
+                packed_entries, compress_seconds = packed  # Compressed by the render worker
+                for entry in packed_entries:
+                    archive.add_packed(entry)  # Only appends bytes
+                entry_names = [entry[1] for entry in packed_entries]  # Every packed entry carries its name
+                if run_metrics is not None:
+                    run_metrics.add_stage(sid, "compress", compress_seconds)  # Time spent compressing in the render stage
+            else:
+                entries = report_text if isinstance(report_text, dict) else {f"{sid}.txt": report_text}  # Daily mode has several
+                for name, text in entries.items():
+                    archive.add(name, text)  # Stream the reports to disk right away
+                entry_names = list(entries)
+            if run_metrics is not None:
+                run_metrics.add_stage(sid, "write", time.perf_counter() - write_start)  # Time the ZIP write
+            report_text = entry_names if daily else entry_names[0]  # Keep only the entry name(s) in memory
+        with results_lock:
+            successful_reports[sid] = report_text  # Add the successful report to the dictionary
+        log(f"Completed site {sid}.")  # Log the completion of processing for the site
+        if run_metrics is not None:
+            run_metrics.finish_site(sid, True, attempts)  # Record the outcome and retries
+
+    def site_fetched(sid, attempts, site_name):
+        # Fetch-only runs: the sinks already have the rows, so only the outcome is kept.
+        with results_lock:
+            successful_reports[sid] = site_name  # Keep the site name, not the report
+        log(f"Completed site {sid}.")  # Log the completion of processing for the site
+        if run_metrics is not None:
+            run_metrics.finish_site(sid, True, attempts)  # Record the outcome and retries
+
+    def on_retry(sid, attempt, delay, error):
+        log(f"Retrying site {sid} in {delay:.1f}s (attempt {attempt + 1}): {error}")  # Log the retry
+
+    # Process sites in parallel with adaptive concurrency, per-subnet caps and retries.
+    scheduler = AdaptiveScheduler(initial=min(total_sites, max_workers), subnet_caps=SUBNET_CAPS if subnet_caps is None else subnet_caps,
+                                  max_retries=max_retries, is_transient=is_transient_error)  # Create the scheduler
+    stages = None  # Fetch-only runs have no render or archive stage
+    if render:
+        stages = RenderArchiveStages(archive_site, processes=render_processes, queue_size=queue_size,
+                                     packer=archive.packer if archive is not None else None,
+                                     keep_text=checkpoint is not None)  # Render (and compress) and archive stages
+    try:
+        for sid, fetched, error, attempts in scheduler.run(site_ids, run_site,
+                                                           subnet_of=lambda sid: subnet_of(sid, ip_series_choice, custom_ip),
+                                                           priority=priority_sites, on_retry=on_retry):
+            if error is None:
+                result, site_name, days = fetched
+                if stages is None:
+                    site_fetched(sid, attempts, site_name)  # The rows are dropped once the sinks have them
+                else:
+                    stages.submit(sid, attempts, result, site_name, from_date, to_date, days)  # Blocks while render/archive catch up
+            else:
+                site_failed(sid, error, attempts)
+    except BaseException:
+        if stages is not None:
+            stages.abort()  # Do not leave render workers behind
+        raise
+    if stages is not None:
+        stages.close()  # Wait for the last reports to be rendered and archived
+
+    if rollup is not None and archive is not None and rollup.sites:
+        log("Building consolidated rollup...")  # Log the rollup step
+        for entry_name, text in rollup.render(from_date, to_date).items():
+            archive.add(entry_name, text)  # Add the consolidated report and ranking to the ZIP
+    for exporter in exporters:
+        exporter.close()  # Write the last export batch
+    HOST_MAP.save()  # Persist newly discovered site -> host entries
+    if result_cache is not None:
+        stats = result_cache.stats()  # Snapshot the cache counters
+        log(f"Result cache: {stats['hits']} hits, {stats['misses']} misses, {stats['coalesced']} coalesced.")  # Log the cache counters
+    if precomputed is not None:
+        stats = precomputed.stats()  # Snapshot the store counters
+        log(f"Pre-computed: {stats['hits']} served from the overnight store, {stats['misses']} fetched live.")  # Log the store counters
+    if run_metrics is not None:
+        run_metrics.finish()  # Stop the run clocks
+        log(run_metrics.format_summary())  # Log the per-stage summary
+    log("Report generation completed.")  # Log the completion of report generation
+    return successful_reports, failed_sites  # Return both dictionaries
@@ -0,0 +1,155 @@
+"""
+Machine-readable exports of the per-site report data.
+
+ReportExporter turns the raw get_report_data rows into flat records (one per
+BILLTYPE, one TOTAL line per site and one per partner) carrying the same
+SALES/RETURNS/NET numbers the text report prints. Records are buffered and
+written out in numbered part files every batch_size records, either into the
+report ZIP (exports/part-00001.csv, ...) or into a directory, so downstream
+loads read numbers directly instead of parsing the fixed-width text.
+
+Parquet needs pyarrow; CSV and JSON Lines use only the standard library.
+"""
+import csv  # Import csv for the CSV writer
+import io  # Import io for in-memory part files
+import json  # Import json for JSON Lines
+import os  # Import os for the output directory
+import threading  # Import threading for the buffer lock
+
+EXPORT_FORMATS = ("csv", "jsonl", "parquet")  # Supported export formats
+BATCH_SIZE = 5000  # Records per part file
+
+FIELDS = ("SITEID", "SITENAME", "FROM_DATE", "TO_DATE", "SECTION", "CODE", "NAME",
+          "SALECOUNT", "SALE_AMT", "SALE_DISC", "SALE_NET",
+          "RETCOUNT", "RET_AMT", "RET_DISC", "RET_NET",
+          "NETCOUNT", "NET_AMT", "NET_DISC", "NET_NET")  # Columns of every record
+_COUNTS = ("SALECOUNT", "RETCOUNT", "NETCOUNT")  # Integer columns; the rest after NAME are amounts
+
+
+def _zeros():
+    return {f: 0 if f in _COUNTS else 0.0 for f in FIELDS[7:]}
+
+
+def report_records(result, site_id, site_name, from_date, to_date):
+    """
+    Return the export records for one site. SECTION is BILLTYPE, TOTAL
+    (the TOTALAMOUNT line, GIFT excluded) or PARTNER (SALECOUNT is the
+    number of invoices, SALE_NET the amount).
+    """
+    base = {"SITEID": site_id, "SITENAME": site_name, "FROM_DATE": str(from_date), "TO_DATE": str(to_date)}
+    records = []
+    totals = _zeros()  # Running TOTALAMOUNT
+    partners = []
+    for row in result:
+        if row[0] in (1, 3):
+            sale_net, sale_disc, ret_net, ret_disc = (float(v or 0) for v in row[3:7])
+            values = {
+                "SALECOUNT": int(row[7] or 0), "SALE_AMT": sale_net + sale_disc, "SALE_DISC": sale_disc, "SALE_NET": sale_net,
+                "RETCOUNT": int(row[8] or 0), "RET_AMT": ret_net + ret_disc, "RET_DISC": ret_disc, "RET_NET": ret_net,
+            }
+            values["NETCOUNT"] = values["SALECOUNT"] + values["RETCOUNT"]
+            values["NET_AMT"] = values["SALE_AMT"] + values["RET_AMT"]
+            values["NET_DISC"] = sale_disc + ret_disc
+            values["NET_NET"] = sale_net + ret_net
+            if row[2].upper() != "GIFT":
+                for key, value in values.items():
+                    totals[key] += value  # Same rule as the report's TOTALAMOUNT line
+            records.append(dict(base, SECTION="BILLTYPE", CODE=str(row[1]), NAME=row[2], **values))
+        elif row[0] == 0:
+            partners.append(row)
+    records.append(dict(base, SECTION="TOTAL", CODE="", NAME="TOTALAMOUNT", **totals))
+    for row in partners:
+        values = _zeros()
+        values["SALECOUNT"] = values["NETCOUNT"] = int(row[7] or 0)
+        values["SALE_NET"] = values["NET_NET"] = float(row[3] or 0)
+        records.append(dict(base, SECTION="PARTNER", CODE=str(row[1]), NAME=row[2] or "", **values))
+    return records
+
+
+def _encode_csv(records):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(FIELDS)
+    for record in records:
+        writer.writerow([f"{record[f]:.2f}" if isinstance(record[f], float) else record[f] for f in FIELDS])
+    return buffer.getvalue()
+
+
+def _encode_jsonl(records):
+    return "".join(json.dumps({f: round(r[f], 2) if isinstance(r[f], float) else r[f] for f in FIELDS}) + "\n"
+                   for r in records)
+
+
+def _encode_parquet(records):
+    import pyarrow as pa  # Imported lazily: only Parquet exports need pyarrow
+    import pyarrow.parquet as pq
+    columns = {f: [r[f] for r in records] for f in FIELDS}
+    types = {f: pa.int64() if f in _COUNTS else pa.float64() if i >= 7 else pa.string() for i, f in enumerate(FIELDS)}
+    table = pa.table({f: pa.array(columns[f], type=types[f]) for f in FIELDS})
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+    return buffer.getvalue()
+
+
+_ENCODERS = {"csv": _encode_csv, "jsonl": _encode_jsonl, "parquet": _encode_parquet}  # Format -> encoder
+
+
+class ReportExporter:
+    """
+    Thread-safe exporter fed with add(site_id, site_name, result) as sites
+    complete. Parts go to archive (a ReportArchive) under prefix, or to
+    directory when no archive is given. Call close() at the end of the run.
+    """
+
+    def __init__(self, fmt, from_date, to_date, archive=None, directory=None, prefix="exports",
+                 batch_size=BATCH_SIZE):
+        if fmt not in _ENCODERS:
+            raise ValueError(f"Unknown export format '{fmt}' (expected one of {', '.join(EXPORT_FORMATS)}).")
+        if fmt == "parquet":
+            try:
+                import pyarrow.parquet  # noqa: F401  Fail before the run, not at the first flush
+            except ImportError:
+                raise ImportError("Parquet export needs pyarrow (pip install pyarrow).") from None
+        if archive is None and directory is None:
+            raise ValueError("ReportExporter needs an archive or a directory.")
+        if archive is None:
+            os.makedirs(directory, exist_ok=True)  # Create the export folder if needed
+        self.fmt = fmt  # Output format
+        self.from_date = from_date  # Report range, stored on every record
+        self.to_date = to_date
+        self.archive = archive  # ZIP to write parts into
+        self.directory = directory  # Folder to write parts into when there is no archive
+        self.prefix = prefix  # Folder name inside the ZIP
+        self.batch_size = batch_size  # Records per part
+        self._lock = threading.Lock()  # Guards the buffer and part counter
+        self._buffer = []  # Records not written yet
+        self.parts = []  # Names of the parts written so far
+        self.sites = 0  # Sites added so far
+
+    def add(self, site_id, site_name, result):
+        """Buffer one site's records and write a part once the batch is full."""
+        records = report_records(result, site_id, site_name, self.from_date, self.to_date)
+        with self._lock:
+            self._buffer.extend(records)
+            self.sites += 1
+            if len(self._buffer) >= self.batch_size:
+                self._flush_locked()
+
+    def close(self):
+        """Write whatever is still buffered."""
+        with self._lock:
+            if self._buffer:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        records, self._buffer = self._buffer, []
+        data = _ENCODERS[self.fmt](records)  # Encode the batch
+        name = f"part-{len(self.parts) + 1:05d}.{self.fmt}"  # Numbered part file
+        if self.archive is not None:
+            name = f"{self.prefix}/{name}"
+            self.archive.add(name, data)  # Stream the part into the ZIP
+        else:
+            name = os.path.join(self.directory, name)
+            with open(name, "wb") as f:
+                f.write(data if isinstance(data, bytes) else data.encode("utf-8"))  # Write the part next to the ZIP
+        self.parts.append(name)
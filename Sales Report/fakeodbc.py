@@ -0,0 +1,196 @@
+"""
+Simulated pyodbc backend for offline benchmarks.
+
+Implements the small part of the pyodbc API the engine uses (connect,
+Connection, Cursor, the Error hierarchy) against synthetic store servers.
+Connect and query latency, login failures, transient link errors and dead
+hosts are configured through CONFIG; result sets look like REPORT_QUERY
+output (every BILLTYPE, hundreds of partner rows) and are deterministic per
+host. Install it in place of the real driver with install() *before*
+importing engine:
+
+    import fakeodbc
+    fakeodbc.install(fakeodbc.FakeConfig(connect_ms=40, query_ms=250))
+    import engine
+"""
+import random  # Import random for latency jitter, failures and synthetic rows
+import sys  # Import sys to register the module as pyodbc
+import threading  # Import threading for the call counters
+import time  # Import time for the simulated latency
+import zlib  # Import zlib for a stable per-host seed
+
+from bench_render import synthetic_result  # Import the synthetic REPORT_QUERY rows
+
+
+class Error(Exception):
+    """Base class, like pyodbc.Error (args[0] is the SQLSTATE)."""
+
+
+class InterfaceError(Error):
+    pass
+
+
+class DatabaseError(Error):
+    pass
+
+
+class OperationalError(DatabaseError):
+    pass
+
+
+class ProgrammingError(DatabaseError):
+    pass
+
+
+class FakeConfig:
+    """Knobs for the simulated servers. Latencies are in milliseconds."""
+
+    def __init__(self, connect_ms=30.0, query_ms=150.0, jitter=0.5, login_failure_rate=0.0,
+                 transient_rate=0.0, down_rate=0.0, partners=200, seed=1):
+        self.connect_ms = connect_ms  # Mean ODBC login time
+        self.query_ms = query_ms  # Mean report query time (execute + fetch)
+        self.jitter = jitter  # Latency varies uniformly by +/- this fraction of the mean
+        self.login_failure_rate = login_failure_rate  # Chance a login fails with a login timeout
+        self.transient_rate = transient_rate  # Chance a report query fails with a dropped link (08S01)
+        self.down_rate = down_rate  # Fraction of hosts that never answer the TCP probe
+        self.partners = partners  # Maximum partner rows per site
+        self.seed = seed  # Makes host behaviour and rows reproducible
+
+
+CONFIG = FakeConfig()  # Active configuration
+STATS = {"connect": 0, "execute": 0, "login_failures": 0, "transient_failures": 0}  # Call counters
+_stats_lock = threading.Lock()
+_rows_cache = {}  # host -> rows, so row generation does not dominate the benchmark
+
+
+def _count(name):
+    with _stats_lock:
+        STATS[name] += 1
+
+
+def _host_seed(host):
+    return zlib.crc32(f"{CONFIG.seed}:{host}".encode())
+
+
+def _sleep(mean_ms):
+    if mean_ms > 0:
+        time.sleep(mean_ms * random.uniform(1 - CONFIG.jitter, 1 + CONFIG.jitter) / 1000.0)  # Releases the GIL like real I/O
+
+
+def host_is_down(host):
+    """True for the hosts that are simulated as unreachable (stable per host)."""
+    return random.Random(_host_seed(host)).random() < CONFIG.down_rate
+
+
+def probe(host, timeout=None):
+    """Stand-in for reachability.probe: no sockets, dead hosts per CONFIG.down_rate."""
+    return not host_is_down(host)
+
+
+def _rows_for(host):
+    rows = _rows_cache.get(host)
+    if rows is None:
+        rnd = random.Random(_host_seed(host))
+        rows = _rows_cache[host] = synthetic_result(rnd, rnd.randint(CONFIG.partners // 2, CONFIG.partners))
+    return rows
+
+
+class Cursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.arraysize = 1
+        self._sets = []  # Pending result sets
+        self._rows = []  # Current result set
+
+    def execute(self, sql, *params):
+        _count("execute")
+        lowered = sql.lower()
+        if lowered.strip() == "select 1":
+            self._sets = [[(1,)]]  # Pool health check
+        elif "union all" in lowered:
+            _sleep(CONFIG.query_ms)
+            if random.random() < CONFIG.transient_rate:
+                _count("transient_failures")
+                raise OperationalError("08S01", "[08S01] Communication link failure (simulated)")
+            rows = _rows_for(self.connection.host)  # REPORT_QUERY rows
+            if "healing_card_transaction" not in lowered or "acxsettlementdetails" not in lowered:
+                rows = [row for row in rows if row[0] in (0, 1, 3)  # Only the sections that were queried
+                        or (row[0] == 2 and "healing_card_transaction" in lowered)
+                        or (row[0] == 4 and "acxsettlementdetails" in lowered)]
+            self._sets = [rows]
+            if "from ax.inventsite where siteid" in lowered:
+                self._sets.insert(0, [("STORE " + self.connection.host,)])  # Batched site name lookup comes first
+        elif "inventsite" in lowered:
+            self._sets = [[("STORE " + self.connection.host,)]]  # Site name lookup
+        else:
+            self._sets = [[]]
+        self._rows = list(self._sets.pop(0))
+        return self
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchmany(self, size=None):
+        size = size or self.arraysize
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def nextset(self):
+        if self._sets:
+            self._rows = list(self._sets.pop(0))
+            return True
+        return None
+
+    def close(self):
+        self._rows = []
+
+
+class Connection:
+    def __init__(self, host):
+        self.host = host
+        self.timeout = 0
+        self.closed = False
+
+    def cursor(self):
+        return Cursor(self)
+
+    def rollback(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def connect(connection_string, timeout=0, **kwargs):
+    """Simulated login: sleeps for the connect latency and fails per CONFIG."""
+    _count("connect")
+    fields = dict(part.split("=", 1) for part in connection_string.split(";") if "=" in part)
+    host = fields.get("SERVER", "")
+    _sleep(CONFIG.connect_ms)
+    if random.random() < CONFIG.login_failure_rate:
+        _count("login_failures")
+        raise OperationalError("HYT00", "[HYT00] Login timeout expired (simulated)")
+    return Connection(host)
+
+
+def install(config=None):
+    """Register this module as pyodbc (call before importing engine) and apply config."""
+    global CONFIG
+    if config is not None:
+        CONFIG = config
+        _rows_cache.clear()
+    sys.modules["pyodbc"] = sys.modules[__name__]
+    return sys.modules[__name__]
+
+
+def reset_stats():
+    with _stats_lock:
+        for key in STATS:
+            STATS[key] = 0
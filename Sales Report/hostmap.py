@@ -0,0 +1,75 @@
+"""
+Persistent site ID -> host map.
+
+When a site is reached through IP-series discovery, the winning host is
+remembered here so later runs connect straight to it. The map is a small
+JSON file written atomically; it is only rediscovered when the known host
+stops accepting logins.
+"""
+import json  # Import json for the on-disk format
+import os  # Import os for paths and atomic replace
+import tempfile  # Import tempfile for atomic writes
+import threading  # Import threading for the map lock
+
+DEFAULT_PATH = os.environ.get(
+    "SALES_REPORT_HOST_MAP",
+    os.path.join(os.path.expanduser("~"), ".sales_report", "site_hosts.json"))  # Default location of the map
+
+
+class SiteHostMap:
+    """Thread-safe {site_id: host} map backed by a JSON file."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path  # JSON file location
+        self._lock = threading.Lock()  # Guards _hosts and _dirty
+        self._hosts = None  # Loaded lazily on first use
+        self._dirty = False  # True when there are unsaved changes
+
+    def _load_locked(self):
+        if self._hosts is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._hosts = {str(k): str(v) for k, v in json.load(f).items()}  # Read the saved map
+            except (OSError, ValueError, AttributeError):
+                self._hosts = {}  # Missing or corrupt file: start empty
+        return self._hosts
+
+    def get(self, site_id):
+        """Return the known host for site_id, or None."""
+        with self._lock:
+            return self._load_locked().get(site_id)
+
+    def set(self, site_id, host):
+        """Remember host as the server for site_id (saved on the next save())."""
+        with self._lock:
+            hosts = self._load_locked()
+            if hosts.get(site_id) != host:
+                hosts[site_id] = host
+                self._dirty = True
+
+    def forget(self, site_id):
+        """Drop the known host for site_id so it is rediscovered."""
+        with self._lock:
+            if self._load_locked().pop(site_id, None) is not None:
+                self._dirty = True
+
+    def save(self):
+        """Write pending changes to disk atomically. Errors are not fatal to a run."""
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = dict(self._hosts)
+            self._dirty = False
+        try:
+            folder = os.path.dirname(self.path) or "."
+            os.makedirs(folder, exist_ok=True)  # Create the folder on first use
+            fd, tmp_path = tempfile.mkstemp(prefix=".site_hosts.", dir=folder)  # Temp file next to the target
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, indent=1, sort_keys=True)  # Write the map
+            os.replace(tmp_path, self.path)  # Atomically swap it in
+        except OSError:
+            with self._lock:
+                self._dirty = True  # Try again on the next save
+
+
+HOST_MAP = SiteHostMap()  # Process-wide site -> host map
@@ -0,0 +1,89 @@
+"""
+Batched, bounded log pipeline for the GUI.
+
+Worker threads call LogQueue.put(message), which only timestamps the line
+and appends it to a bounded queue. The Tk main thread drains the queue on a
+fixed interval and inserts everything that arrived in one go, so log volume
+never floods the event loop. If the event loop stalls, the oldest waiting
+lines are dropped and counted instead of piling up in memory. Every line is also handed to the standard logging
+module; the rotating log file is written by a QueueListener thread, so file
+I/O never blocks report generation either.
+"""
+import logging  # Import logging for the log file
+import logging.handlers  # Import the queue and rotating file handlers
+import os  # Import os for the default log path
+import queue  # Import queue for the thread-safe buffers
+import threading  # Import threading for the dropped-line counter
+from datetime import datetime  # Import datetime for the line timestamps
+
+DEFAULT_LOG_FILE = os.environ.get("SALES_REPORT_LOG") or os.path.join(
+    os.path.expanduser("~"), ".sales_report", "sales_report.log")  # Default location of the full log
+LOG_MAX_BYTES = 5 * 1024 * 1024  # Rotate the log file at this size
+LOG_BACKUPS = 5  # Rotated files to keep
+MAX_PENDING = 5000  # Lines waiting for the widget before the oldest are dropped
+
+LOGGER = logging.getLogger("sales_report")  # Logger for the full log
+
+
+def setup_file_logging(path=DEFAULT_LOG_FILE, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUPS):
+    """
+    Send LOGGER to a rotating file written by a background thread. Returns
+    the started QueueListener; call its stop() at exit to flush the file.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)  # Create the log folder if needed
+    file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                        encoding="utf-8")  # Rotating log file
+    file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    records = queue.SimpleQueue()  # Hand-off between callers and the writer thread
+    LOGGER.addHandler(logging.handlers.QueueHandler(records))
+    LOGGER.setLevel(logging.INFO)
+    LOGGER.propagate = False  # Keep the lines out of the root logger
+    listener = logging.handlers.QueueListener(records, file_handler)
+    listener.start()  # Writes the file off the calling threads
+    return listener
+
+
+class LogQueue:
+    """Thread-safe queue of timestamped log lines, drained in batches."""
+
+    def __init__(self, logger=LOGGER, maxsize=MAX_PENDING):
+        self._lines = queue.Queue(maxsize=maxsize)  # Lines waiting for the widget
+        self._dropped = 0  # Lines dropped since the last drain
+        self._dropped_lock = threading.Lock()  # Guards _dropped
+        self.logger = logger  # Receives every line for the log file
+
+    def put(self, message):
+        """
+        Queue a message from any thread. Never blocks on the UI or the disk:
+        when the queue is full the oldest waiting line is dropped.
+        """
+        line = f"{datetime.now().strftime('%H:%M:%S')} - {message}"  # Timestamp when it happened
+        self.logger.info(message)  # The log file still gets every line
+        while True:
+            try:
+                self._lines.put_nowait(line)
+                return
+            except queue.Full:
+                try:
+                    self._lines.get_nowait()  # Make room by dropping the oldest line
+                except queue.Empty:
+                    continue  # A drain emptied it meanwhile
+                with self._dropped_lock:
+                    self._dropped += 1
+
+    def drain(self, limit=None):
+        """
+        Return the queued lines (at most limit) in arrival order, preceded by
+        a notice if lines were dropped since the last drain.
+        """
+        lines = []
+        with self._dropped_lock:
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            lines.append(f"... {dropped} older log lines dropped; the log file has them all.")
+        while limit is None or len(lines) < limit:
+            try:
+                lines.append(self._lines.get_nowait())
+            except queue.Empty:
+                break
+        return lines
@@ -0,0 +1,204 @@
+"""
+Per-site stage timings and the end-of-run metrics report.
+
+RunMetrics.site(sid) marks the calling worker thread as working on a site;
+stage("connect") and friends, called anywhere below it, add their elapsed
+time to that site. Outside a site (or without a RunMetrics) they cost next
+to nothing. At the end of the run summary() gives p50/p95/max per stage,
+the slowest sites and wall vs. CPU time, and write_json()/write_prometheus()
+save it for tracking across days (the latter in node_exporter textfile
+format).
+"""
+import json  # Import json for the metrics file
+import math  # Import math for the percentile rank
+import os  # Import os for atomic file replacement
+import threading  # Import threading for the lock and the per-thread current site
+import time  # Import time for wall and CPU clocks
+from contextlib import contextmanager  # Import contextmanager for the timing helpers
+
+STAGES = ("connect", "execute", "fetch", "render", "compress", "write")  # Stages in processing order
+SLOWEST_SITES = 10  # Sites listed in the summary
+
+_current = threading.local()  # .site is the SiteMetrics the thread is working on
+
+
+class SiteMetrics:
+    """Timings and counters for one site (summed over its attempts)."""
+
+    def __init__(self, site_id):
+        self.site_id = site_id
+        self.stages = {}  # Stage -> seconds
+        self.rows = 0  # Rows fetched
+        self.attempts = 0  # Times the site was started
+        self.seconds = 0.0  # Wall time across attempts
+        self.ok = None  # True/False once the site is finished
+        self.error = None  # Final error message
+
+    def as_dict(self):
+        return {"site_id": self.site_id, "ok": self.ok, "seconds": round(self.seconds, 4), "rows": self.rows,
+                "attempts": self.attempts, "stages": {k: round(v, 4) for k, v in self.stages.items()},
+                "error": self.error}
+
+
+@contextmanager
+def stage(name):
+    """Time a block and add it to the current site's stage name."""
+    site = getattr(_current, "site", None)
+    if site is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        site.stages[name] = site.stages.get(name, 0.0) + time.perf_counter() - start
+
+
+def count_rows(rows):
+    """Add rows to the current site's row count."""
+    site = getattr(_current, "site", None)
+    if site is not None:
+        site.rows += rows
+
+
+def _percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class RunMetrics:
+    """Collects SiteMetrics for one run and produces the summary."""
+
+    def __init__(self):
+        self._lock = threading.Lock()  # Guards the site table
+        self.sites = {}  # Site ID -> SiteMetrics
+        self.retries = 0  # Retried attempts
+        self.started = time.time()  # Run start (epoch seconds)
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self.wall_seconds = self.cpu_seconds = None  # Set by finish()
+
+    def _get(self, site_id):
+        with self._lock:
+            site = self.sites.get(site_id)
+            if site is None:
+                site = self.sites[site_id] = SiteMetrics(site_id)
+            return site
+
+    @contextmanager
+    def site(self, site_id):
+        """Attribute stage() calls made by this thread to site_id until the block ends."""
+        site = self._get(site_id)
+        site.attempts += 1
+        previous = getattr(_current, "site", None)
+        _current.site = site
+        start = time.perf_counter()
+        try:
+            yield site
+        finally:
+            site.seconds += time.perf_counter() - start
+            _current.site = previous
+
+    def add_stage(self, site_id, name, seconds):
+        """Record a stage measured outside the site's worker thread (e.g. ZIP writing)."""
+        site = self._get(site_id)
+        site.stages[name] = site.stages.get(name, 0.0) + seconds
+
+    def finish_site(self, site_id, ok, attempts=None, error=None):
+        """Record the final outcome of a site."""
+        site = self._get(site_id)
+        site.ok = ok
+        site.error = None if error is None else str(error)
+        if attempts is not None and attempts > 1:
+            with self._lock:
+                self.retries += attempts - 1
+
+    def finish(self):
+        """Stop the run clocks."""
+        self.wall_seconds = time.perf_counter() - self._wall_start
+        self.cpu_seconds = time.process_time() - self._cpu_start
+
+    def summary(self):
+        """Return the run summary as a JSON-serializable dict."""
+        if self.wall_seconds is None:
+            self.finish()
+        with self._lock:
+            sites = list(self.sites.values())
+        names = list(STAGES) + sorted({name for s in sites for name in s.stages} - set(STAGES))
+        stages = {}
+        for name in names:
+            values = sorted(s.stages[name] for s in sites if name in s.stages)
+            if values:
+                stages[name] = {"count": len(values), "total": round(sum(values), 4),
+                                "p50": round(_percentile(values, 0.50), 4), "p95": round(_percentile(values, 0.95), 4),
+                                "max": round(values[-1], 4)}
+        slowest = sorted(sites, key=lambda s: s.seconds, reverse=True)[:SLOWEST_SITES]
+        return {
+            "started": self.started,
+            "wall_seconds": round(self.wall_seconds, 4),
+            "cpu_seconds": round(self.cpu_seconds, 4),
+            "sites": len(sites),
+            "succeeded": sum(1 for s in sites if s.ok),
+            "failed": sum(1 for s in sites if s.ok is False),
+            "retries": self.retries,
+            "rows": sum(s.rows for s in sites),
+            "stages": stages,
+            "slowest_sites": [s.as_dict() for s in slowest],
+        }
+
+    def format_summary(self):
+        """Return a short human-readable summary for the log."""
+        summary = self.summary()
+        lines = [f"Run: {summary['sites']} sites, {summary['retries']} retries, {summary['rows']} rows, "
+                 f"wall {summary['wall_seconds']:.1f}s, CPU {summary['cpu_seconds']:.1f}s"]
+        for name, s in summary["stages"].items():
+            lines.append(f"  {name:<10} p50 {s['p50']:.3f}s  p95 {s['p95']:.3f}s  max {s['max']:.3f}s  total {s['total']:.1f}s")
+        if summary["slowest_sites"]:
+            lines.append("  slowest: " + ", ".join(f"{s['site_id']} ({s['seconds']:.1f}s)"
+                                                    for s in summary["slowest_sites"][:5]))
+        return "\n".join(lines)
+
+    def write_json(self, path):
+        """Write summary() plus every site's timings to path."""
+        data = self.summary()
+        with self._lock:
+            data["per_site"] = [s.as_dict() for s in self.sites.values()]
+        _write_atomic(path, json.dumps(data, indent=1))
+
+    def write_prometheus(self, path, prefix="sales_report"):
+        """Write the summary in Prometheus text exposition format (for the node_exporter textfile collector)."""
+        summary = self.summary()
+        lines = [
+            f"# HELP {prefix}_stage_seconds Per-site time spent in each processing stage.",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for name, s in summary["stages"].items():
+            for quantile, key in (("0.5", "p50"), ("0.95", "p95"), ("1", "max")):
+                lines.append(f'{prefix}_stage_seconds{{stage="{name}",quantile="{quantile}"}} {s[key]}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {s["total"]}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {s["count"]}')
+        for metric, kind, help_text, value in (
+                ("sites_succeeded", "gauge", "Sites that produced a report in the last run.", summary["succeeded"]),
+                ("sites_failed", "gauge", "Sites that failed in the last run.", summary["failed"]),
+                ("retries", "gauge", "Retried site attempts in the last run.", summary["retries"]),
+                ("rows", "gauge", "Result rows fetched in the last run.", summary["rows"]),
+                ("run_wall_seconds", "gauge", "Wall-clock duration of the last run.", summary["wall_seconds"]),
+                ("run_cpu_seconds", "gauge", "Process CPU time used by the last run.", summary["cpu_seconds"]),
+                ("last_run_timestamp_seconds", "gauge", "Start time of the last run.", round(summary["started"], 3))):
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+            lines.append(f"{prefix}_{metric} {value}")
+        _write_atomic(path, "\n".join(lines) + "\n")
+
+
+def _write_atomic(path, text):
+    """Write text to path via a temporary file so readers never see a partial file."""
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)  # Create the folder on first use
+    tmp_path = f"{path}.{os.getpid()}.tmp"  # Temp file next to the target
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)  # Atomically swap it in
@@ -0,0 +1,127 @@
+"""
+Render and archive stages of the batch pipeline.
+
+run_batch fetches sites on the scheduler's I/O threads (high concurrency)
+and hands each result to RenderArchiveStages.submit(). Rendering runs in
+its own executor: one thread by default, or a process pool so CPU-bound
+formatting does not compete with the fetch threads (or the Tk main loop)
+for the GIL. A single archive thread takes rendered reports in submission
+order and passes them to on_done, which writes them to the ZIP.
+
+With a packer (see archive.EntryPacker) every report is also compressed in
+the render stage, right where it was rendered: in the render processes, or
+on PACK_THREADS threads when rendering in-process (zlib and lzma release
+the GIL, so that uses every core as well). The archive thread then only
+appends finished bytes.
+
+The stages are joined by a bounded queue. When rendering or archiving falls
+behind, submit() blocks, the scheduler stops starting new sites, and memory
+stays flat however many sites the batch has.
+"""
+import concurrent.futures  # Import concurrent.futures for the render executors
+import os  # Import os for the CPU count
+import queue  # Import queue for the bounded hand-off
+import threading  # Import threading for the archive thread
+import time  # Import time for the compression timing
+
+from renderer import render_daily_timed, render_timed  # Import the picklable render entry points
+
+QUEUE_SIZE = 64  # Reports rendered or waiting to be archived at any time
+PACK_THREADS = os.cpu_count() or 1  # Render-and-compress threads when there are no render processes
+
+
+def render_and_pack(packer, keep_text, result, site_id, site_name, from_date, to_date, days=None):
+    """
+    Render one site like render_timed / render_daily_timed, then compress
+    every entry with packer. Returns (text or None, (packed_entries,
+    compress_seconds), render_seconds); the text is only sent back when
+    keep_text is set (e.g. for the checkpoint). Module-level, so it can run
+    in a process pool.
+    """
+    if days is None:
+        text, seconds = render_timed(result, site_id, site_name, from_date, to_date)
+        entries = {f"{site_id}.txt": text}
+    else:
+        text, seconds = render_daily_timed(result, site_id, site_name, from_date, to_date, days)
+        entries = text
+    start = time.perf_counter()
+    packed = [packer.pack(name, body) for name, body in entries.items()]
+    return (text if keep_text else None), (packed, time.perf_counter() - start), seconds
+
+
+class RenderArchiveStages:
+    """
+    on_done(site_id, context, text, error, render_seconds, packed) is called
+    on the archive thread for every submitted site, in submission order;
+    error is None on success. context is passed through unchanged. Sites
+    submitted with days get {entry_name: text} instead of the text (see
+    renderer.render_daily_timed). Without a packer packed is None; with one
+    it is (packed_entries, compress_seconds) and text is None unless
+    keep_text is set.
+    """
+
+    def __init__(self, on_done, processes=0, queue_size=QUEUE_SIZE, packer=None, keep_text=True):
+        self.on_done = on_done  # Archive stage callback
+        self.processes = processes  # 0 = render on one thread in this process
+        self.packer = packer  # Compresses entries in the render stage
+        self.keep_text = keep_text  # Also send the rendered text to on_done when packing
+        if processes:
+            self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=processes)  # CPU-bound, outside the GIL
+        elif packer is not None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=PACK_THREADS,
+                                                                   thread_name_prefix="render")  # Compression runs without the GIL
+        else:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+        self._queue = queue.Queue(maxsize=queue_size)  # (site_id, context, future); bounded for backpressure
+        self.error = None  # First exception raised by on_done
+        self._archiver = threading.Thread(target=self._archive_loop, name="archive", daemon=True)
+        self._archiver.start()
+
+    def submit(self, site_id, context, result, site_name, from_date, to_date, days=None):
+        """Queue one site for rendering; blocks while the stages are full."""
+        if self.processes:
+            result = [tuple(row) for row in result]  # Plain tuples pickle cheaply (and pyodbc rows may not pickle at all)
+        if self.packer is not None:
+            future = self._executor.submit(render_and_pack, self.packer, self.keep_text, result, site_id, site_name,
+                                           from_date, to_date, days)
+        elif days is None:
+            future = self._executor.submit(render_timed, result, site_id, site_name, from_date, to_date)
+        else:
+            future = self._executor.submit(render_daily_timed, result, site_id, site_name, from_date, to_date, days)
+        self._queue.put((site_id, context, future))  # Backpressure on the fetch loop
+
+    def _archive_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            site_id, context, future = item
+            try:
+                if self.packer is not None:
+                    text, packed, seconds = future.result()  # Wait for this site's render and compression
+                else:
+                    (text, seconds), packed = future.result(), None  # Wait for this site's render
+                error = None
+            except Exception as e:
+                text, seconds, packed, error = None, 0.0, None, e
+            if self.error is not None:
+                continue  # Archiving already failed; just drain so submit() never blocks forever
+            try:
+                self.on_done(site_id, context, text, error, seconds, packed)
+            except Exception as e:
+                self.error = e  # e.g. disk full; re-raised by close()
+
+    def close(self):
+        """Wait until everything submitted is archived, then shut down. Re-raises an archive failure."""
+        self._queue.put(None)
+        self._archiver.join()
+        self._executor.shutdown()
+        if self.error is not None:
+            raise self.error
+
+    def abort(self):
+        """Stop without waiting for queued renders (used when the fetch loop fails)."""
+        self.error = self.error or RuntimeError("pipeline aborted")
+        self._queue.put(None)
+        self._archiver.join()
+        self._executor.shutdown(wait=False, cancel_futures=True)
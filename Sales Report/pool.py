@@ -0,0 +1,247 @@
+"""
+Process-wide pool of SQL Server connections.
+
+Connections are keyed by (host, database, user) and survive across sites and
+across consecutive runs in the same process, so the login handshake to a
+store server is only paid once. Callers get a PooledConnection that behaves
+like a pyodbc connection; calling close() on it hands the connection back to
+the pool instead of closing the socket.
+"""
+import hashlib  # Import hashlib to fingerprint passwords without storing them
+import threading  # Import threading for the pool lock
+import time  # Import time for idle/health-check bookkeeping
+
+import pyodbc  # Import pyodbc for database connection
+
+DEFAULT_MAX_PER_HOST = 10  # Maximum open connections (idle + in use) per host
+DEFAULT_IDLE_TIMEOUT = 300.0  # Seconds an idle connection is kept before it is closed
+DEFAULT_HEALTH_CHECK_AFTER = 30.0  # Idle seconds after which a connection is pinged before reuse
+
+
+def _fingerprint(password):
+    """Return a digest of the password so pooled connections are only reused with the same credentials."""
+    return hashlib.sha256(password.encode("utf-8")).hexdigest()
+
+
+class PooledConnection:
+    """
+    Thin wrapper around a pyodbc connection checked out of a ConnectionPool.
+
+    Attribute access is forwarded to the real connection. close() returns it
+    to the pool; discard() really closes it (use after a broken connection).
+    """
+
+    def __init__(self, pool, key, raw, fingerprint):
+        self._pool = pool  # Owning pool
+        self._key = key  # (host, database, user)
+        self._raw = raw  # Underlying pyodbc connection
+        self._fingerprint = fingerprint  # Password digest used to open it
+        self._returned = False  # Set once the connection has been handed back
+
+    @property
+    def host(self):
+        """Host this connection is attached to."""
+        return self._key[0]
+
+    def __getattr__(self, name):
+        if self._returned:
+            raise pyodbc.ProgrammingError("Attempt to use a connection that was returned to the pool.")
+        return getattr(self._raw, name)  # Forward everything else to the pyodbc connection
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)  # Wrapper state
+        else:
+            setattr(self._raw, name, value)  # e.g. connection.timeout
+
+    def close(self):
+        """Return the connection to the pool."""
+        if not self._returned:
+            self._returned = True  # Prevent double release
+            self._pool._release(self._key, self._raw, self._fingerprint)
+
+    def discard(self):
+        """Close the underlying connection without returning it to the pool."""
+        if not self._returned:
+            self._returned = True  # Prevent double release
+            self._pool._discard(self._key)
+            _close_quietly(self._raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and issubclass(exc_type, pyodbc.Error):
+            self.discard()  # A driver error may have left the connection unusable
+        else:
+            self.close()
+        return False
+
+
+def _close_quietly(raw):
+    """Close a pyodbc connection, ignoring errors from already-dead sockets."""
+    try:
+        raw.close()
+    except pyodbc.Error:
+        pass
+
+
+class ConnectionPool:
+    """
+    Pool of pyodbc connections keyed by (host, database, user).
+
+    - Idle connections are reused LIFO so the warmest one is picked first.
+    - Connections idle for longer than health_check_after seconds are pinged
+      with SELECT 1 before reuse; dead ones are dropped and replaced.
+    - Connections idle for longer than idle_timeout seconds are closed.
+    - At most max_per_host connections (idle + in use) exist per host;
+      acquire() waits for a free slot when the cap is reached.
+    """
+
+    def __init__(self, max_per_host=DEFAULT_MAX_PER_HOST, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 health_check_after=DEFAULT_HEALTH_CHECK_AFTER):
+        self.max_per_host = max_per_host  # Per-host connection cap
+        self.idle_timeout = idle_timeout  # Idle eviction threshold
+        self.health_check_after = health_check_after  # Ping threshold
+        self._cond = threading.Condition()  # Guards all state below
+        self._idle = {}  # key -> list of (raw connection, fingerprint, released_at)
+        self._open_per_host = {}  # host -> number of open connections (idle + in use)
+        self._stats = {"created": 0, "reused": 0, "evicted": 0, "failed_health_checks": 0}  # Counters
+
+    def acquire(self, host, database, username, password, connect, wait_timeout=None):
+        """
+        Return a PooledConnection for (host, database, username).
+
+        `connect` is a zero-argument callable that opens a new pyodbc
+        connection; it is only called when no healthy idle connection exists.
+        Exceptions raised by `connect` propagate to the caller.
+        """
+        key = (host, database, username)  # Pool key
+        fingerprint = _fingerprint(password)  # Password digest
+        deadline = None if wait_timeout is None else time.monotonic() + wait_timeout  # Slot wait deadline
+        while True:
+            taken = self._take_idle(key, fingerprint, deadline)  # Reuse an idle connection or reserve a slot
+            if taken is None:
+                break  # Nothing reusable: a slot has been reserved for a new connection
+            raw, released_at = taken
+            if self._is_healthy(raw, released_at):
+                return PooledConnection(self, key, raw, fingerprint)  # Reuse the idle connection
+            with self._cond:
+                self._stats["failed_health_checks"] += 1  # Count the dead connection
+            self._discard(key)  # Free its slot and try again
+            _close_quietly(raw)
+        try:
+            raw = connect()  # Open a brand-new connection in the reserved slot
+        except BaseException:
+            self._discard(key)  # Give the slot back if the login failed
+            raise
+        with self._cond:
+            self._stats["created"] += 1  # Count the new connection
+        return PooledConnection(self, key, raw, fingerprint)
+
+    def _take_idle(self, key, fingerprint, deadline):
+        """
+        Pop a reusable idle connection for key as (raw, released_at), or
+        reserve a slot for a new one and return None. Waits while the host is
+        at its cap, until deadline (None = forever).
+        """
+        host = key[0]
+        with self._cond:
+            while True:
+                self._evict_expired_locked()  # Drop connections idle for too long
+                idle = self._idle.get(key, [])
+                while idle:
+                    raw, fp, released_at = idle.pop()  # Newest first
+                    if fp == fingerprint:
+                        self._stats["reused"] += 1  # Count the reuse
+                        return raw, released_at
+                    self._open_per_host[host] -= 1  # Opened with a different password: drop it
+                    _close_quietly(raw)
+                if self._open_per_host.get(host, 0) < self.max_per_host:
+                    self._open_per_host[host] = self._open_per_host.get(host, 0) + 1  # Reserve a slot
+                    return None
+                if self._close_one_idle_for_host_locked(host):
+                    continue  # Freed a slot held by another database/user on the same host
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise pyodbc.OperationalError(f"Timed out waiting for a free connection slot to {host}.")
+                self._cond.wait(timeout=1.0 if remaining is None else min(remaining, 1.0))  # Wait for a release
+
+    def _close_one_idle_for_host_locked(self, host):
+        """Close one idle connection for host held under another key (e.g. another database)."""
+        for key, idle in self._idle.items():
+            if key[0] == host and idle:
+                raw, _, _ = idle.pop(0)  # Oldest first
+                self._open_per_host[host] -= 1
+                self._stats["evicted"] += 1
+                _close_quietly(raw)
+                return True
+        return False
+
+    def _is_healthy(self, raw, released_at):
+        """Ping a connection that has been idle for a while."""
+        if time.monotonic() - released_at < self.health_check_after:
+            return True  # Recently used: assume it is alive
+        try:
+            cursor = raw.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except pyodbc.Error:
+            return False
+
+    def _release(self, key, raw, fingerprint):
+        """Put a connection back into the idle list."""
+        try:
+            raw.rollback()  # End any implicit transaction left open by the caller
+        except pyodbc.Error:
+            self._discard(key)  # The connection is broken
+            _close_quietly(raw)
+            return
+        with self._cond:
+            self._idle.setdefault(key, []).append((raw, fingerprint, time.monotonic()))  # Park it
+            self._cond.notify()  # Wake one waiter
+
+    def _discard(self, key):
+        """Forget one open connection for key's host (the caller closes it)."""
+        with self._cond:
+            self._open_per_host[key[0]] = max(0, self._open_per_host.get(key[0], 0) - 1)
+            self._cond.notify()
+
+    def _evict_expired_locked(self):
+        """Close connections that have been idle longer than idle_timeout."""
+        cutoff = time.monotonic() - self.idle_timeout
+        for key, idle in self._idle.items():
+            while idle and idle[0][2] < cutoff:
+                raw, _, _ = idle.pop(0)
+                self._open_per_host[key[0]] -= 1
+                self._stats["evicted"] += 1
+                _close_quietly(raw)
+
+    def evict_idle(self):
+        """Close idle connections that have expired. Safe to call periodically."""
+        with self._cond:
+            self._evict_expired_locked()
+            self._cond.notify_all()
+
+    def close_all(self):
+        """Close every idle connection. Checked-out connections are closed when released."""
+        with self._cond:
+            for key, idle in self._idle.items():
+                while idle:
+                    raw, _, _ = idle.pop()
+                    self._open_per_host[key[0]] -= 1
+                    _close_quietly(raw)
+            self._cond.notify_all()
+
+    def stats(self):
+        """Return a snapshot of pool counters plus current idle/open counts."""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot["idle"] = sum(len(idle) for idle in self._idle.values())
+            snapshot["open"] = sum(self._open_per_host.values())
+            return snapshot
+
+
+POOL = ConnectionPool()  # Process-wide pool shared by every run
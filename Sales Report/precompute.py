@@ -0,0 +1,339 @@
+"""
+Overnight pre-computation of the next morning's reports.
+
+Everyone asks for yesterday's summary when the stores open, so the warm-up
+daemon fetches it (and month-to-date) for a configured site list during the
+night and keeps the rows in a local SQLite store. Runs that are given the
+store (cli.py --precomputed, and the desktop app whenever the default store
+exists) answer those sites from it without touching the store servers and
+only render the report.
+
+The warm-up runs at low process priority with a small number of sites in
+flight and tight per-subnet caps, so it never competes with the stores'
+own overnight jobs. Sites that could not be pre-computed are recorded in
+the store and are simply fetched live in the morning:
+
+    python precompute.py --username sa --database AXDB --site-file sites.csv --at 02:30
+    python precompute.py ... --once --windows yesterday
+"""
+import argparse  # Import argparse for the daemon options
+import json  # Import json to store the rows
+import os  # Import os for the default path and process priority
+import sqlite3  # Import sqlite3 for the local store
+import sys  # Import sys for the platform check and exit codes
+import threading  # Import threading for the connection lock
+import time  # Import time for timestamps and sleeping until the next run
+from datetime import date, datetime, timedelta  # Import date helpers for the windows
+
+from daycache import AMOUNT_COLUMNS, to_decimal  # Import the amount columns and their conversion
+from queries import DEFAULT_PROFILE, DEFAULT_SECTIONS, PROFILES, as_date, query_variant  # Import the profiles and helpers
+
+DEFAULT_PATH = os.environ.get(
+    "SALES_REPORT_PRECOMPUTED",
+    os.path.join(os.path.expanduser("~"), ".sales_report", "precomputed.sqlite3"))  # Default store file
+WINDOWS = ("yesterday", "mtd")  # Date windows the warm-up knows how to compute
+DEFAULT_AT = "02:30"  # Local time of the nightly run
+WARMUP_WORKERS = 4  # Sites in flight at the start of a warm-up
+WARMUP_SUBNET_CAPS = {"10.16": 6, "10.28": 6}  # Maximum warm-up sites in flight per store subnet
+KEEP_DAYS = 40  # Entries computed longer ago than this are pruned after each run
+
+_SCHEMA = """
+create table if not exists reports (
+    site_id text not null,
+    database_name text not null,
+    from_date text not null,
+    to_date text not null,
+    query_version not null,
+    site_name text,
+    rows text not null,
+    computed_at real not null,
+    primary key (site_id, database_name, from_date, to_date, query_version)
+);
+create table if not exists failures (
+    site_id text not null,
+    database_name text not null,
+    from_date text not null,
+    to_date text not null,
+    error text,
+    failed_at real not null,
+    primary key (site_id, database_name, from_date, to_date)
+);
+"""
+
+
+def window_dates(window, today=None):
+    """Return (from_date, to_date) as YYYY-MM-DD for a window in WINDOWS."""
+    yesterday = (today or date.today()) - timedelta(days=1)  # Last closed business day
+    if window == "yesterday":
+        return yesterday.isoformat(), yesterday.isoformat()
+    if window == "mtd":
+        return yesterday.replace(day=1).isoformat(), yesterday.isoformat()  # On the 1st this is last month
+    raise ValueError(f"Unknown window '{window}', expected one of {', '.join(WINDOWS)}.")
+
+
+class PrecomputedStore:
+    """
+    Pre-computed (rows, site_name) per site and date range. get() is safe to
+    call from several worker threads; SQLite access is serialized through
+    one connection.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path  # SQLite file location
+        self._lock = threading.Lock()  # Serializes access to _conn and the counters
+        self._conn = None  # Opened lazily
+        self.hits = 0  # Requests answered from the store
+        self.misses = 0  # Requests that had to be fetched live
+
+    def _db(self):
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)  # Create the folder on first use
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)  # Shared across worker threads
+            self._conn.execute("pragma journal_mode=wal")  # Morning readers do not block a late warm-up
+            self._conn.executescript(_SCHEMA)  # Create the tables
+        return self._conn
+
+    def close(self):
+        """Close the SQLite connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @staticmethod
+    def _key(site_id, database, from_date, to_date):
+        return (site_id, database, as_date(from_date).isoformat(), as_date(to_date).isoformat())
+
+    def get(self, site_id, database, from_date, to_date, sections=DEFAULT_SECTIONS):
+        """Return the pre-computed (result, site_name), or None if the range was not pre-computed."""
+        key = self._key(site_id, database, from_date, to_date)
+        with self._lock:
+            row = self._db().execute(
+                "select rows, site_name from reports where site_id = ? and database_name = ? "
+                "and from_date = ? and to_date = ? and query_version = ?", key + (query_variant(sections),)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        result = [tuple(to_decimal(v) if i in AMOUNT_COLUMNS else v for i, v in enumerate(values))
+                  for values in json.loads(row[0])]  # Amounts were saved as strings to stay exact
+        return result, row[1] if row[1] is not None else "Unknown Site"
+
+    def put(self, site_id, database, from_date, to_date, result, site_name, sections=DEFAULT_SECTIONS):
+        """Save the rows of one site and clear any failure recorded for it."""
+        key = self._key(site_id, database, from_date, to_date)
+        rows = json.dumps([[None if v is None else str(v) if i in AMOUNT_COLUMNS else v for i, v in enumerate(row)]
+                           for row in result])
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute("insert or replace into reports values (?, ?, ?, ?, ?, ?, ?, ?)",
+                           key + (query_variant(sections), site_name, rows, time.time()))
+                db.execute("delete from failures where site_id = ? and database_name = ? "
+                           "and from_date = ? and to_date = ?", key)
+
+    def record_failure(self, site_id, database, from_date, to_date, error):
+        """Remember that a site could not be pre-computed (it is fetched live instead)."""
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute("insert or replace into failures values (?, ?, ?, ?, ?, ?)",
+                           self._key(site_id, database, from_date, to_date) + (str(error), time.time()))
+
+    def failures(self, database=None, from_date=None, to_date=None):
+        """Return {(site_id, from_date, to_date): error} for sites whose last warm-up failed."""
+        clauses, params = [], []
+        for column, value in (("database_name", database), ("from_date", from_date), ("to_date", to_date)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(as_date(value).isoformat() if column != "database_name" else value)
+        where = (" where " + " and ".join(clauses)) if clauses else ""
+        with self._lock:
+            rows = self._db().execute("select site_id, from_date, to_date, error from failures" + where, params).fetchall()
+        return {(sid, start, end): error for sid, start, end, error in rows}
+
+    def prune(self, keep_days=KEEP_DAYS):
+        """Drop entries and failures older than keep_days. Returns the number of reports removed."""
+        cutoff = time.time() - keep_days * 86400
+        with self._lock:
+            db = self._db()
+            with db:
+                removed = db.execute("delete from reports where computed_at < ?", (cutoff,)).rowcount
+                db.execute("delete from failures where failed_at < ?", (cutoff,))
+        return removed
+
+    def stats(self):
+        """Return the hit/miss counters."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def writer(self, database, from_date, to_date, sections=DEFAULT_SECTIONS):
+        """Return a run_batch sink that saves the rows of every site for this range."""
+        return _StoreWriter(self, database, from_date, to_date, sections)
+
+
+class _StoreWriter:
+    """Sink with the exporter interface (add/close), passed to run_batch by the warm-up."""
+
+    def __init__(self, store, database, from_date, to_date, sections):
+        self.store = store
+        self.database = database
+        self.from_date = from_date
+        self.to_date = to_date
+        self.sections = sections
+        self.count = 0  # Sites saved
+
+    def add(self, site_id, site_name, result):
+        self.store.put(site_id, self.database, self.from_date, self.to_date, result, site_name, self.sections)
+        self.count += 1
+
+    def close(self):
+        pass  # Every site is committed as it arrives
+
+
+def open_default():
+    """Return the default store if a warm-up has created it, else None (used by the desktop app)."""
+    return PrecomputedStore(DEFAULT_PATH) if os.path.isfile(DEFAULT_PATH) else None
+
+
+def lower_priority():
+    """Run this process at background priority so the warm-up never slows anything else down."""
+    try:
+        if sys.platform == "win32":
+            import ctypes  # Only needed on Windows
+            BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+            ctypes.windll.kernel32.SetPriorityClass(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                    BELOW_NORMAL_PRIORITY_CLASS)
+        else:
+            os.nice(10)
+    except (OSError, AttributeError):
+        pass  # Not allowed or not supported; run at normal priority
+
+
+def run_warmup(store, site_ids, windows, username, password, database, ip_series_choice, custom_ip=None,
+               log=print, max_workers=WARMUP_WORKERS, subnet_caps=None, today=None, sections=DEFAULT_SECTIONS):
+    """
+    Fetch every site for every window into store. Sites that fail are
+    recorded with store.record_failure(). Only morning requests for the same
+    report sections are served from the result. Returns {window: (saved, failed)}.
+    """
+    import engine  # Imported here so the store can be used without pyodbc installed
+
+    summary = {}
+    for window in windows:
+        from_date, to_date = window_dates(window, today)
+        log(f"Pre-computing {window} ({from_date} to {to_date}) for {len(site_ids)} sites...")
+        writer = store.writer(database, from_date, to_date, sections)
+        try:
+            _, failed_sites = engine.run_batch(
+                site_ids, from_date, to_date, username, password, database, ip_series_choice, custom_ip,
+                log=log, max_workers=max_workers,
+                subnet_caps=WARMUP_SUBNET_CAPS if subnet_caps is None else subnet_caps,
+                result_cache=None, exporters=[writer], sections=sections,
+                render=False)  # The writer saves the rows as each site is fetched; nothing is rendered
+        except Exception as e:
+            failed_sites = {sid: str(e) for sid in site_ids}  # e.g. the test connection failed
+        for sid, error in failed_sites.items():
+            store.record_failure(sid, database, from_date, to_date, error)  # Fetched live in the morning
+        log(f"Pre-computed {window}: {writer.count} saved, {len(failed_sites)} left for live fetching.")
+        summary[window] = (writer.count, len(failed_sites))
+    removed = store.prune()
+    if removed:
+        log(f"Pruned {removed} old pre-computed reports.")
+    return summary
+
+
+def seconds_until(at, now=None):
+    """Seconds from now until the next local HH:MM."""
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in at.split(":"))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+def main(argv=None):
+    import hostmap  # Imported here so --help works without pyodbc
+    import logpipe
+    from sitelist import parse_site_ids, read_site_list
+
+    parser = argparse.ArgumentParser(description="Pre-compute the next morning's reports overnight.")
+    parser.add_argument("--username", required=True, help="Database username")
+    parser.add_argument("--password", default=os.environ.get("SALES_REPORT_PASSWORD"),
+                        help="Database password (defaults to $SALES_REPORT_PASSWORD)")
+    parser.add_argument("--database", required=True, help="Database name")
+    sites = parser.add_mutually_exclusive_group(required=True)
+    sites.add_argument("--sites", help="Comma-separated list of site IDs")
+    sites.add_argument("--site-file", help="File with site IDs (.xlsx with a 'siteid' column, .csv or .txt)")
+    parser.add_argument("--ip-series", choices=["16", "28", "auto"], default="16", help="Server IP series (default: 16)")
+    parser.add_argument("--host-map", help="JSON file of remembered site -> host entries (default: %s)" % hostmap.DEFAULT_PATH)
+    parser.add_argument("--custom-ip", help="Connect to this host instead of deriving it from the site ID")
+    parser.add_argument("--windows", default=",".join(WINDOWS),
+                        help="Comma-separated windows to pre-compute: %s (default: %%(default)s)" % ", ".join(WINDOWS))
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="Report sections to pre-compute; must match the morning runs (default: %(default)s)")
+    parser.add_argument("--store", default=DEFAULT_PATH, help="Pre-computed store file (default: %(default)s)")
+    parser.add_argument("--at", default=DEFAULT_AT, help="Local time of the nightly run, HH:MM (default: %(default)s)")
+    parser.add_argument("--once", action="store_true", help="Run one warm-up now and exit instead of waiting for --at")
+    parser.add_argument("--workers", type=int, default=WARMUP_WORKERS,
+                        help="Starting number of sites in flight (default: %(default)s)")
+    parser.add_argument("--subnet-cap", type=int, default=None, metavar="N",
+                        help="Maximum sites in flight per subnet (default: %s)" % WARMUP_SUBNET_CAPS["10.16"])
+    parser.add_argument("--normal-priority", action="store_true", help="Do not lower the process priority")
+    parser.add_argument("--log-file", nargs="?", const=logpipe.DEFAULT_LOG_FILE, metavar="PATH",
+                        help="Also write the log to a rotating file (default path: %s)" % logpipe.DEFAULT_LOG_FILE)
+    args = parser.parse_args(argv)
+    if args.password is None:
+        print("Error: --password or $SALES_REPORT_PASSWORD is required.", file=sys.stderr)
+        return 2
+    windows = [w.strip() for w in args.windows.split(",") if w.strip()]
+    for window in windows:
+        if window not in WINDOWS:
+            parser.error(f"unknown window '{window}' (choose from {', '.join(WINDOWS)})")
+    try:
+        seconds_until(args.at)  # Reject a malformed --at up front
+    except ValueError:
+        parser.error(f"invalid --at '{args.at}', expected HH:MM")
+
+    log_listener = logpipe.setup_file_logging(args.log_file) if args.log_file else None
+
+    def log(message):
+        if log_listener is not None:
+            logpipe.LOGGER.info(message)
+        print(f"{datetime.now().strftime('%H:%M:%S')} - {message}", flush=True)
+
+    if args.host_map:
+        hostmap.HOST_MAP.path = args.host_map
+    if not args.normal_priority:
+        lower_priority()
+    site_list = (read_site_list(args.site_file, check_host=not args.custom_ip) if args.site_file
+                 else parse_site_ids(args.sites, check_host=not args.custom_ip))
+    if not site_list.site_ids:
+        print("Error: no valid site IDs to pre-compute.", file=sys.stderr)
+        return 1
+    subnet_caps = None if args.subnet_cap is None else {subnet: args.subnet_cap for subnet in WARMUP_SUBNET_CAPS}
+    store = PrecomputedStore(args.store)
+    try:
+        while True:
+            if not args.once:
+                delay = seconds_until(args.at)
+                log(f"Next warm-up at {args.at} (in {delay / 3600:.1f} h).")
+                time.sleep(delay)
+            run_warmup(store, site_list.site_ids, windows, args.username, args.password, args.database,
+                       args.ip_series, args.custom_ip, log=log, max_workers=args.workers, subnet_caps=subnet_caps,
+                       sections=PROFILES[args.profile])
+            if args.once:
+                return 0
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        store.close()
+        if log_listener is not None:
+            log_listener.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,370 @@
+"""
+SQL for the Sales Summary Report.
+
+REPORT_QUERY returns one row per BILLTYPE (ISHEADER 1/3), per corporate
+partner (ISHEADER 0), per HealingCard payment type (ISHEADER 2) plus the OMS
+(ISHEADER 4) and IP (ISHEADER 5) collections for a date range.
+
+Each of those is a section. build_report_query() assembles the UNION ALL
+from only the sections a report profile needs (see PROFILES), so stores
+never scan tables whose rows the report would not print.
+
+DAILY_REPORT_QUERY is the same report grouped additionally by business
+date: every row carries the date as its second column (BDATE) and the
+remaining columns match REPORT_QUERY, so per-day rows can be cached and
+summed back into a range report.
+
+The SQL itself comes in interchangeable variants (see VARIANTS): the
+original query unchanged ("classic"), a NOT EXISTS anti-join that also
+filters the datetime columns on half-open ranges instead of casting them,
+and one that additionally binds the date range once into @from/@to. They return the
+same rows; bench_queries.py checks that and times them, and queryconfig.py
+picks the variant per site.
+
+site_batch() prefixes either query with the site name lookup so both are
+sent in one round trip and read back as two result sets.
+"""
+from datetime import date, timedelta  # Import date helpers for the parameter builders
+from functools import lru_cache  # Import lru_cache so each query is assembled once
+
+QUERY_VERSION = 1  # Bump whenever the shape or meaning of the rows changes
+
+SITE_NAME_QUERY = "SELECT name FROM ax.inventsite WHERE siteid = ?"  # First result set of a site batch
+
+# Each section is one branch of the report's UNION ALL: (range SQL, daily SQL).
+# The daily SQL has BDATE as its second column. {frm}/{to} are the date
+# placeholders, {exclude_ip} the IP-receipt filter and {healing_dates} /
+# {settlement_dates} the datetime range filters of the chosen variant (see
+# VARIANTS). Keep them in report order.
+_SECTIONS = {
+    "billtypes": ("""
+select ISHEADER = CASE WHEN BILLTYPE ='GIFT' THEN 3 ELSE 1 END,
+       ACXCORPCODE = -1,
+       upper(BILLTYPE) BILLTYPE,
+       sum(saleamt) NETSALEAMT,
+       Cast(sum(discamt) as decimal(12,2)) DISCAMT,
+       Cast(sum(RETAMT) as decimal(12,2)) NETRETAMT,
+       Cast(sum(RETDISC) as decimal(12,2)) RETDISC,
+       sum(isscnt) SALECOUNT,
+       sum(retcnt) RETCNT
+from (
+    select name billtype,
+           Cast(sum(AMOUNTTENDERED) as decimal(12,2)) saleamt,
+           sum(DISCAMOUNT) DISCAMT,
+           0 RETAMT,
+           0 RETDISC,
+           count(distinct rt.receiptid) isscnt,
+           0 retcnt
+    from ax.retailtransactiontable rt
+    join ax.RETAILTRANSACTIONPAYMENTTRANS rpt
+      on rt.TRANSACTIONID = rpt.TRANSACTIONID and rt.RECEIPTID = rpt.RECEIPTID
+    join RETAILTENDERTYPETABLE rtt
+      on rpt.TENDERTYPE = rtt.TENDERTYPEID
+    where ENTRYSTATUS = 0
+      and acxtranstype = 0
+      and rpt.TRANSACTIONSTATUS = 0
+      and rpt.BUSINESSDATE between {frm} and {to}
+{exclude_ip}
+    group by name, DISCAMOUNT
+    union
+    select name,
+           0 saleamt,
+           0 DISCAMT,
+           Sum(AMOUNTTENDERED) AMOUNTTENDERED,
+           sum(-1*DISCAMOUNT) DISCAMT,
+           0 isscnt,
+           count(distinct rt.receiptid) retcnt
+    from ax.retailtransactiontable rt
+    join ax.RETAILTRANSACTIONPAYMENTTRANS rpt
+      on rt.TRANSACTIONID = rpt.TRANSACTIONID and rt.RECEIPTID = rpt.RECEIPTID
+    join RETAILTENDERTYPETABLE rtt
+      on rpt.TENDERTYPE = rtt.TENDERTYPEID
+    where ENTRYSTATUS = 0
+      and acxtranstype <> 0
+      and rpt.TRANSACTIONSTATUS = 0
+      and rpt.BUSINESSDATE between {frm} and {to}
+    group by name
+) a
+group by billtype
+""", """
+select ISHEADER = CASE WHEN BILLTYPE ='GIFT' THEN 3 ELSE 1 END,
+       BDATE,
+       ACXCORPCODE = -1,
+       upper(BILLTYPE) BILLTYPE,
+       sum(saleamt) NETSALEAMT,
+       Cast(sum(discamt) as decimal(12,2)) DISCAMT,
+       Cast(sum(RETAMT) as decimal(12,2)) NETRETAMT,
+       Cast(sum(RETDISC) as decimal(12,2)) RETDISC,
+       sum(isscnt) SALECOUNT,
+       sum(retcnt) RETCNT
+from (
+    select cast(rpt.BUSINESSDATE as date) BDATE,
+           name billtype,
+           Cast(sum(AMOUNTTENDERED) as decimal(12,2)) saleamt,
+           sum(DISCAMOUNT) DISCAMT,
+           0 RETAMT,
+           0 RETDISC,
+           count(distinct rt.receiptid) isscnt,
+           0 retcnt
+    from ax.retailtransactiontable rt
+    join ax.RETAILTRANSACTIONPAYMENTTRANS rpt
+      on rt.TRANSACTIONID = rpt.TRANSACTIONID and rt.RECEIPTID = rpt.RECEIPTID
+    join RETAILTENDERTYPETABLE rtt
+      on rpt.TENDERTYPE = rtt.TENDERTYPEID
+    where ENTRYSTATUS = 0
+      and acxtranstype = 0
+      and rpt.TRANSACTIONSTATUS = 0
+      and rpt.BUSINESSDATE between {frm} and {to}
+{exclude_ip}
+    group by cast(rpt.BUSINESSDATE as date), name, DISCAMOUNT
+    union
+    select cast(rpt.BUSINESSDATE as date),
+           name,
+           0 saleamt,
+           0 DISCAMT,
+           Sum(AMOUNTTENDERED) AMOUNTTENDERED,
+           sum(-1*DISCAMOUNT) DISCAMT,
+           0 isscnt,
+           count(distinct rt.receiptid) retcnt
+    from ax.retailtransactiontable rt
+    join ax.RETAILTRANSACTIONPAYMENTTRANS rpt
+      on rt.TRANSACTIONID = rpt.TRANSACTIONID and rt.RECEIPTID = rpt.RECEIPTID
+    join RETAILTENDERTYPETABLE rtt
+      on rpt.TENDERTYPE = rtt.TENDERTYPEID
+    where ENTRYSTATUS = 0
+      and acxtranstype <> 0
+      and rpt.TRANSACTIONSTATUS = 0
+      and rpt.BUSINESSDATE between {frm} and {to}
+    group by cast(rpt.BUSINESSDATE as date), name
+) a
+group by BDATE, billtype
+"""),
+    "partners": ("""
+select ISHEADER = 0,
+       ACXCORPCODE,
+       ax.getcorporatename(acxcorpcode) CORPORATE,
+       (cast(sum(CASE WHEN ACXCORPCODE ='172' AND ACXCREDIT = 0 THEN 0 ELSE -1*GROSSAMOUNT END)
+        - sum(case when ACXTRANSTYPE = 0 then discamount
+                   when ACXTRANSTYPE <> 0 then -1*discamount end) as decimal(18,2)) - sum(ACXLOYALTY)) NETAMT,
+       0, 0, 0,
+       count(distinct CASE WHEN ACXCORPCODE='172' AND ACXCREDIT = 0 THEN NULL ELSE receiptid END) BILLCNT,
+       0
+from ax.retailtransactiontable
+where ENTRYSTATUS = 0
+  and BUSINESSDATE between {frm} and {to}
+group by acxcorpcode
+""", """
+select ISHEADER = 0,
+       cast(BUSINESSDATE as date),
+       ACXCORPCODE,
+       ax.getcorporatename(acxcorpcode) CORPORATE,
+       (cast(sum(CASE WHEN ACXCORPCODE ='172' AND ACXCREDIT = 0 THEN 0 ELSE -1*GROSSAMOUNT END)
+        - sum(case when ACXTRANSTYPE = 0 then discamount
+                   when ACXTRANSTYPE <> 0 then -1*discamount end) as decimal(18,2)) - sum(ACXLOYALTY)) NETAMT,
+       0, 0, 0,
+       count(distinct CASE WHEN ACXCORPCODE='172' AND ACXCREDIT = 0 THEN NULL ELSE receiptid END) BILLCNT,
+       0
+from ax.retailtransactiontable
+where ENTRYSTATUS = 0
+  and BUSINESSDATE between {frm} and {to}
+group by cast(BUSINESSDATE as date), acxcorpcode
+"""),
+    "healingcard": ("""
+Select ISHEADER = 2,
+       PAYMENTCODE,
+       'HEALINGCARD-' + PAYMENTTYPE,
+       sum(TRANSAMT) Amount,
+       0, 0, 0, 0, 0
+from HEALING_CARD_TRANSACTION
+where ACTIONID in (0,1)
+  and {healing_dates}
+group by PAYMENTCODE, PAYMENTTYPE
+""", """
+Select ISHEADER = 2,
+       cast(TRANSACTIONDATE as date),
+       PAYMENTCODE,
+       'HEALINGCARD-' + PAYMENTTYPE,
+       sum(TRANSAMT) Amount,
+       0, 0, 0, 0, 0
+from HEALING_CARD_TRANSACTION
+where ACTIONID in (0,1)
+  and {healing_dates}
+group by cast(TRANSACTIONDATE as date), PAYMENTCODE, PAYMENTTYPE
+"""),
+    "oms": ("""
+Select ISHEADER = 4,
+       0,
+       'OMS CASH COLLECTION',
+       isnull(SUM(COLLECTEDAMT),0) as COLLECTEDAMT,
+       0, 0, 0, 0, 0
+from ax.ACXSETTLEMENTDETAILS
+where {settlement_dates}
+""", """
+Select ISHEADER = 4,
+       cast(SETTLEMENTDATE as date),
+       0,
+       'OMS CASH COLLECTION',
+       isnull(SUM(COLLECTEDAMT),0) as COLLECTEDAMT,
+       0, 0, 0, 0, 0
+from ax.ACXSETTLEMENTDETAILS
+where {settlement_dates}
+group by cast(SETTLEMENTDATE as date)
+"""),
+    "ip": ("""
+select ISHEADER = 5,
+       tendertype,
+       'IP COLLECTION',
+       isnull(SUM(AMOUNTTENDERED), 0) as COLLECTEDAMT,
+       0, 0, 0, 0, 0
+from ax.retailtransactionpaymenttrans
+where tendertype in (1,2)
+  and receiptid like 'IP%'
+  and BUSINESSDATE between {frm} and {to}
+group by tendertype
+""", """
+select ISHEADER = 5,
+       cast(BUSINESSDATE as date),
+       tendertype,
+       'IP COLLECTION',
+       isnull(SUM(AMOUNTTENDERED), 0) as COLLECTEDAMT,
+       0, 0, 0, 0, 0
+from ax.retailtransactionpaymenttrans
+where tendertype in (1,2)
+  and receiptid like 'IP%'
+  and BUSINESSDATE between {frm} and {to}
+group by cast(BUSINESSDATE as date), tendertype
+"""),
+}
+
+SECTIONS = tuple(_SECTIONS)  # Every report section, in report order
+PROFILES = {
+    "standard": ("billtypes", "partners"),  # What the report has always printed; collections show as zero
+    "full": SECTIONS,  # Also HealingCard collections and Paid In (OMS + IP collections)
+}
+DEFAULT_PROFILE = "standard"  # Profile used when none is given
+DEFAULT_SECTIONS = PROFILES[DEFAULT_PROFILE]
+
+
+def normalize_sections(sections):
+    """Return sections as a tuple in report order; raise ValueError for unknown names."""
+    unknown = [name for name in sections if name not in _SECTIONS]
+    if unknown:
+        raise ValueError(f"Unknown report section(s) {', '.join(unknown)}; expected {', '.join(SECTIONS)}.")
+    selected = tuple(name for name in SECTIONS if name in sections)
+    if not selected:
+        raise ValueError("At least one report section is required.")
+    return selected
+
+
+_CAST_BETWEEN = "cast({col} as date) between {frm} and {to}"  # Original datetime filter; the cast hides any index
+_HALF_OPEN = "{col} >= cast({frm} as date) and {col} < dateadd(day, 1, cast({to} as date))"  # Same days, index-friendly
+_NOT_IN_IP = """      and rpt.RECEIPTID not in (
+            Select IQ.receiptid
+            from ax.RETAILTRANSACTIONPAYMENTTRANS as IQ
+            where IQ.receiptid like 'IP%'
+              and IQ.tendertype in (1,2)
+              and IQ.BUSINESSDATE between {frm} and {to}
+      )"""  # Original filter: the subquery is a list the server may rebuild per row
+_NOT_EXISTS_IP = """      and not exists (
+            Select 1
+            from ax.RETAILTRANSACTIONPAYMENTTRANS as IQ
+            where IQ.receiptid = rpt.RECEIPTID
+              and IQ.receiptid like 'IP%'
+              and IQ.tendertype in (1,2)
+              and IQ.BUSINESSDATE between {frm} and {to}
+      )"""  # Same filter as an anti-join; receipt IDs are never NULL, so NOT IN and NOT EXISTS agree
+
+
+class QueryVariant:
+    """One formulation of the report SQL. Every variant must return the same rows."""
+
+    def __init__(self, name, description, exclude_ip, date_range=_CAST_BETWEEN, declare_dates=False):
+        self.name = name  # Registry key, used in the variant config and --query-variant
+        self.description = description  # One line for the A/B harness
+        self.exclude_ip = exclude_ip  # IP-receipt filter of the billtypes section
+        self.date_range = date_range  # Filter of the datetime columns (HealingCard, OMS settlements)
+        self.declare_dates = declare_dates  # True: bind from/to once into @from/@to instead of per branch
+
+    def build(self, sections, daily=False):
+        """Assemble the query for the given sections (daily=True: DAILY_REPORT_QUERY shape)."""
+        frm, to = ("@from", "@to") if self.declare_dates else ("?", "?")
+        filters = {"frm": frm, "to": to, "exclude_ip": self.exclude_ip.format(frm=frm, to=to),
+                   "healing_dates": self.date_range.format(col="TRANSACTIONDATE", frm=frm, to=to),
+                   "settlement_dates": self.date_range.format(col="SETTLEMENTDATE", frm=frm, to=to)}
+        query = "union all".join(_SECTIONS[name][1 if daily else 0].format(**filters)
+                                 for name in normalize_sections(sections))
+        if self.declare_dates:
+            query = "\nDECLARE @from date = ?, @to date = ?;\n" + query  # The only two placeholders
+        return query
+
+
+VARIANTS = {variant.name: variant for variant in (
+    QueryVariant("classic", "original query: NOT IN subquery, cast(datetime as date) filters", _NOT_IN_IP),
+    QueryVariant("antijoin", "NOT EXISTS anti-join, half-open datetime ranges", _NOT_EXISTS_IP, _HALF_OPEN),
+    QueryVariant("declared", "antijoin with the date range declared once as @from/@to", _NOT_EXISTS_IP, _HALF_OPEN,
+                 declare_dates=True),
+)}  # Registered formulations; results are identical, only the plans differ (see bench_queries.py)
+DEFAULT_VARIANT = "classic"  # Variant used when the config does not name one
+
+
+def get_variant(name=None):
+    """Return the QueryVariant called name (None: DEFAULT_VARIANT); raise ValueError for unknown names."""
+    try:
+        return VARIANTS[name or DEFAULT_VARIANT]
+    except KeyError:
+        raise ValueError(f"Unknown query variant '{name}'; expected {', '.join(VARIANTS)}.") from None
+
+
+def build_report_query(sections=DEFAULT_SECTIONS, daily=False, variant=None):
+    """
+    Assemble the report query from the given sections only (daily=True:
+    DAILY_REPORT_QUERY shape) in the given variant (None: DEFAULT_VARIANT).
+    """
+    return _build_report_query(tuple(sections), daily, variant)
+
+
+@lru_cache(maxsize=None)
+def _build_report_query(sections, daily, variant):
+    return get_variant(variant).build(sections, daily)
+
+
+def query_variant(sections=DEFAULT_SECTIONS):
+    """
+    Cache key part identifying the query version and the sections its rows
+    contain. The SQL variant is not part of it: every variant returns the same rows.
+    """
+    return f"{QUERY_VERSION}:{'+'.join(normalize_sections(sections))}"
+
+
+REPORT_QUERY = build_report_query(SECTIONS)  # Range report: one row per billtype/partner/collection
+DAILY_REPORT_QUERY = build_report_query(SECTIONS, daily=True)  # Same report, one row per business date and billtype/partner/collection
+REPORT_PARAM_COUNT = REPORT_QUERY.count("?")  # Number of ? placeholders in both full queries (default variant)
+
+
+def site_batch(query):
+    """
+    Return one batch that runs SITE_NAME_QUERY and then query. NOCOUNT keeps
+    row-count messages from showing up as extra result sets. Parameters are
+    (site_id, *report_params(...)).
+    """
+    return f"SET NOCOUNT ON;\n{SITE_NAME_QUERY};\n{query.strip()}"
+
+
+def report_params(from_date, to_date, sections=SECTIONS, variant=None):
+    """Return the parameter tuple for build_report_query(sections, variant=variant), e.g. REPORT_QUERY."""
+    return (from_date, to_date) * (build_report_query(sections, False, variant).count("?") // 2)  # One pair per placeholder pair
+
+
+def as_date(value):
+    """Accept a date, a datetime or a 'YYYY-MM-DD' string and return a date."""
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if hasattr(value, "date"):
+        return value.date()  # datetime -> date
+    return value
+
+
+def days_between(from_date, to_date):
+    """Return every date from from_date to to_date inclusive."""
+    start, end = as_date(from_date), as_date(to_date)
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
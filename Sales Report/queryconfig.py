@@ -0,0 +1,73 @@
+"""
+Per-site choice of report query variant.
+
+A faster formulation of the report SQL (see queries.VARIANTS) can be rolled
+out gradually: first checked with bench_queries.py, then enabled for a few
+sites, then made the default. The choice lives in a small JSON file:
+
+    {"default": "classic", "sites": {"13100": "declared", "13101": "antijoin"}}
+
+Sites not listed use "default"; without a file every site uses
+queries.DEFAULT_VARIANT. Setting override (the CLI's --query-variant) sends
+every site through one variant regardless of the file.
+"""
+import json  # Import json for the on-disk format
+import os  # Import os for the default path
+import threading  # Import threading for the lazy load lock
+
+from queries import DEFAULT_VARIANT, get_variant  # Import the variant registry
+
+DEFAULT_PATH = os.environ.get(
+    "SALES_REPORT_QUERY_VARIANTS",
+    os.path.join(os.path.expanduser("~"), ".sales_report", "query_variants.json"))  # Default location of the config
+
+
+class QueryVariantConfig:
+    """Read-only {site_id: variant} choice backed by a JSON file, loaded on first use."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path  # JSON file location
+        self.override = None  # Variant for every site, ignoring the file
+        self._lock = threading.Lock()  # Guards the lazy load
+        self._loaded = None  # (default, {site_id: variant}) once loaded
+
+    def load(self):
+        """
+        Read the file (once) and return (default, sites). A missing file means
+        no per-site choices; unknown variant names raise ValueError so a typo
+        fails the run up front instead of silently using the old query.
+        """
+        with self._lock:
+            if self._loaded is None:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                except FileNotFoundError:
+                    data = {}
+                except (OSError, ValueError) as e:
+                    raise ValueError(f"Cannot read query variant config {self.path}: {e}") from e
+                default = data.get("default") or DEFAULT_VARIANT
+                sites = {str(site): name for site, name in (data.get("sites") or {}).items()}
+                for name in {default, *sites.values()}:
+                    get_variant(name)  # Raises for unknown names
+                self._loaded = (default, sites)
+            return self._loaded
+
+    def variant_for(self, site_id):
+        """Return the variant name to query site_id with."""
+        if self.override:
+            return self.override
+        default, sites = self.load()
+        return sites.get(site_id, default)
+
+    def summary(self):
+        """One-line description for the log, or None when every site uses DEFAULT_VARIANT."""
+        if self.override:
+            return f"Query variant: {self.override} for every site."
+        default, sites = self.load()
+        if default == DEFAULT_VARIANT and not sites:
+            return None
+        return f"Query variant: {default} by default, {len(sites)} site(s) configured individually."
+
+
+QUERY_CONFIG = QueryVariantConfig()  # Process-wide variant choice
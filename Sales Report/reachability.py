@@ -0,0 +1,120 @@
+"""
+Cheap TCP reachability checks for store SQL Servers.
+
+Before paying for an ODBC login, the engine opens a plain TCP connection to
+the server port. Hosts that do not answer are remembered in a TTL-based
+negative cache so every later attempt within the TTL fails in microseconds
+instead of holding a worker slot for the full login timeout.
+"""
+import concurrent.futures  # Import concurrent.futures for parallel probing
+import socket  # Import socket for the TCP probe
+import threading  # Import threading for the cache lock
+import time  # Import time for TTL bookkeeping
+
+SQL_SERVER_PORT = 1433  # Default SQL Server port
+PROBE_TIMEOUT = 1.5  # Seconds to wait for the TCP handshake
+UNREACHABLE_TTL = 600.0  # Seconds a failed host stays in the negative cache
+PROBE_WORKERS = 64  # Parallel probes in probe_many
+
+
+class HostUnreachableError(ConnectionError):
+    """Raised when a host fails the TCP probe or is in the negative cache."""
+
+
+class NegativeCache:
+    """Thread-safe set of unreachable hosts whose entries expire after a TTL."""
+
+    def __init__(self, ttl=UNREACHABLE_TTL):
+        self.ttl = ttl  # Entry lifetime in seconds
+        self._lock = threading.Lock()  # Guards _expires
+        self._expires = {}  # host -> monotonic expiry time
+
+    def add(self, host):
+        """Mark host as unreachable for the next ttl seconds."""
+        with self._lock:
+            self._expires[host] = time.monotonic() + self.ttl
+
+    def discard(self, host):
+        """Forget host (e.g. after it answered again)."""
+        with self._lock:
+            self._expires.pop(host, None)
+
+    def __contains__(self, host):
+        with self._lock:
+            expires = self._expires.get(host)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._expires[host]  # Expired: give the host another chance
+                return False
+            return True
+
+    def clear(self):
+        """Forget every cached host."""
+        with self._lock:
+            self._expires.clear()
+
+
+UNREACHABLE = NegativeCache()  # Process-wide negative cache
+
+
+def split_host_port(host):
+    """
+    Split a SQL Server host into (address, port).
+
+    Accepts "10.16.131.0", "10.16.131.0,1444" and "host:1444". Named
+    instances ("host\\INSTANCE") use dynamic ports, so port is None for them.
+    """
+    if "\\" in host:
+        return host.split("\\", 1)[0], None  # Port is resolved by SQL Browser
+    for sep in (",", ":"):
+        if sep in host:
+            address, port = host.rsplit(sep, 1)
+            try:
+                return address.strip(), int(port)
+            except ValueError:
+                break
+    return host.strip(), SQL_SERVER_PORT
+
+
+def probe(host, timeout=None):
+    """Return True if a TCP connection to the host's SQL Server port succeeds."""
+    address, port = split_host_port(host)
+    if port is None:
+        return True  # Cannot probe a dynamic port; let the ODBC login decide
+    try:
+        with socket.create_connection((address, port), timeout=PROBE_TIMEOUT if timeout is None else timeout):
+            return True
+    except OSError:
+        return False
+
+
+def check_host(host, timeout=None):
+    """
+    Raise HostUnreachableError if host is in the negative cache or fails a
+    fresh probe (which then caches it).
+    """
+    if host in UNREACHABLE:
+        raise HostUnreachableError(f"{host}: host unreachable (cached)")
+    if not probe(host, timeout):
+        UNREACHABLE.add(host)  # Remember the failure
+        raise HostUnreachableError(f"{host}: host unreachable (no answer on TCP port {split_host_port(host)[1]})")
+
+
+def probe_many(hosts, timeout=None, max_workers=PROBE_WORKERS):
+    """
+    Probe hosts in parallel and add every failure to the negative cache.
+    Hosts already in the cache are not probed again. Returns the set of
+    hosts that answered.
+    """
+    pending = [h for h in dict.fromkeys(hosts) if h not in UNREACHABLE]  # Dedupe, skip cached failures
+    reachable = set()
+    if not pending:
+        return reachable
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(pending), max_workers)) as executor:
+        for host, ok in zip(pending, executor.map(lambda h: probe(h, timeout), pending)):
+            if ok:
+                reachable.add(host)
+            else:
+                UNREACHABLE.add(host)  # Fail fast for this host for the rest of the TTL
+    return reachable
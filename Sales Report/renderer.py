@@ -0,0 +1,256 @@
+"""
+Precompiled renderer for the fixed-width Sales Transaction Summary Report.
+
+format_report rebuilds the same header, separator and column-title lines for
+every site, copies every row into a dict and pads each line separately.
+ReportRenderer builds everything that does not depend on the data once,
+formats each data row with a single precompiled format string straight from
+the result tuple, and can render a whole batch of sites in one pass
+(render_many): one header timestamp, and the number columns of every
+site's rows formatted together. Its output is byte-identical to
+format_report (see bench_render.py).
+"""
+import time  # Import time for render timings
+from datetime import datetime  # Import datetime for the header timestamp
+from decimal import Decimal  # Import Decimal for the total sales calculation
+from itertools import islice, starmap  # Import islice and starmap for the batch row formatting
+
+PAGE_WIDTH = 180  # Width of each line in the report
+
+
+def _fix(line, width=PAGE_WIDTH):
+    """Pad or truncate a line to width, exactly like format_report's fix_line."""
+    return line.rstrip("\n").ljust(width)[:width]
+
+
+# One format call per data line; "{:>12,.2f}" is format_currency(value) right-aligned to 12.
+ROW_FORMAT = (
+    "{0:<17} |{1:8d} |{2:>12,.2f} |{3:>12,.2f} |{4:>12,.2f} |"
+    "{5:6d} |{6:>12,.2f} |{7:>12,.2f} |{8:>12,.2f} |"
+    "{9:6d} |{10:>12,.2f} |{11:>12,.2f} |{12:>12,.2f} |"
+).format
+_TOTALS = ROW_FORMAT  # The totals line uses the same columns
+_PARTNER = "{0:6d} | {1:<38} |     {2:12d} | {3:>12,.2f} |".format
+_PARTNER_TOTALS = "      TOTAL AMOUNT:                    {0:27d} | {1:>9,.2f} |".format
+
+
+class ReportRenderer:
+    """Render query results into the 180-column report text."""
+
+    def __init__(self, width=PAGE_WIDTH):
+        self.width = width  # Line width
+        fix = self._fix = lambda line: _fix(line, width)
+        sep = fix("-" * width)  # Full-width separator
+        self._blank = fix("")
+        self._company = fix("APOLLO PHARMACIES LIMITED".center(width))
+        self._title = fix("Sales Transaction Summary Report".center(width))
+        self._table_head = "\n".join([
+            sep,
+            fix("|" + " SALES ".center(55) + "|" + " RETURNS ".center(55) + "|" + " NET ".center(55) + "|"),
+            sep,
+            fix(f"{'BILLTYPE':<17} |{'NO':>8} |{'AMT':>12} |{'DISC':>12} |{'NET':>12} |"
+                f"{'NO':>6} |{'AMT':>12} |{'DISC':>12} |{'NET':>12} |"
+                f"{'NO':>6} |{'AMT':>12} |{'DISC':>12} |{'NET':>12} |"),
+            sep,
+        ])
+        self._sep = sep
+        self._sales_head = fix("\nSALES :-")
+        self._paid_out = fix("       Total Paid out        :       0.00")
+        self._healing_lines = "\n".join([
+            fix("HealingCard Collections:"),
+            fix(f"     Cash Collections        : {'0':>9}"),
+            fix(f"     Credit Card Collections : {'0':>9}"),
+            fix(f"     Total Collection        : {'0':>9}\n"),
+        ])
+        self._partner_head = "\n".join([
+            fix("\n" + "-" * 180 + "\n"),
+            fix("\nPartner Program Summary  :\n"),
+            fix(" slno| Name                                     |     NoInv        |    Amount    |"),
+            sep,
+        ])
+        self._short_sep = fix("-" * (width - 50))
+        self._pad = f"{{:<{width}.{width}}}".format  # Same as line.ljust(width)[:width]
+
+    def header_stamp(self, now=None):
+        """Return the DATE/TIME header lines for a timestamp (shared by a whole batch)."""
+        now = now or datetime.now()
+        return (self._fix(f"DATE: {now.strftime('%d/%m/%Y')}".rjust(self.width)) + "\n"
+                + self._fix(f"TIME: {now.strftime('%I:%M %p')}".rjust(self.width)))
+
+    def _head(self, site_id, site_name, from_date, to_date, stamp):
+        """Everything above the first data row."""
+        fix = self._fix
+        return "\n".join([
+            stamp,
+            self._blank,
+            self._company,
+            fix(f"{site_id} - {site_name}".center(self.width)),
+            self._blank,
+            self._title,
+            self._dates(from_date, to_date),
+            self._table_head,
+        ])
+
+    def _dates(self, from_date, to_date):
+        return self._fix(f"From Date : {from_date}    To Date : {to_date}".center(self.width))
+
+    def _scan(self, result):
+        """
+        Walk one site's rows once and return (bills, partners, middle, tail):
+        the ROW_FORMAT and _PARTNER arguments of its data lines, and the
+        finished text between and after them.
+        """
+        fix = self._fix
+        bills = []
+        partners = []
+        tot_sale_count = tot_sale_amt = tot_sale_disc = tot_sale_net = 0
+        tot_ret_count = tot_ret_amt = tot_ret_disc = tot_ret_net = 0
+        net_cash_sales = 0
+        paid_in = healing_cash = healing_card = 0
+        has_healing = False
+        tot_partner_inv = tot_partner_amt = 0
+        for row in result:
+            isheader = row[0]
+            if isheader == 1 or isheader == 3:
+                billtype, sale_net, sale_disc, ret_net, ret_disc, sale_count, ret_count = (
+                    row[2], row[3], row[4], row[5], row[6], row[7], row[8])
+                sale_amt = sale_net + sale_disc
+                ret_amt = ret_net + ret_disc
+                upper = billtype.upper()
+                if upper != "GIFT":
+                    tot_sale_count += sale_count
+                    tot_sale_amt += float(sale_amt)
+                    tot_sale_disc += float(sale_disc)
+                    tot_sale_net += float(sale_net)
+                    tot_ret_count += ret_count
+                    tot_ret_amt += float(ret_amt)
+                    tot_ret_disc += float(ret_disc)
+                    tot_ret_net += float(ret_net)
+                if upper == "CASH":
+                    net_cash_sales = sale_net + ret_net
+                bills.append((billtype, sale_count, sale_amt, sale_disc, sale_net,
+                              ret_count, ret_amt, ret_disc, ret_net,
+                              sale_count + ret_count, sale_amt + ret_amt,
+                              sale_disc + ret_disc, sale_net + ret_net))
+            elif isheader == 0:
+                tot_partner_inv += row[7]
+                tot_partner_amt += float(row[3])
+                partners.append((len(partners) + 1, row[2], row[7], row[3]))
+            elif isheader == 2:
+                has_healing = True
+                if "CASH" in row[2].upper():
+                    healing_cash += row[3]
+                else:
+                    healing_card += row[3]
+            elif isheader == 4 or isheader == 5:
+                paid_in += row[3]  # OMS and IP collections
+
+        total_sales = Decimal(net_cash_sales) + Decimal(paid_in) + Decimal('0.0')
+        if has_healing:
+            healing_lines = "\n".join([
+                fix("HealingCard Collections:"),
+                fix(f"     Cash Collections        : {healing_cash:>9,.2f}"),
+                fix(f"     Credit Card Collections : {healing_card:>9,.2f}"),
+                fix(f"     Total Collection        : {healing_cash + healing_card:>9,.2f}\n"),
+            ])
+        else:
+            healing_lines = self._healing_lines
+        middle = "\n".join([
+            self._sep,
+            fix(_TOTALS("TOTALAMOUNT   :", tot_sale_count, tot_sale_amt, tot_sale_disc, tot_sale_net,
+                        int(tot_ret_count), tot_ret_amt, tot_ret_disc, tot_ret_net,
+                        int(tot_sale_count + tot_ret_count), tot_sale_amt + tot_ret_amt,
+                        tot_sale_disc + tot_ret_disc, tot_sale_net + tot_ret_net)),
+            self._sep,
+            self._sales_head,
+            fix(f"\n       Net Cash Sales        : {net_cash_sales:,.2f}"),
+            fix(f"       Total Paid In         : {paid_in:>10,.2f}"),
+            self._paid_out,
+            fix(f"       Total Sales           : {total_sales:,.2f}\n"),
+            healing_lines,
+            fix(f"Total Cash Amount            : {total_sales:,.2f} "),
+            self._partner_head,
+        ])
+        tail = "\n".join([
+            self._short_sep,
+            fix(_PARTNER_TOTALS(tot_partner_inv, tot_partner_amt)),
+            self._short_sep,
+        ])
+        return bills, partners, middle, tail
+
+    def render(self, result, site_id, site_name, from_date, to_date, now=None, stamp=None):
+        """Render one site's report. Same arguments and output as format_report."""
+        pad = self._pad
+        bills, partners, middle, tail = self._scan(result)
+        return "\n".join([
+            self._head(site_id, site_name, from_date, to_date, stamp or self.header_stamp(now)),
+            *[pad(ROW_FORMAT(*args)) for args in bills],
+            middle,
+            *[pad(_PARTNER(*args)) for args in partners],  # Ends with "|", so no newline to strip
+            tail,
+        ])
+
+    def render_many(self, batch, now=None, stamp=None):
+        """
+        Render many sites in one pass. batch is an iterable of
+        (result, site_id, site_name, from_date, to_date); returns the report
+        texts in the same order, byte-identical to render().
+
+        The header timestamp is formatted once and the date line once per
+        range. The rows of every site are scanned first, then the bill-type
+        and partner lines of all sites are formatted by one map() stream
+        each instead of a loop per site.
+        """
+        stamp = stamp or self.header_stamp(now)  # Formatted once for the whole batch
+        dates = {}  # (from_date, to_date) -> date line
+        all_bills = []  # ROW_FORMAT arguments of every site, in order
+        all_partners = []  # _PARTNER arguments of every site, in order
+        sites = []  # (head, bill count, middle, partner count, tail) per site
+        fix = self._fix
+        width = self.width
+        for result, site_id, site_name, from_date, to_date in batch:
+            date_line = dates.get((from_date, to_date))
+            if date_line is None:
+                date_line = dates[from_date, to_date] = self._dates(from_date, to_date)
+            head = "\n".join([stamp, self._blank, self._company, fix(f"{site_id} - {site_name}".center(width)),
+                              self._blank, self._title, date_line, self._table_head])
+            bills, partners, middle, tail = self._scan(result)
+            all_bills.extend(bills)
+            all_partners.extend(partners)
+            sites.append((head, len(bills), middle, len(partners), tail))
+
+        pad = self._pad
+        bill_lines = map(pad, starmap(ROW_FORMAT, all_bills))  # Every site's bill-type lines in one pass
+        partner_lines = map(pad, starmap(_PARTNER, all_partners))  # Every site's partner lines in one pass
+        join = "\n".join
+        return [join([head, *islice(bill_lines, bill_count), middle, *islice(partner_lines, partner_count), tail])
+                for head, bill_count, middle, partner_count, tail in sites]
+
+
+RENDERER = ReportRenderer()  # Shared renderer instance
+render_report = RENDERER.render  # Drop-in replacement for format_report
+
+
+def render_timed(result, site_id, site_name, from_date, to_date):
+    """
+    Render one report and return (text, seconds). A plain module-level
+    function, so it can be sent to a process pool.
+    """
+    start = time.perf_counter()
+    text = RENDERER.render(result, site_id, site_name, from_date, to_date)
+    return text, time.perf_counter() - start
+
+
+def render_daily_timed(result, site_id, site_name, from_date, to_date, days):
+    """
+    Render the range report and one report per day of days ({date: rows} in
+    REPORT_QUERY shape) and return ({entry_name: text}, seconds). Entries are
+    named {site_id}.txt and {site_id}_{YYYY-MM-DD}.txt.
+    """
+    start = time.perf_counter()
+    stamp = RENDERER.header_stamp()  # Same header time on every report of the site
+    reports = {f"{site_id}.txt": RENDERER.render(result, site_id, site_name, from_date, to_date, stamp=stamp)}
+    for day, rows in days.items():
+        iso = day.isoformat()
+        reports[f"{site_id}_{iso}.txt"] = RENDERER.render(rows, site_id, site_name, iso, iso, stamp=stamp)
+    return reports, time.perf_counter() - start
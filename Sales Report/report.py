@@ -0,0 +1,232 @@
+"""
+Reference formatter for the fixed-width Sales Transaction Summary Report.
+
+format_report is the original, straightforward implementation; the engine
+renders through renderer.ReportRenderer, which produces byte-identical
+output faster. Keep the two in sync (bench_render.py checks them).
+
+HealingCard (ISHEADER 2) rows fill the HealingCard Collections block and
+OMS/IP collection (ISHEADER 4/5) rows add up to Total Paid In. Those rows
+are only queried by the "full" report profile (see queries.PROFILES);
+without them the block prints zeros, as it always has.
+"""
+from datetime import datetime  # Import datetime for date and time operations
+from decimal import Decimal  # Import Decimal for precise decimal calculations
+
+def format_currency(value):
+    """Format a numeric value as a currency string with 2 decimals."""
+    return f"{value:,.2f}"  # Format the value as a string with commas and 2 decimal places
+
+def format_report(result, site_id, site_name, from_date, to_date, now=None):
+    """
+    Process the query result (a list of tuples) and produce a text report
+    in which every line is fixed to 180 characters. `now` (default: the
+    current time) is the timestamp printed in the header.
+    """
+    PAGE_WIDTH = 180  # Define the width of each line in the report
+
+    def fix_line(line, width=PAGE_WIDTH):
+        clean = line.rstrip("\n")  # Remove trailing newline characters
+        if len(clean) < width:
+            return clean + " " * (width - len(clean))  # Pad the line with spaces to reach the desired width
+        else:
+            return clean[:width]  # Truncate the line to the desired width
+
+    now = now or datetime.now()  # Get the current date and time
+    header_date = now.strftime("%d/%m/%Y")  # Format the date as DD/MM/YYYY
+    header_time = now.strftime("%I:%M %p")  # Format the time as HH:MM AM/PM
+
+    lines = []  # Initialize a list to store the lines of the report
+    # Header Section.
+    lines.append(f"DATE: {header_date}".rjust(PAGE_WIDTH))  # Add the date to the report, right-aligned
+    lines.append(f"TIME: {header_time}".rjust(PAGE_WIDTH))  # Add the time to the report, right-aligned
+    lines.append("")  # Add a blank line
+    lines.append("APOLLO PHARMACIES LIMITED".center(PAGE_WIDTH))  # Add the company name, centered
+    lines.append(f"{site_id} - {site_name}".center(PAGE_WIDTH))  # Add the site ID and name, centered
+    lines.append("")  # Add a blank line
+    lines.append("Sales Transaction Summary Report".center(PAGE_WIDTH))  # Add the report title, centered
+    lines.append(f"From Date : {from_date}    To Date : {to_date}".center(PAGE_WIDTH))  # Add the date range, centered
+    lines.append("-" * PAGE_WIDTH)  # Add a separator line
+
+    header_groups = (
+        "|" +
+        " SALES ".center(55) +
+        "|" +
+        " RETURNS ".center(55) +
+        "|" +
+        " NET ".center(55) +
+        "|"
+    )  # Define the header groups for the report
+    lines.append(header_groups)  # Add the header groups to the report
+    lines.append("-" * PAGE_WIDTH)  # Add a separator line
+
+    header_cols = (
+        f"{'BILLTYPE':<17} |"
+        f"{'NO':>8} |"
+        f"{'AMT':>12} |"
+        f"{'DISC':>12} |"
+        f"{'NET':>12} |"
+        f"{'NO':>6} |"
+        f"{'AMT':>12} |"
+        f"{'DISC':>12} |"
+        f"{'NET':>12} |"
+        f"{'NO':>6} |"
+        f"{'AMT':>12} |"
+        f"{'DISC':>12} |"
+        f"{'NET':>12} |"
+    )  # Define the header columns for the report
+    lines.append(header_cols)  # Add the header columns to the report
+    lines.append("-" * PAGE_WIDTH)  # Add a separator line
+
+    # Process data rows.
+    sales_data = []  # Initialize a list to store sales data
+    partner_data = []  # Initialize a list to store partner data
+    healing_data = []  # Initialize a list to store HealingCard collections
+    total_paid_in = Decimal('0.0')  # Initialize total paid in (OMS and IP collections)
+
+    for row in result:
+        isheader = row[0]  # Get the value of the first column
+        if isheader in (1, 3):
+            sale_net = row[3]  # Get the net sales amount
+            sale_disc = row[4]  # Get the sales discount
+            ret_net = row[5]  # Get the net returns amount
+            ret_disc = row[6]  # Get the returns discount
+            sales_data.append({
+                "BILLTYPE": row[2],  # Get the bill type
+                "SALECOUNT": row[7],  # Get the sales count
+                "SALE_NET": row[3],  # Get the net sales amount
+                "SALE_DISC": row[4],  # Get the sales discount
+                "SALE_AMT": sale_net + sale_disc,  # Calculate the total sales amount
+                "RETCOUNT": row[8],  # Get the returns count
+                "RET_NET": ret_net,  # Get the net returns amount
+                "RET_DISC": ret_disc,  # Get the returns discount
+                "RET_AMT": ret_net + ret_disc  # Calculate the total returns amount
+            })  # Add the sales data to the list
+        elif isheader == 0:
+            partner_data.append({
+                "NAME": row[2],  # Get the partner name
+                "BILLCNT": row[7],  # Get the bill count
+                "AMOUNT": row[3]  # Get the amount
+            })  # Add the partner data to the list
+        elif isheader == 2:
+            healing_data.append({
+                "NAME": row[2],  # Get the HealingCard payment type
+                "AMOUNT": row[3]  # Get the amount
+            })  # Add the HealingCard data to the list
+        elif isheader in (4, 5):
+            total_paid_in += Decimal(row[3])  # Add the collection to paid in
+
+    tot_sale_count = tot_sale_amt = tot_sale_disc = tot_sale_net = 0  # Initialize totals for sales
+    tot_ret_count = tot_ret_amt = tot_ret_disc = tot_ret_net = 0  # Initialize totals for returns
+    net_cash_sales = 0  # Initialize net cash sales
+
+    for s in sales_data:
+        if s["BILLTYPE"].upper() != "GIFT":
+            tot_sale_count   += s["SALECOUNT"]  # Add the sales count to the total
+            tot_sale_amt     += float(s["SALE_AMT"])  # Add the sales amount to the total
+            tot_sale_disc    += float(s["SALE_DISC"])  # Add the sales discount to the total
+            tot_sale_net     += float(s["SALE_NET"])  # Add the net sales amount to the total
+            tot_ret_count    += s["RETCOUNT"]  # Add the returns count to the total
+            tot_ret_amt      += float(s["RET_AMT"])  # Add the returns amount to the total
+            tot_ret_disc     += float(s["RET_DISC"])  # Add the returns discount to the total
+            tot_ret_net      += float(s["RET_NET"])  # Add the net returns amount to the total
+        if s["BILLTYPE"].upper() == "CASH":
+            net_cash_sales = s["SALE_NET"] + s["RET_NET"]  # Calculate the net cash sales
+
+    tot_overall_count = tot_sale_count + tot_ret_count  # Calculate the total overall count
+    tot_overall_amt   = tot_sale_amt + tot_ret_amt  # Calculate the total overall amount
+    tot_overall_disc  = tot_sale_disc + tot_ret_disc  # Calculate the total overall discount
+    tot_overall_net   = tot_sale_net + tot_ret_net  # Calculate the total overall net amount
+
+    for s in sales_data:
+        overall_count = s["SALECOUNT"] + s["RETCOUNT"]  # Calculate the overall count for the row
+        overall_amt   = s["SALE_AMT"] + s["RET_AMT"]  # Calculate the overall amount for the row
+        overall_disc  = s["SALE_DISC"] + s["RET_DISC"]  # Calculate the overall discount for the row
+        overall_net   = s["SALE_NET"] + s["RET_NET"]  # Calculate the overall net amount for the row
+        row_line = (
+            f"{s['BILLTYPE']:<17} |"
+            f"{s['SALECOUNT']:8d} |"
+            f"{format_currency(s['SALE_AMT']):>12} |"
+            f"{format_currency(s['SALE_DISC']):>12} |"
+            f"{format_currency(s['SALE_NET']):>12} |"
+            f"{s['RETCOUNT']:6d} |"
+            f"{format_currency(s['RET_AMT']):>12} |"
+            f"{format_currency(s['RET_DISC']):>12} |"
+            f"{format_currency(s['RET_NET']):>12} |"
+            f"{overall_count:6d} |"
+            f"{format_currency(overall_amt):>12} |"
+            f"{format_currency(overall_disc):>12} |"
+            f"{format_currency(overall_net):>12} |"
+        )  # Format the row data as a string
+        lines.append(row_line)  # Add the row data to the report
+    lines.append("-" * PAGE_WIDTH)  # Add a separator line
+
+    totals_line = (
+        f"{'TOTALAMOUNT   :':<17} |"
+        f"{tot_sale_count:8d} |"
+        f"{format_currency(tot_sale_amt):>12} |"
+        f"{format_currency(tot_sale_disc):>12} |"
+        f"{format_currency(tot_sale_net):>12} |"
+        f"{int(tot_ret_count):6d} |"
+        f"{format_currency(tot_ret_amt):>12} |"
+        f"{format_currency(tot_ret_disc):>12} |"
+        f"{format_currency(tot_ret_net):>12} |"
+        f"{int(tot_overall_count):6d} |"
+        f"{format_currency(tot_overall_amt):>12} |"
+        f"{format_currency(tot_overall_disc):>12} |"
+        f"{format_currency(tot_overall_net):>12} |"
+    )  # Format the totals as a string
+    lines.append(totals_line)  # Add the totals to the report
+    lines.append("-" * PAGE_WIDTH)  # Add a separator line
+
+    lines.extend([
+        "\nSALES :-",
+        f"\n       Net Cash Sales        : {format_currency(net_cash_sales)}",
+        f"       Total Paid In         : {format_currency(total_paid_in):>10}",
+        "       Total Paid out        :       0.00"
+    ])  # Add additional sales information to the report
+    total_paid_out = Decimal('0.0')  # Initialize total paid out
+    total_sales = Decimal(net_cash_sales) + total_paid_in + total_paid_out  # Calculate total sales
+    lines.append(f"       Total Sales           : {format_currency(total_sales)}\n")  # Add total sales to the report
+
+    healing_cash = sum((h["AMOUNT"] for h in healing_data if "CASH" in h["NAME"].upper()), 0)  # Cash collections
+    healing_card = sum((h["AMOUNT"] for h in healing_data if "CASH" not in h["NAME"].upper()), 0)  # Card collections
+    if healing_data:
+        healing_lines = [
+            f"     Cash Collections        : {format_currency(healing_cash):>9}",
+            f"     Credit Card Collections : {format_currency(healing_card):>9}",
+            f"     Total Collection        : {format_currency(healing_cash + healing_card):>9}\n",
+        ]  # Format the HealingCard collections
+    else:
+        healing_lines = [
+            f"     Cash Collections        : {'0':>9}",
+            f"     Credit Card Collections : {'0':>9}",
+            f"     Total Collection        : {'0':>9}\n",
+        ]  # Not queried (or none in the range)
+    lines.extend(["HealingCard Collections:"] + healing_lines + [
+        f"Total Cash Amount            : {format_currency(total_sales)} ",
+        "\n" + "-" * 180 + "\n"
+    ])  # Add healing card collections to the report
+
+    lines.append("\nPartner Program Summary  :\n")  # Add a header for the partner program summary
+    partner_header = " slno| Name                                     |     NoInv        |    Amount    |"  # Define the partner header
+    lines.append(partner_header)  # Add the partner header to the report
+    lines.append("-" * PAGE_WIDTH)  # Add a separator line
+
+    tot_partner_inv = tot_partner_amt = 0  # Initialize totals for partner invoices and amounts
+    for idx, p in enumerate(partner_data, start=1):
+        tot_partner_inv += p["BILLCNT"]  # Add the bill count to the total
+        tot_partner_amt += float(p["AMOUNT"])  # Add the amount to the total
+        part_line = (
+            f"{idx:6d} | {p['NAME']:<38} |     {p['BILLCNT']:12d} | {format_currency(p['AMOUNT']):>12} |"
+        )  # Format the partner data as a string
+        lines.append(part_line)  # Add the partner data to the report
+    lines.append("-" * (PAGE_WIDTH - 50))  # Add a separator line
+    partner_totals_line = (
+        f"      TOTAL AMOUNT:                    {tot_partner_inv:27d} | {format_currency(tot_partner_amt):>9} |"
+    )  # Format the partner totals as a string
+    lines.append(partner_totals_line)  # Add the partner totals to the report
+    lines.append("-" * (PAGE_WIDTH - 50))  # Add a separator line
+
+    fixed_lines = [fix_line(line) for line in lines]  # Fix the width of each line in the report
+    return "\n".join(fixed_lines)  # Return the report as a string
@@ -0,0 +1,134 @@
+"""
+In-process memoization of report query results.
+
+Entries are keyed by (site, database, from_date, to_date, query variant).
+Ranges that include today get a short TTL because the store is still
+trading; closed ranges get a long one. The cache is bounded by an estimate
+of the memory its rows use and evicts least-recently-used entries first.
+Concurrent requests for the same key share a single in-flight query.
+"""
+import concurrent.futures  # Import concurrent.futures for the in-flight Future
+import sys  # Import sys for size estimates
+import threading  # Import threading for the cache lock
+import time  # Import time for TTL bookkeeping
+from collections import OrderedDict  # Import OrderedDict for LRU order
+from datetime import date  # Import date to decide whether a range is still open
+
+from queries import as_date, query_variant  # Import the query variant and date helper
+
+OPEN_RANGE_TTL = 120.0  # Seconds to keep a result whose range includes today
+CLOSED_RANGE_TTL = 6 * 3600.0  # Seconds to keep a result for a fully closed range
+MAX_BYTES = 64 * 1024 * 1024  # Approximate memory budget for cached rows
+
+
+def estimate_size(value):
+    """Rough memory footprint of a (rows, site_name) result in bytes."""
+    rows, site_name = value
+    size = sys.getsizeof(rows) + sys.getsizeof(site_name)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row)
+    return size
+
+
+class ResultCache:
+    """Thread-safe TTL + LRU cache with request coalescing and hit/miss counters."""
+
+    def __init__(self, max_bytes=MAX_BYTES, open_ttl=OPEN_RANGE_TTL, closed_ttl=CLOSED_RANGE_TTL):
+        self.max_bytes = max_bytes  # Memory budget
+        self.open_ttl = open_ttl  # TTL for ranges including today
+        self.closed_ttl = closed_ttl  # TTL for closed ranges
+        self._lock = threading.Lock()  # Guards everything below
+        self._entries = OrderedDict()  # key -> (value, size, expires_at), oldest first
+        self._in_flight = {}  # key -> Future shared by concurrent callers
+        self._bytes = 0  # Current estimated size
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "expired": 0}  # Counters
+
+    @staticmethod
+    def make_key(site_id, database, from_date, to_date, variant=None):
+        """Build the cache key for one report request (variant defaults to query_variant())."""
+        return (site_id, database, as_date(from_date).isoformat(), as_date(to_date).isoformat(),
+                variant or query_variant())
+
+    def _ttl_for(self, to_date, today=None):
+        return self.open_ttl if as_date(to_date) >= (today or date.today()) else self.closed_ttl
+
+    def get_or_compute(self, key, compute, refresh=False):
+        """
+        Return the cached value for key, or call compute() once and cache its
+        result. Concurrent callers with the same key wait for the same
+        compute() call. Exceptions are propagated and never cached.
+        refresh=True skips the lookup (but still coalesces and stores).
+        """
+        with self._lock:
+            if not refresh:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    value, size, expires_at = entry
+                    if expires_at > time.monotonic():
+                        self._entries.move_to_end(key)  # Mark as most recently used
+                        self._stats["hits"] += 1
+                        return value
+                    self._remove_locked(key)  # Stale
+                    self._stats["expired"] += 1
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1  # Piggyback on the running query
+                owner = False
+            else:
+                self._stats["misses"] += 1
+                future = concurrent.futures.Future()
+                self._in_flight[key] = future
+                owner = True
+
+        if not owner:
+            return future.result()  # Wait for the owner's query
+
+        try:
+            value = compute()  # Run the real query
+        except BaseException as e:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            future.set_exception(e)  # Waiters see the same error
+            raise
+        self.put(key, value)
+        with self._lock:
+            self._in_flight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def put(self, key, value):
+        """Store value under key with the TTL for its date range."""
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return  # Would evict everything else; not worth caching
+        expires_at = time.monotonic() + self._ttl_for(key[3])
+        with self._lock:
+            self._remove_locked(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove_locked(oldest)  # Least recently used goes first
+                self._stats["evictions"] += 1
+
+    def _remove_locked(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def invalidate(self, site_id=None):
+        """Drop every entry, or only the entries for one site."""
+        with self._lock:
+            for key in [k for k in self._entries if site_id is None or k[0] == site_id]:
+                self._remove_locked(key)
+
+    def stats(self):
+        """Return hit/miss/coalesced/eviction counters and the current size."""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["entries"] = len(self._entries)
+            snapshot["bytes"] = self._bytes
+            return snapshot
+
+
+RESULT_CACHE = ResultCache()  # Process-wide result cache
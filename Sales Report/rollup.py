@@ -0,0 +1,136 @@
+"""
+Cross-site consolidated rollup.
+
+RollupCollector keeps the raw BILLTYPE (ISHEADER 1/3) and partner
+(ISHEADER 0) rows returned by get_report_data for every site in plain
+column lists while the batch runs. At the end they become one pandas
+DataFrame and the consolidated totals, partner totals and per-site ranking
+are computed with vectorized group-bys, so the work stays cheap for
+thousands of stores and nobody has to parse the per-site text reports.
+"""
+import threading  # Import threading for the collector lock
+
+from renderer import PAGE_WIDTH, ROW_FORMAT  # Import the report width and row layout
+
+COLUMNS = ("SITEID", "SITENAME", "ISHEADER", "CORPCODE", "NAME",
+           "SALE_NET", "SALE_DISC", "RET_NET", "RET_DISC", "SALECOUNT", "RETCOUNT")  # Collected columns
+
+
+class RollupCollector:
+    """Thread-safe, columnar accumulator of report rows across sites."""
+
+    def __init__(self):
+        self._lock = threading.Lock()  # Guards the column lists
+        self._columns = {name: [] for name in COLUMNS}  # Column name -> values
+        self.sites = 0  # Sites added so far
+
+    def add(self, site_id, site_name, result):
+        """Append one site's REPORT_QUERY rows (collections rows are ignored)."""
+        rows = [row for row in result if row[0] in (0, 1, 3)]
+        with self._lock:
+            cols = self._columns
+            for row in rows:
+                cols["SITEID"].append(site_id)
+                cols["SITENAME"].append(site_name)
+                cols["ISHEADER"].append(int(row[0]))
+                cols["CORPCODE"].append(str(row[1]))
+                cols["NAME"].append(row[2] or "")
+                cols["SALE_NET"].append(float(row[3] or 0))
+                cols["SALE_DISC"].append(float(row[4] or 0))
+                cols["RET_NET"].append(float(row[5] or 0))
+                cols["RET_DISC"].append(float(row[6] or 0))
+                cols["SALECOUNT"].append(int(row[7] or 0))
+                cols["RETCOUNT"].append(int(row[8] or 0))
+            self.sites += 1
+
+    def frame(self):
+        """Return the collected rows as a pandas DataFrame."""
+        import pandas as pd  # Imported lazily: only runs that ask for a rollup pay for pandas
+        with self._lock:
+            return pd.DataFrame({name: list(values) for name, values in self._columns.items()}, columns=list(COLUMNS))
+
+    def compute(self):
+        """
+        Return (billtypes, partners, ranking) DataFrames:
+        - billtypes: SALES/RETURNS/NET totals per BILLTYPE across all sites
+        - partners: invoices and amount per corporate across all sites
+        - ranking: per-site net sales (GIFT excluded), best first
+        """
+        df = self.frame()
+        sales = df[df["ISHEADER"].isin([1, 3])].assign(
+            SALE_AMT=lambda d: d["SALE_NET"] + d["SALE_DISC"],
+            RET_AMT=lambda d: d["RET_NET"] + d["RET_DISC"])
+        billtypes = (sales.groupby("NAME", sort=True)[
+            ["SALECOUNT", "SALE_AMT", "SALE_DISC", "SALE_NET", "RETCOUNT", "RET_AMT", "RET_DISC", "RET_NET"]]
+            .sum().reset_index().rename(columns={"NAME": "BILLTYPE"}))
+        billtypes["NETCOUNT"] = billtypes["SALECOUNT"] + billtypes["RETCOUNT"]
+        billtypes["NET_AMT"] = billtypes["SALE_AMT"] + billtypes["RET_AMT"]
+        billtypes["NET_DISC"] = billtypes["SALE_DISC"] + billtypes["RET_DISC"]
+        billtypes["NET_NET"] = billtypes["SALE_NET"] + billtypes["RET_NET"]
+
+        partners = (df[df["ISHEADER"] == 0]
+                    .groupby(["CORPCODE", "NAME"], sort=False)
+                    .agg(BILLCNT=("SALECOUNT", "sum"), AMOUNT=("SALE_NET", "sum"), SITES=("SITEID", "nunique"))
+                    .reset_index().sort_values("AMOUNT", ascending=False, kind="stable"))
+
+        countable = sales[sales["NAME"].str.upper() != "GIFT"]
+        ranking = (countable.groupby(["SITEID", "SITENAME"], sort=False)
+                   .agg(BILLS=("SALECOUNT", "sum"), RETURNS=("RETCOUNT", "sum"),
+                        SALES_NET=("SALE_NET", "sum"), RETURNS_NET=("RET_NET", "sum"))
+                   .reset_index())
+        ranking["NET"] = ranking["SALES_NET"] + ranking["RETURNS_NET"]
+        ranking = ranking.sort_values("NET", ascending=False, kind="stable").reset_index(drop=True)
+        ranking.insert(0, "RANK", ranking.index + 1)
+        return billtypes, partners, ranking
+
+    def render(self, from_date, to_date, now=None):
+        """
+        Return {entry_name: text} for the ZIP: a consolidated fixed-width
+        report and a per-site ranking CSV.
+        """
+        from datetime import datetime  # Import datetime for the header timestamp
+        billtypes, partners, ranking = self.compute()
+        width = PAGE_WIDTH
+        now = now or datetime.now()
+        sep = "-" * width
+        lines = [
+            f"DATE: {now.strftime('%d/%m/%Y')}".rjust(width),
+            f"TIME: {now.strftime('%I:%M %p')}".rjust(width),
+            "",
+            "APOLLO PHARMACIES LIMITED".center(width),
+            f"Consolidated Sales Summary - {self.sites} sites".center(width),
+            f"From Date : {from_date}    To Date : {to_date}".center(width),
+            sep,
+            "|" + " SALES ".center(55) + "|" + " RETURNS ".center(55) + "|" + " NET ".center(55) + "|",
+            sep,
+            f"{'BILLTYPE':<17} |{'NO':>8} |{'AMT':>12} |{'DISC':>12} |{'NET':>12} |"
+            f"{'NO':>6} |{'AMT':>12} |{'DISC':>12} |{'NET':>12} |"
+            f"{'NO':>6} |{'AMT':>12} |{'DISC':>12} |{'NET':>12} |",
+            sep,
+        ]
+        order = ["BILLTYPE", "SALECOUNT", "SALE_AMT", "SALE_DISC", "SALE_NET", "RETCOUNT", "RET_AMT", "RET_DISC",
+                 "RET_NET", "NETCOUNT", "NET_AMT", "NET_DISC", "NET_NET"]
+        for values in billtypes[order].itertuples(index=False):
+            lines.append(ROW_FORMAT(values[0], int(values[1]), *values[2:5], int(values[5]), *values[6:9],
+                                    int(values[9]), *values[10:]))
+        lines.append(sep)
+        totals = billtypes[billtypes["BILLTYPE"].str.upper() != "GIFT"][order[1:]].sum()
+        lines.append(ROW_FORMAT("TOTALAMOUNT   :", int(totals["SALECOUNT"]), *totals[order[2:5]], int(totals["RETCOUNT"]),
+                                *totals[order[6:9]], int(totals["NETCOUNT"]), *totals[order[10:]]))
+        lines.append(sep)
+        lines.append("")
+        lines.append("Partner Program Summary  :")
+        lines.append(" slno| Name                                     |     NoInv        |    Amount    | Sites |")
+        lines.append(sep)
+        for idx, (name, billcnt, amount, sites) in enumerate(
+                partners[["NAME", "BILLCNT", "AMOUNT", "SITES"]].itertuples(index=False), start=1):
+            lines.append(f"{idx:6d} | {name:<38} |     {int(billcnt):12d} | {amount:>12,.2f} | {int(sites):5d} |")
+        lines.append("-" * (width - 50))
+        lines.append(f"      TOTAL AMOUNT:                    {int(partners['BILLCNT'].sum()):27d} | "
+                     f"{partners['AMOUNT'].sum():>12,.2f} |")
+        lines.append("-" * (width - 50))
+        report = "\n".join(line.ljust(width)[:width] for line in lines)
+        return {
+            "Consolidated.txt": report,
+            "SiteRanking.csv": ranking.to_csv(index=False, float_format="%.2f"),
+        }
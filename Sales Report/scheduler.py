@@ -0,0 +1,183 @@
+"""
+Adaptive site scheduler.
+
+Replaces the fixed ThreadPoolExecutor(max_workers=10) fan-out. The number of
+sites in flight follows the observed latency and error rate (additive
+increase, multiplicative decrease), each subnet can be capped separately so
+one congested WAN link does not starve the other, transient failures are
+retried with jittered exponential backoff, and priority sites are started
+first.
+"""
+import concurrent.futures  # Import concurrent.futures for the worker threads
+import heapq  # Import heapq for the retry timer queue
+import random  # Import random for backoff jitter
+import statistics  # Import statistics for window medians
+import threading  # Import threading for the dispatcher condition
+import time  # Import time for latency and backoff timing
+from collections import deque  # Import deque for the per-subnet ready queues
+
+INITIAL_CONCURRENCY = 10  # Sites in flight when a run starts
+MIN_CONCURRENCY = 2  # Never go below this many sites in flight
+MAX_CONCURRENCY = 64  # Never go above this many sites in flight
+WINDOW = 20  # Completions between concurrency adjustments
+MAX_ERROR_RATE = 0.2  # Error rate above which concurrency is cut
+SLOWDOWN_FACTOR = 2.0  # Window latency / baseline ratio above which concurrency is cut
+DECREASE_FACTOR = 0.7  # Multiplicative decrease
+MAX_RETRIES = 2  # Retries per site for transient errors
+BACKOFF_BASE = 1.0  # Seconds before the first retry
+BACKOFF_MAX = 30.0  # Upper bound for a single backoff
+
+
+def _never_transient(error):
+    return False
+
+
+class AdaptiveScheduler:
+    """
+    Run task(item) for every item with adaptive concurrency.
+
+    subnet_caps maps a subnet key (as returned by subnet_of(item)) to the
+    maximum number of items of that subnet in flight; subnets without an
+    entry are only bound by the global limit. subnet_of may also return a
+    tuple of keys for an item that could be on any of those subnets; it then
+    counts against (and needs room in) every one of them. is_transient(exc) decides
+    whether a failed item is retried.
+    """
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, min_concurrency=MIN_CONCURRENCY,
+                 max_concurrency=MAX_CONCURRENCY, subnet_caps=None, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, is_transient=_never_transient,
+                 window=WINDOW):
+        self.min_concurrency = max(1, min_concurrency)  # Lower bound
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)  # Upper bound
+        self.limit = min(max(initial, self.min_concurrency), self.max_concurrency)  # Current global limit
+        self.subnet_caps = {k: max(1, v) for k, v in (subnet_caps or {}).items()}  # Per-subnet limits
+        self.max_retries = max_retries  # Retry budget per item
+        self.backoff_base = backoff_base  # First backoff delay
+        self.backoff_max = backoff_max  # Largest backoff delay
+        self.is_transient = is_transient  # Error classifier
+        self.window = window  # Completions per adjustment
+        self.retries = 0  # Total retries issued in the last run
+        self._baseline = None  # Best (lowest) window median latency seen so far
+        self._samples = []  # (duration, failed) for the current window
+
+    def _backoff(self, attempt):
+        """Full-jitter exponential backoff for the given retry number (1-based)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1))))
+
+    def _record(self, duration, failed):
+        """Feed one completion into the controller and adjust the limit per window."""
+        self._samples.append((duration, failed))
+        if len(self._samples) < self.window:
+            return
+        latency = statistics.median(d for d, _ in self._samples)  # Typical latency this window
+        error_rate = sum(1 for _, f in self._samples if f) / len(self._samples)  # Share of failures
+        self._samples = []
+        if self._baseline is None:
+            self._baseline = latency
+        if error_rate > MAX_ERROR_RATE or latency > self._baseline * SLOWDOWN_FACTOR:
+            self.limit = max(self.min_concurrency, int(self.limit * DECREASE_FACTOR))  # Back off
+        else:
+            self.limit = min(self.max_concurrency, self.limit + max(1, self.limit // 10))  # Probe for more
+        self._baseline = min(latency, self._baseline * 1.05)  # Let the baseline drift with the network
+
+    def run(self, items, task, subnet_of=lambda item: None, priority=(), on_retry=None):
+        """
+        Run task over items and yield (item, result, error, attempts) as each
+        item finishes; error is None on success. Items listed in priority are
+        started first, in the order given. on_retry(item, attempt, delay, error)
+        is called before a transient failure is retried.
+        """
+        items = list(items)
+        wanted = set(items)
+        first = [item for item in dict.fromkeys(priority) if item in wanted]  # Priority items that are part of the run
+        first_set = set(first)
+        queues = {}  # subnet keys -> deque of (order, item, attempt) waiting for a slot, in start order
+        queued = 0  # Items waiting in queues
+        front = 0  # Decreasing order numbers put retries ahead of everything queued
+        waiting = []  # Heap of (not_before, seq, item, attempt) for retries
+        in_flight_subnet = {}  # subnet -> items in flight
+        done = deque()  # Completed (item, result, error, attempt, duration, subnet)
+        cond = threading.Condition()  # Wakes the dispatcher on completion
+        seq = 0  # Tie-breaker for the retry heap
+        in_flight = 0  # Items currently running
+        self.retries = 0
+
+        def finished(future, item, attempt, started, subnet):
+            error = future.exception()
+            result = None if error else future.result()
+            with cond:
+                done.append((item, result, error, attempt, time.monotonic() - started, subnet))
+                cond.notify()
+
+        def enqueue(item, attempt, order):
+            subnet = subnet_of(item)  # Looked up once per queueing, not on every dispatch pass
+            keys = subnet if isinstance(subnet, tuple) else (subnet,)  # Every subnet the item may land on
+            queue = queues.setdefault(keys, deque())
+            if queue and order < queue[0][0]:
+                queue.appendleft((order, item, attempt))  # A retry goes to the front
+            else:
+                queue.append((order, item, attempt))
+
+        def has_room(keys):
+            return all(self.subnet_caps.get(key) is None or in_flight_subnet.get(key, 0) < self.subnet_caps[key]
+                       for key in keys)
+
+        for order, item in enumerate(first + [item for item in items if item not in first_set]):
+            enqueue(item, 1, order)
+            queued += 1
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_concurrency)
+        try:
+            while queued or waiting or in_flight:
+                now = time.monotonic()
+                while waiting and waiting[0][0] <= now:
+                    _, _, item, attempt = heapq.heappop(waiting)  # Retry is due
+                    front -= 1
+                    enqueue(item, attempt, front)
+                    queued += 1
+                # Start as many items as the global and subnet limits allow, taking the
+                # earliest item among the subnets that still have room.
+                while queued and in_flight < self.limit:
+                    open_queues = [(queue[0][0], keys, queue) for keys, queue in queues.items()
+                                   if queue and has_room(keys)]
+                    if not open_queues:
+                        break  # Every subnet with waiting items is saturated
+                    _, subnet, queue = min(open_queues, key=lambda entry: entry[0])
+                    _, item, attempt = queue.popleft()
+                    queued -= 1
+                    in_flight += 1
+                    for key in subnet:
+                        in_flight_subnet[key] = in_flight_subnet.get(key, 0) + 1
+                    started = time.monotonic()
+                    future = executor.submit(task, item)
+                    future.add_done_callback(
+                        lambda f, item=item, attempt=attempt, started=started, subnet=subnet:
+                        finished(f, item, attempt, started, subnet))
+
+                with cond:
+                    if not done:
+                        timeout = None
+                        if waiting:
+                            timeout = max(0.0, waiting[0][0] - time.monotonic())
+                        if in_flight or timeout is not None:
+                            cond.wait(timeout=timeout if timeout is not None else 1.0)
+                    completed = list(done)
+                    done.clear()
+
+                for item, result, error, attempt, duration, subnet in completed:
+                    in_flight -= 1
+                    for key in subnet:
+                        in_flight_subnet[key] -= 1
+                    self._record(duration, error is not None)
+                    if error is not None and attempt <= self.max_retries and self.is_transient(error):
+                        delay = self._backoff(attempt)  # Jittered exponential backoff
+                        self.retries += 1
+                        if on_retry:
+                            on_retry(item, attempt, delay, error)
+                        seq += 1
+                        heapq.heappush(waiting, (time.monotonic() + delay, seq, item, attempt + 1))
+                        continue
+                    yield item, result, error, attempt
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
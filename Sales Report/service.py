@@ -0,0 +1,516 @@
+"""
+Long-running local HTTP service for report generation.
+
+Instead of every analyst's desktop app opening its own cold connections and
+running its own copy of the same queries, one service process owns the
+connection pool (pool.POOL), the result cache (resultcache.RESULT_CACHE),
+the host map and the unreachable-host cache, and runs submitted jobs from
+a queue on a fixed number of job workers. Two analysts asking for the same
+sites and dates share the store queries; later jobs reuse warm connections.
+
+    python service.py --username sa --database AXDB --port 8765
+
+API (JSON in and out; add "Authorization: Bearer <token>" when the service
+was started with a token):
+
+    POST   /jobs                {"sites": ["13100", ...] or "13100,13101", "from_date": "2024-05-01",
+                                 "to_date": "2024-05-31", "profile": "standard", "daily": false,
+                                 "ip_series": "16", "custom_ip": null,
+                                 "archive_format": "zip", "compress_level": null,
+                                 "username"/"password"/"database": optional; send username and
+                                 password together, or none of the three to use the service's}
+                                -> 202 {"id": ..., "status": "queued", ...}
+    GET    /jobs                -> every job's status
+    GET    /jobs/<id>?since=N   -> status, progress and the log lines from index N on
+    GET    /jobs/<id>/result    -> the archive once the job is done (409 before)
+    DELETE /jobs/<id>           -> cancel a queued job, or forget a finished one
+    GET    /health              -> queue length, pool and cache counters
+
+Results are kept in the service folder for JOB_TTL seconds; results left
+there by an earlier service process are removed at start-up. The desktop app
+sends its runs here when $SALES_REPORT_SERVICE_URL is set (see submit_job,
+wait_for_job and download_result).
+"""
+import argparse  # Import argparse for command-line parsing
+import collections  # Import collections for the bounded job log
+import json  # Import json for requests and responses
+import os  # Import os for paths and environment variables
+import queue  # Import queue for the job queue
+import re  # Import re to recognize leftover result files
+import shutil  # Import shutil to stream result files
+import sys  # Import sys for exit codes
+import threading  # Import threading for the job workers and locks
+import time  # Import time for timestamps and expiry
+import urllib.error  # Import urllib.error for client-side HTTP errors
+import urllib.parse  # Import urllib.parse for the query string
+import urllib.request  # Import urllib.request for the client helpers
+import uuid  # Import uuid for job IDs
+from datetime import datetime  # Import datetime for date validation and log timestamps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # Import the HTTP server
+
+from archive import EntryPacker, ReportArchive  # Import the archive writer
+from queries import DEFAULT_PROFILE, PROFILES  # Import the report profiles
+
+_CONTENT_TYPES = {".zip": "application/zip", ".tar.gz": "application/gzip", ".tar.xz": "application/x-xz",
+                  ".tar.zst": "application/zstd"}  # Result extension -> Content-Type
+
+DEFAULT_HOST = "127.0.0.1"  # Only this machine by default
+DEFAULT_PORT = 8765  # Default listening port
+DEFAULT_DIR = os.environ.get("SALES_REPORT_SERVICE_DIR") or os.path.join(
+    os.path.expanduser("~"), ".sales_report", "service")  # Where finished archives are kept
+JOB_WORKERS = 2  # Jobs run at the same time; each runs its sites in parallel
+JOB_TTL = 24 * 3600  # Seconds a finished job and its archive are kept
+JOB_LOG_LINES = 1000  # Log lines kept per job
+MAX_REQUEST_BYTES = 4 * 1024 * 1024  # Largest accepted request body
+SERVICE_URL_ENV = "SALES_REPORT_SERVICE_URL"  # Where the desktop app finds the service
+TOKEN_ENV = "SALES_REPORT_SERVICE_TOKEN"  # Shared bearer token, if any
+_RESULT_NAME = re.compile(r"^[0-9a-f]{12}(%s)$" % "|".join(re.escape(ext) for ext in _CONTENT_TYPES))  # <job id><ext>
+
+
+def _no_log(message):
+    pass
+
+
+class Job:
+    """
+    One submitted report run. The job is passed to engine.run_batch as its
+    checkpoint, so every site outcome arrives through record_success and
+    record_failure and shows up in the progress right away.
+    """
+
+    def __init__(self, site_ids, params, password):
+        self.id = uuid.uuid4().hex[:12]  # Short, unguessable enough for a local service
+        self.site_ids = site_ids
+        self.params = params  # Run parameters without the password (safe to show)
+        self.password = password
+        self.status = "queued"  # queued -> running -> done | failed; or cancelled
+        self.created = time.time()
+        self.started = self.finished = None
+        self.succeeded = 0
+        self.failures = {}  # {site_id: error}
+        self.error = None  # Why the whole job failed
+        self.result_path = None  # Finished archive
+        self._lock = threading.Lock()
+        self._log = collections.deque(maxlen=JOB_LOG_LINES)
+        self._logged = 0  # Lines ever logged, so clients can ask for what is new
+
+    def log(self, message):
+        with self._lock:
+            self._log.append(f"{datetime.now().strftime('%H:%M:%S')} - {message}")
+            self._logged += 1
+
+    def log_since(self, index):
+        """Return (lines logged from index on, next index). Lines that fell out of the buffer are skipped."""
+        with self._lock:
+            first = self._logged - len(self._log)  # Index of the oldest kept line
+            lines = list(self._log)[max(0, index - first):]
+            return lines, self._logged
+
+    def record_success(self, site_id, report_text):
+        with self._lock:
+            self.succeeded += 1
+            self.failures.pop(site_id, None)  # A retried site may have failed before
+
+    def record_failure(self, site_id, error):
+        with self._lock:
+            self.failures[site_id] = str(error)
+
+    def to_dict(self, since=None):
+        with self._lock:
+            data = {"id": self.id, "status": self.status, "sites": len(self.site_ids),
+                    "succeeded": self.succeeded, "failed": len(self.failures), "params": self.params,
+                    "created": self.created, "started": self.started, "finished": self.finished,
+                    "error": self.error, "result": self.result_path is not None}
+            if self.status in ("done", "failed"):
+                data["failures"] = dict(self.failures)
+        if since is not None:
+            data["log"], data["next"] = self.log_since(since)
+        return data
+
+
+class ReportService:
+    """Job queue, job workers and the finished-job table. Shares the engine's process-wide caches."""
+
+    def __init__(self, directory=DEFAULT_DIR, job_workers=JOB_WORKERS, username=None, password=None, database=None,
+                 log=_no_log):
+        self.directory = directory  # Finished archives
+        self.job_workers = job_workers
+        self.defaults = {"username": username, "password": password, "database": database}  # Service credentials
+        self.log = log
+        self._queue = queue.Queue()  # Jobs waiting for a worker
+        self._jobs = {}  # id -> Job
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        removed = self.clear_leftovers()
+        if removed:
+            self.log(f"Removed {removed} result file(s) left by an earlier service process.")
+        for i in range(self.job_workers):
+            threading.Thread(target=self._work, name=f"job-worker-{i + 1}", daemon=True).start()
+
+    def submit(self, request):
+        """Validate a job request (see the module docstring), queue it and return the Job. Raises ValueError."""
+        from sitelist import parse_site_ids
+
+        sites = request.get("sites")
+        if isinstance(sites, list):
+            sites = ",".join(str(site) for site in sites)
+        if not sites:
+            raise ValueError("'sites' is required.")
+        custom_ip = request.get("custom_ip") or None
+        site_list = parse_site_ids(str(sites), check_host=not custom_ip)
+        if not site_list.site_ids:
+            raise ValueError("No valid site IDs to process.")
+        for name in ("from_date", "to_date"):
+            try:
+                datetime.strptime(str(request.get(name)), "%Y-%m-%d")
+            except ValueError:
+                raise ValueError(f"'{name}' must be a YYYY-MM-DD date.") from None
+        profile = request.get("profile") or DEFAULT_PROFILE
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown profile '{profile}'; expected {', '.join(sorted(PROFILES))}.")
+        ip_series = str(request.get("ip_series") or "16")
+        if ip_series not in ("16", "28", "auto"):
+            raise ValueError("'ip_series' must be 16, 28 or auto.")
+        archive_format = request.get("archive_format") or None  # None = the service's default
+        compress_level = request.get("compress_level")
+        if compress_level is not None and not isinstance(compress_level, int):
+            raise ValueError("'compress_level' must be an integer.")
+        EntryPacker(archive_format, compress_level)  # Raises ValueError for an unknown format or level
+        sent = {name: request.get(name) for name in self.defaults if request.get(name)}
+        if sent:
+            if not (sent.get("username") and sent.get("password")):
+                raise ValueError("Send 'username' and 'password' together, or none of username/password/database "
+                                 "to use the service's own.")  # Never pair a caller's username with our password
+            credentials = dict(sent)
+            credentials.setdefault("database", self.defaults["database"])
+        else:
+            credentials = dict(self.defaults)  # The service's credentials, only ever as a set
+        missing = [name for name, value in credentials.items() if not value]
+        if missing:
+            raise ValueError(f"Missing {', '.join(missing)} (the service has no default).")
+        params = {"from_date": request["from_date"], "to_date": request["to_date"],
+                  "username": credentials["username"], "database": credentials["database"],
+                  "ip_series_choice": ip_series, "custom_ip": custom_ip, "profile": profile,
+                  "daily": bool(request.get("daily")), "archive_format": archive_format,
+                  "compress_level": compress_level}
+        job = Job(site_list.site_ids, params, credentials["password"])
+        job.log(f"Queued {site_list.summary()}.")
+        with self._lock:
+            self._jobs[job.id] = job
+        self._queue.put(job)
+        self.log(f"Job {job.id}: {len(job.site_ids)} sites, {params['from_date']} to {params['to_date']} queued.")
+        return job
+
+    def clear_leftovers(self):
+        """
+        Delete job results and spool files left in the folder by an earlier
+        process. Jobs are not reloaded after a restart, so nothing could
+        download or prune them. Returns how many files were removed.
+        """
+        removed = 0
+        for name in os.listdir(self.directory):
+            if _RESULT_NAME.match(name) or (name.startswith(".SiteReports-") and name.endswith(".part")):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    removed += 1
+                except OSError:
+                    pass  # In use or already gone
+        return removed
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued job or forget a finished one (deleting its archive).
+        Returns False for a running job, which cannot be stopped halfway.
+        """
+        job = self.get(job_id)
+        with job._lock:
+            if job.status == "running":
+                return False
+            if job.status == "queued":
+                job.status = "cancelled"  # The worker skips it
+                job.finished = time.time()
+                return True
+        self._forget(job)
+        return True
+
+    def _forget(self, job):
+        with self._lock:
+            self._jobs.pop(job.id, None)
+        if job.result_path and os.path.exists(job.result_path):
+            os.remove(job.result_path)
+
+    def prune(self, now=None):
+        """Forget finished jobs older than JOB_TTL. Returns how many were removed."""
+        now = now or time.time()
+        expired = [job for job in self.jobs() if job.finished and now - job.finished > JOB_TTL]
+        for job in expired:
+            self._forget(job)
+        return len(expired)
+
+    def queued(self):
+        return self._queue.qsize()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                with job._lock:
+                    if job.status == "cancelled":
+                        continue
+                    job.status, job.started = "running", time.time()
+                self._run(job)
+            finally:
+                self._queue.task_done()
+                self.prune()
+
+    def _run(self, job):
+        import engine  # Imported here so --help works without pyodbc
+        from precompute import open_default as open_precomputed
+
+        params = job.params
+        archive = ReportArchive(self.directory, params["archive_format"], params["compress_level"])
+        self.log(f"Job {job.id}: started.")
+        try:
+            successful_reports, _ = engine.run_batch(
+                job.site_ids, params["from_date"], params["to_date"], params["username"], job.password,
+                params["database"], params["ip_series_choice"], params["custom_ip"], log=job.log, archive=archive,
+                checkpoint=job, precomputed=open_precomputed(), daily=params["daily"],
+                sections=PROFILES[params["profile"]])  # Shared pool and result cache across jobs
+            if successful_reports:
+                job.result_path = archive.move_to(os.path.join(self.directory, job.id + archive.extension))
+            else:
+                archive.discard()
+            status = "done"
+        except Exception as e:
+            archive.discard()
+            job.log(f"Error: {e}")
+            job.error, status = str(e), "failed"
+        with job._lock:
+            job.status, job.finished = status, time.time()
+            job.password = None  # Not needed any more
+        self.log(f"Job {job.id}: {status}, {job.succeeded} succeeded, {len(job.failures)} failed.")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Routes the JSON API onto ReportService. service and token are set on the server."""
+
+    server_version = "SalesReportService/1"
+
+    def log_message(self, format, *args):
+        self.server.log(f"{self.address_string()} {format % args}")  # Into the service log, not stderr
+
+    def _send_json(self, code, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, code, message):
+        self._send_json(code, {"error": message})
+
+    def _route(self):
+        """Return (job or None, action, query) for the path, or None after sending an error."""
+        if self.server.token and self.headers.get("Authorization") != f"Bearer {self.server.token}":
+            self._error(401, "Missing or wrong bearer token.")
+            return None
+        url = urllib.parse.urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        query = urllib.parse.parse_qs(url.query)
+        if parts[:1] != ["jobs"] or len(parts) > 3:
+            return parts, None, query
+        job = None
+        if len(parts) >= 2:
+            job = self.server.service.get(parts[1])
+            if job is None:
+                self._error(404, f"No job '{parts[1]}'.")
+                return None
+        return parts, job, query
+
+    def do_GET(self):
+        route = self._route()
+        if route is None:
+            return
+        parts, job, query = route
+        service = self.server.service
+        if not parts:
+            self._error(404, "Not found.")
+        elif parts == ["health"]:
+            from pool import POOL
+            from resultcache import RESULT_CACHE
+            self._send_json(200, {"status": "ok", "queued": service.queued(),
+                                  "running": sum(1 for j in service.jobs() if j.status == "running"),
+                                  "pool": POOL.stats(), "result_cache": RESULT_CACHE.stats()})
+        elif parts == ["jobs"]:
+            self._send_json(200, {"jobs": [j.to_dict() for j in service.jobs()]})
+        elif parts[0] == "jobs" and len(parts) == 2:
+            try:
+                since = int(query.get("since", ["0"])[0])
+            except ValueError:
+                self._error(400, "'since' must be an integer.")
+                return
+            self._send_json(200, job.to_dict(since=since))
+        elif parts[0] == "jobs" and len(parts) == 3 and parts[2] == "result":
+            if job.result_path is None:
+                self._error(409, f"Job is {job.status}; no result to download.")
+                return
+            extension = next(ext for ext in _CONTENT_TYPES if job.result_path.endswith(ext))
+            self.send_response(200)
+            self.send_header("Content-Type", _CONTENT_TYPES[extension])
+            self.send_header("Content-Length", str(os.path.getsize(job.result_path)))
+            self.send_header("Content-Disposition", f'attachment; filename="SiteReports-{job.id}{extension}"')
+            self.end_headers()
+            with open(job.result_path, "rb") as f:
+                shutil.copyfileobj(f, self.wfile)  # Stream it; archives can be large
+        else:
+            self._error(404, "Not found.")
+
+    def do_POST(self):
+        route = self._route()
+        if route is None:
+            return
+        parts, _, _ = route
+        if parts != ["jobs"]:
+            self._error(404, "Not found.")
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_REQUEST_BYTES:
+            self._error(413, "Request too large.")
+            return
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("Expected a JSON object.")
+            job = self.server.service.submit(request)
+        except ValueError as e:
+            self._error(400, str(e))
+            return
+        self._send_json(202, job.to_dict())
+
+    def do_DELETE(self):
+        route = self._route()
+        if route is None:
+            return
+        parts, job, _ = route
+        if len(parts) != 2 or job is None:
+            self._error(404, "Not found.")
+        elif not self.server.service.cancel(job.id):
+            self._error(409, "Job is running and cannot be cancelled.")
+        else:
+            self._send_json(200, {"id": job.id, "status": job.status})
+
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, token=None, log=_no_log):
+    """Return a ThreadingHTTPServer serving service's API (call serve_forever())."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True  # Open downloads do not block shutdown
+    server.service, server.token, server.log = service, token, log
+    return server
+
+
+# -----------------------------------------------------------------------------
+# Client helpers (used by the desktop app)
+# -----------------------------------------------------------------------------
+
+def _call(url, method="GET", data=None, token=None, timeout=30):
+    request = urllib.request.Request(url, method=method,
+                                     data=None if data is None else json.dumps(data).encode("utf-8"))
+    request.add_header("Content-Type", "application/json")
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    try:
+        return urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.load(e).get("error") or e.reason
+        except ValueError:
+            message = e.reason
+        raise RuntimeError(f"Report service: {message}") from None
+
+
+def submit_job(base_url, payload, token=None):
+    """POST a job and return its status dict (with "id")."""
+    with _call(f"{base_url.rstrip('/')}/jobs", "POST", payload, token) as response:
+        return json.load(response)
+
+
+def wait_for_job(base_url, job_id, token=None, log=_no_log, interval=1.0):
+    """Poll a job until it finishes, passing its new log lines to log. Returns the final status dict."""
+    since = 0
+    while True:
+        with _call(f"{base_url.rstrip('/')}/jobs/{job_id}?since={since}", token=token) as response:
+            status = json.load(response)
+        for line in status.pop("log", []):
+            log(line)
+        since = status.pop("next", since)
+        if status["status"] not in ("queued", "running"):
+            return status
+        time.sleep(interval)
+
+
+def download_result(base_url, job_id, path, token=None):
+    """Save a finished job's archive to path."""
+    with _call(f"{base_url.rstrip('/')}/jobs/{job_id}/result", token=token, timeout=300) as response:
+        with open(path, "wb") as f:
+            shutil.copyfileobj(response, f)
+    return path
+
+
+def main(argv=None):
+    import logpipe  # Imported here so the client helpers stay light
+
+    parser = argparse.ArgumentParser(description="Serve report generation over a local HTTP API.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on (default: %(default)s)")
+    parser.add_argument("--username", help="Default database username for jobs that do not send one")
+    parser.add_argument("--password", default=os.environ.get("SALES_REPORT_PASSWORD"),
+                        help="Default database password (defaults to $SALES_REPORT_PASSWORD)")
+    parser.add_argument("--database", help="Default database name for jobs that do not send one")
+    parser.add_argument("--job-workers", type=int, default=JOB_WORKERS,
+                        help="Jobs run at the same time (default: %(default)s)")
+    parser.add_argument("--dir", default=DEFAULT_DIR, help="Folder for finished archives (default: %(default)s)")
+    parser.add_argument("--token", default=os.environ.get(TOKEN_ENV),
+                        help="Require this bearer token on every request (defaults to $%s)" % TOKEN_ENV)
+    parser.add_argument("--log-file", nargs="?", const=logpipe.DEFAULT_LOG_FILE, metavar="PATH",
+                        help="Also write the log to a rotating file (default path: %s)" % logpipe.DEFAULT_LOG_FILE)
+    args = parser.parse_args(argv)
+    if args.host not in ("127.0.0.1", "localhost", "::1") and not args.token:
+        print("Error: set --token (or $%s) when listening beyond this machine." % TOKEN_ENV, file=sys.stderr)
+        return 2
+
+    log_listener = logpipe.setup_file_logging(args.log_file) if args.log_file else None
+
+    def log(message):
+        if log_listener is not None:
+            logpipe.LOGGER.info(message)
+        print(f"{datetime.now().strftime('%H:%M:%S')} - {message}", flush=True)
+
+    service = ReportService(args.dir, args.job_workers, args.username, args.password, args.database, log=log)
+    service.start()
+    server = make_server(service, args.host, args.port, args.token, log=log)
+    log(f"Report service listening on http://{args.host}:{server.server_address[1]}/ "
+        f"with {args.job_workers} job workers.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if log_listener is not None:
+            log_listener.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,450 @@
+"""
+Sharded execution of large site batches over several processes or machines.
+
+A coordinator splits the site list into shards and hands them out through
+a multiprocessing manager (TCP, authenticated with a shared key). Each
+worker leases a shard, runs it with engine.run_batch (the same fetch and
+render path as the CLI), compresses the reports with the coordinator's
+archive packer (see archive.EntryPacker) and sends back the packed entries
+and failures. The coordinator only appends the entries to one archive and
+collects one failure list, so compression is spread over every worker.
+
+Workers send a heartbeat while they work. If a worker stops (killed,
+crashed, unplugged), its lease expires after LEASE_TIMEOUT and the shard is
+given to another worker; a shard that loses MAX_ATTEMPTS workers is
+reported as failed instead of being retried forever. Local worker processes
+that exit early are noticed right away and replaced.
+
+Everything on one machine, with 4 local worker processes:
+
+    python shard.py --workers 4 --username sa --database AXDB --site-file sites.csv \\
+        --from-date 2024-05-01 --to-date 2024-05-31 --output SiteReports.zip
+
+Across the LAN, start the coordinator with --listen (and usually --workers 0)
+and one worker per machine with --connect. Both sides read the shared key
+from $SALES_REPORT_SHARD_KEY; workers use their own $SALES_REPORT_PASSWORD,
+so the password never crosses the network:
+
+    python shard.py --listen 0.0.0.0:50555 --workers 0 --username sa ... --output SiteReports.zip
+    python shard.py --connect coordinator-host:50555
+"""
+import argparse  # Import argparse for command-line parsing
+import multiprocessing  # Import multiprocessing for local worker processes
+import os  # Import os for environment variables and paths
+import secrets  # Import secrets for the local-only shared key
+import socket  # Import socket for the worker name
+import sys  # Import sys for exit codes and stderr
+import threading  # Import threading for the board lock, heartbeats and the manager server
+import time  # Import time for leases and polling
+from datetime import datetime  # Import datetime for log timestamps
+from multiprocessing.managers import BaseManager  # Import BaseManager to serve the shard board
+
+from queries import DEFAULT_PROFILE, PROFILES  # Import the report profiles
+
+SHARD_SIZE = 50  # Sites per shard
+LEASE_TIMEOUT = 60.0  # Seconds without a heartbeat before a shard is given to another worker
+HEARTBEAT_INTERVAL = 10.0  # Seconds between worker heartbeats
+MAX_ATTEMPTS = 3  # Workers a shard may lose before its sites are reported as failed
+MAX_RESTARTS = 4  # Replacement local workers started per run
+SHUTDOWN_GRACE = 5.0  # Seconds the coordinator keeps answering lease() after the last shard, so waiting workers exit cleanly
+WORKER_THREADS = 10  # Sites in flight per worker (engine.run_batch max_workers)
+KEY_ENV = "SALES_REPORT_SHARD_KEY"  # Environment variable holding the shared key
+
+
+def _no_log(message):
+    pass
+
+
+class ShardBoard:
+    """
+    Thread-safe table of shards and their leases, kept by the coordinator.
+    Workers call lease(), heartbeat() and complete() through the manager.
+    """
+
+    def __init__(self, site_ids, job, shard_size=SHARD_SIZE, lease_timeout=LEASE_TIMEOUT,
+                 max_attempts=MAX_ATTEMPTS, on_complete=None, log=_no_log, packer=None):
+        self.job = job  # run_batch keyword arguments shared by every shard (no password)
+        self.packer = packer  # Compresses the reports on the workers, if set
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.on_complete = on_complete  # Called as on_complete(reports, failures) per finished shard (twice for a late abandoned one)
+        self.log = log
+        self._lock = threading.Lock()
+        self._shards = [list(site_ids[i:i + shard_size]) for i in range(0, len(site_ids), shard_size)]
+        self._pending = list(range(len(self._shards)))  # Shard indexes waiting for a worker
+        self._leases = {}  # shard -> (worker_id, expires_at)
+        self._attempts = [0] * len(self._shards)  # Leases handed out per shard
+        self._done = set()  # Finished shards (completed or abandoned)
+        self._abandoned = set()  # Shards given up on; a late real result still replaces the failures
+        self._workers = set()  # Workers that ever leased
+        self._dismissed = set()  # Workers told that the run is over
+
+    @property
+    def total(self):
+        return len(self._shards)
+
+    def lease(self, worker_id):
+        """
+        Give worker_id the next shard as {"shard", "sites", "job", "packer"}; {"wait": s}
+        when every open shard is leased (one may still be reassigned); None when
+        the run is over and the worker can exit.
+        """
+        with self._lock:
+            self._expire_locked()
+            self._workers.add(worker_id)
+            if len(self._done) == len(self._shards):
+                self._dismissed.add(worker_id)
+                return None
+            if not self._pending:
+                return {"wait": 1.0}
+            shard = self._pending.pop(0)
+            self._attempts[shard] += 1
+            self._leases[shard] = (worker_id, time.monotonic() + self.lease_timeout)
+            return {"shard": shard, "sites": self._shards[shard], "job": self.job, "packer": self.packer}
+
+    def heartbeat(self, worker_id, shard):
+        """Extend worker_id's lease on shard. False if the lease was lost to another worker."""
+        with self._lock:
+            holder = self._leases.get(shard)
+            if holder is None or holder[0] != worker_id:
+                return False
+            self._leases[shard] = (worker_id, time.monotonic() + self.lease_timeout)
+            return True
+
+    def complete(self, worker_id, shard, reports, failures):
+        """
+        Accept a finished shard. The first result for a shard wins, even from a
+        worker whose lease had expired or a shard that was already abandoned
+        (its sites then lose their "abandoned" failure); later duplicates are
+        dropped.
+        """
+        with self._lock:
+            if shard in self._done and shard not in self._abandoned:
+                return False
+            self._abandoned.discard(shard)
+            self._done.add(shard)
+            self._leases.pop(shard, None)
+            if shard in self._pending:
+                self._pending.remove(shard)  # Expired and requeued, but finished after all
+        self.log(f"Shard {shard + 1}/{self.total} done by {worker_id}: {len(reports)} succeeded, {len(failures)} failed.")
+        if self.on_complete is not None:
+            self.on_complete(reports, failures)
+        return True
+
+    def release_worker(self, worker_id):
+        """Requeue every shard leased by worker_id (its process is known to be dead)."""
+        with self._lock:
+            self._workers.discard(worker_id)  # Nobody left to dismiss
+            for shard, (holder, _) in list(self._leases.items()):
+                if holder == worker_id:
+                    self._requeue_locked(shard, f"worker {worker_id} exited")
+
+    def expire(self):
+        """Requeue shards whose worker stopped sending heartbeats."""
+        with self._lock:
+            self._expire_locked()
+
+    def _expire_locked(self):
+        now = time.monotonic()
+        for shard, (holder, expires_at) in list(self._leases.items()):
+            if expires_at < now:
+                self._requeue_locked(shard, f"no heartbeat from {holder} for {self.lease_timeout:.0f}s")
+
+    def _requeue_locked(self, shard, reason):
+        del self._leases[shard]
+        if self._attempts[shard] >= self.max_attempts:
+            self._done.add(shard)
+            self._abandoned.add(shard)
+            error = f"Shard abandoned after {self._attempts[shard]} attempts ({reason})."
+            self.log(f"Shard {shard + 1}/{self.total}: {error}")
+            if self.on_complete is not None:
+                self.on_complete({}, {sid: error for sid in self._shards[shard]})
+        else:
+            self._pending.insert(0, shard)  # Retry it before untouched shards
+            self.log(f"Shard {shard + 1}/{self.total} reassigned: {reason}.")
+
+    def done(self):
+        with self._lock:
+            return len(self._done) == len(self._shards)
+
+    def all_dismissed(self):
+        """True once every worker that ever leased has been told the run is over."""
+        with self._lock:
+            return self._workers <= self._dismissed
+
+
+def _manager_class(board=None):
+    """BaseManager subclass exposing board (coordinator side) or just its name (worker side)."""
+    class ShardManager(BaseManager):
+        pass
+    ShardManager.register("board", callable=(lambda: board) if board is not None else None)
+    return ShardManager
+
+
+def parse_address(value):
+    """'host:port' -> (host, port)."""
+    host, _, port = value.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def run_worker(address, authkey, password, worker_id, threads=WORKER_THREADS, log=_no_log, site_log=_no_log):
+    """
+    Lease shards from the coordinator at address until it has none left.
+    Each shard is run with engine.run_batch; its reports (packed with the
+    board's packer, if any) and failures are sent back in one call. Returns
+    the number of shards completed.
+    """
+    import engine  # Imported here so the coordinator does not need pyodbc
+
+    manager = _manager_class()(address=address, authkey=authkey)
+    manager.connect()
+    board = manager.board()
+    current = {}  # {"shard": n} while a shard is being worked on
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            shard = current.get("shard")
+            if shard is not None:
+                board.heartbeat(worker_id, shard)  # Proxies open one connection per thread
+
+    threading.Thread(target=beat, name=f"heartbeat-{worker_id}", daemon=True).start()
+    completed = 0
+    waited = False  # Last answer was "wait": a closed coordinator then means the run ended
+    try:
+        while True:
+            try:
+                task = board.lease(worker_id)
+            except (EOFError, ConnectionError):
+                if waited:
+                    return completed  # The coordinator finished while we were waiting
+                raise
+            if task is None:
+                return completed  # Every shard is done
+            waited = "wait" in task
+            if waited:
+                time.sleep(task["wait"])  # Shards are leased to others; one may come back
+                continue
+            shard, sites = task["shard"], task["sites"]
+            log(f"{worker_id}: shard {shard + 1} ({len(sites)} sites)")
+            current["shard"] = shard
+            try:
+                reports, failures = engine.run_batch(sites, password=password, log=site_log, max_workers=threads,
+                                                     **task["job"])
+            except Exception as e:
+                reports, failures = {}, {sid: str(e) for sid in sites}  # e.g. the test connection failed
+            packer = task.get("packer")
+            if packer is not None:
+                reports = {sid: [packer.pack(name, text) for name, text in _entries(sid, report).items()]
+                           for sid, report in reports.items()}  # Compress here instead of on the coordinator
+            current.pop("shard", None)
+            board.complete(worker_id, shard, reports, failures)
+            completed += 1
+    finally:
+        stop.set()
+
+
+def _entries(sid, report):
+    """{entry_name: text} for one site's report (daily mode already has several)."""
+    return report if isinstance(report, dict) else {f"{sid}.txt": report}
+
+
+def _local_worker(address, authkey, password, worker_id, threads):
+    """Entry point of a local worker process."""
+    try:
+        run_worker(address, authkey, password, worker_id, threads)
+    except (EOFError, ConnectionError):
+        pass  # The coordinator finished or went away
+
+
+def run_sharded(site_ids, job, archive, password=None, workers=0, threads=WORKER_THREADS, shard_size=SHARD_SIZE,
+                listen=("127.0.0.1", 0), authkey=None, lease_timeout=LEASE_TIMEOUT, log=_no_log, poll=0.5):
+    """
+    Coordinate a sharded run of site_ids. job holds the run_batch keyword
+    arguments (from_date, to_date, username, database, ip_series_choice,
+    custom_ip, daily, sections). Starts `workers` local worker processes
+    (which need password) and also accepts remote workers on listen. Workers
+    compress the reports with archive.packer and the entries are appended to
+    archive as shards complete. Returns (succeeded, failed):
+    the set of site IDs with a report and {site_id: error}.
+    """
+    if not site_ids:
+        raise ValueError("No Site IDs to process.")
+    if workers <= 0 and listen[0] in ("127.0.0.1", "localhost"):
+        raise ValueError("No workers: start local workers or listen on an address remote workers can reach.")
+    authkey = authkey or secrets.token_bytes(16)  # Only local workers need to know a generated key
+    succeeded, failed = set(), {}
+    results_lock = threading.Lock()
+
+    def on_complete(reports, failures):
+        with results_lock:
+            for sid, packed in reports.items():
+                for entry in packed:
+                    archive.add_packed(entry)  # Stream into the archive as shards come back
+                succeeded.add(sid)
+                failed.pop(sid, None)
+            for sid, error in failures.items():
+                if sid not in succeeded:
+                    failed[sid] = error
+
+    board = ShardBoard(site_ids, job, shard_size, lease_timeout, on_complete=on_complete, log=log,
+                       packer=archive.packer)
+    server = _manager_class(board)(address=listen, authkey=authkey).get_server()  # Serve from this process
+    threading.Thread(target=server.serve_forever, name="shard-server", daemon=True).start()
+    log(f"{len(site_ids)} sites in {board.total} shards; coordinator listening on {server.address[0]}:{server.address[1]}.")
+
+    context = multiprocessing.get_context("spawn")  # Fresh interpreters: no inherited threads or connections
+    processes = {}
+
+    def start(worker_id):
+        process = context.Process(target=_local_worker, name=worker_id, daemon=True,
+                                  args=(server.address, authkey, password, worker_id, threads))
+        process.start()
+        processes[worker_id] = process
+
+    for i in range(workers):
+        start(f"local-{i + 1}")
+    restarts = 0
+    try:
+        while not board.done():
+            time.sleep(poll)
+            board.expire()
+            for worker_id, process in list(processes.items()):
+                if process.exitcode is None or board.done():
+                    continue
+                del processes[worker_id]
+                board.release_worker(worker_id)  # Do not wait for its lease to run out
+                if restarts < MAX_RESTARTS:
+                    restarts += 1
+                    log(f"Worker {worker_id} exited with code {process.exitcode}; starting a replacement.")
+                    start(f"{worker_id}r{restarts}")
+                else:
+                    log(f"Worker {worker_id} exited with code {process.exitcode}; no restarts left.")
+            if workers and not processes and listen[0] in ("127.0.0.1", "localhost"):
+                raise RuntimeError("Every local worker exited and no remote workers can connect.")
+        deadline = time.monotonic() + SHUTDOWN_GRACE
+        while not board.all_dismissed() and time.monotonic() < deadline:
+            time.sleep(min(poll, 0.2))  # Let waiting workers hear lease() -> None instead of a closed socket
+    finally:
+        for process in processes.values():
+            process.join(timeout=5)  # Workers exit once lease() returns None
+            if process.is_alive():
+                process.terminate()
+        server.stop_event.set()
+        server.listener.close()
+    return succeeded, failed
+
+
+def main(argv=None):
+    import logpipe  # Imported here so workers do not set up the coordinator's log
+    from archive import ARCHIVE_FORMATS, DEFAULT_FORMAT, ReportArchive
+    from sitelist import parse_site_ids, read_site_list
+
+    parser = argparse.ArgumentParser(description="Run a large site batch over several worker processes or machines.")
+    parser.add_argument("--connect", metavar="HOST:PORT", help="Run as a worker for the coordinator at HOST:PORT")
+    parser.add_argument("--username", help="Database username (coordinator)")
+    parser.add_argument("--password", default=os.environ.get("SALES_REPORT_PASSWORD"),
+                        help="Database password for local workers and --connect (defaults to $SALES_REPORT_PASSWORD)")
+    parser.add_argument("--database", help="Database name (coordinator)")
+    sites = parser.add_mutually_exclusive_group()
+    sites.add_argument("--sites", help="Comma-separated list of site IDs")
+    sites.add_argument("--site-file", help="File with site IDs (.xlsx with a 'siteid' column, .csv or .txt)")
+    parser.add_argument("--ip-series", choices=["16", "28", "auto"], default="16", help="Server IP series (default: 16)")
+    parser.add_argument("--custom-ip", help="Connect to this host instead of deriving it from the site ID")
+    parser.add_argument("--from-date", help="From date (YYYY-MM-DD)")
+    parser.add_argument("--to-date", help="To date (YYYY-MM-DD)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="Report sections to query (default: %(default)s)")
+    parser.add_argument("--daily", action="store_true", help="Also write one report per day ({site}_{date}.txt)")
+    parser.add_argument("--output", help="Path of the archive to write (default: SiteReports plus the format's extension)")
+    parser.add_argument("--archive-format", choices=list(ARCHIVE_FORMATS), default=DEFAULT_FORMAT,
+                        help="zip, tar.gz, tar.xz or tar.zst (default: %(default)s)")
+    parser.add_argument("--compress-level", type=int, metavar="N",
+                        help="Compression level (default: $SALES_REPORT_COMPRESS_LEVEL or the format's default)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                        help="Local worker processes (default: one per CPU, %(default)s)")
+    parser.add_argument("--threads", type=int, default=WORKER_THREADS,
+                        help="Sites in flight per worker (default: %(default)s)")
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="Sites per shard (default: %(default)s)")
+    parser.add_argument("--lease-timeout", type=float, default=LEASE_TIMEOUT,
+                        help="Seconds without a heartbeat before a shard is reassigned (default: %(default)s)")
+    parser.add_argument("--listen", metavar="HOST:PORT", default="127.0.0.1:0",
+                        help="Address remote workers connect to (default: local only)")
+    parser.add_argument("--log-file", nargs="?", const=logpipe.DEFAULT_LOG_FILE, metavar="PATH",
+                        help="Also write the log to a rotating file (default path: %s)" % logpipe.DEFAULT_LOG_FILE)
+    parser.add_argument("--quiet", action="store_true", help="Only print errors and the final summary")
+    args = parser.parse_args(argv)
+
+    log_listener = logpipe.setup_file_logging(args.log_file) if args.log_file else None
+
+    def log(message):
+        if log_listener is not None:
+            logpipe.LOGGER.info(message)
+        if not args.quiet:
+            print(f"{datetime.now().strftime('%H:%M:%S')} - {message}", flush=True)
+
+    key = os.environ.get(KEY_ENV)
+    if args.connect:
+        if not key or args.password is None:
+            print(f"Error: a worker needs ${KEY_ENV} and --password or $SALES_REPORT_PASSWORD.", file=sys.stderr)
+            return 2
+        worker_id = f"{socket.gethostname()}-{os.getpid()}"  # Shown in the coordinator's log
+        try:
+            shards = run_worker(parse_address(args.connect), key.encode(), args.password, worker_id, args.threads,
+                                log=log, site_log=log)
+        except (EOFError, ConnectionError) as e:
+            print(f"Error: lost the coordinator: {e}", file=sys.stderr)
+            return 1
+        log(f"Coordinator has no shards left; {shards} shards completed here.")
+        return 0
+
+    missing = [flag for flag, value in (("--username", args.username), ("--database", args.database),
+                                        ("--from-date", args.from_date), ("--to-date", args.to_date),
+                                        ("--sites/--site-file", args.sites or args.site_file)) if not value]
+    if missing:
+        parser.error("the following arguments are required: " + ", ".join(missing))
+    listen = parse_address(args.listen)
+    if listen[0] not in ("127.0.0.1", "localhost") and not key:
+        print(f"Error: set ${KEY_ENV} to the key the remote workers use.", file=sys.stderr)
+        return 2
+    if args.workers and args.password is None:
+        print("Error: --password or $SALES_REPORT_PASSWORD is required for local workers.", file=sys.stderr)
+        return 2
+
+    site_list = (read_site_list(args.site_file, check_host=not args.custom_ip) if args.site_file
+                 else parse_site_ids(args.sites, check_host=not args.custom_ip))
+    if not site_list.site_ids:
+        print("Error: no valid site IDs to process.", file=sys.stderr)
+        return 1
+    log(f"Site list: {site_list.summary()}.")
+    job = dict(from_date=args.from_date, to_date=args.to_date, username=args.username, database=args.database,
+               ip_series_choice=args.ip_series, custom_ip=args.custom_ip, daily=args.daily,
+               sections=PROFILES[args.profile])  # Everything a worker needs except the password
+    output = args.output or "SiteReports" + ARCHIVE_FORMATS[args.archive_format]
+    try:
+        archive = ReportArchive(os.path.dirname(os.path.abspath(output)), args.archive_format, args.compress_level)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    try:
+        succeeded, failed = run_sharded(site_list.site_ids, job, archive, args.password, args.workers, args.threads,
+                                        args.shard_size, listen, key.encode() if key else None,
+                                        args.lease_timeout, log=log)
+    except Exception as e:
+        archive.discard()
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if succeeded:
+        archive.move_to(output)
+    else:
+        archive.discard()
+    for sid, error in failed.items():
+        print(f"FAILED {sid}: {error}", file=sys.stderr)
+    print(f"{len(succeeded)} succeeded, {len(failed)} failed" + (f"; archive written to {output}" if succeeded else ""))
+    if not succeeded:
+        return 1
+    return 3 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+Streaming site-list reader for .xlsx, .csv and .txt files.
+
+.xlsx files are read straight from the workbook ZIP with iterparse (no
+pandas or openpyxl), one row at a time. The site ID column is found by a
+case-insensitive match on "siteid", so "SiteID" or " SITEID " headers work.
+CSV files with such a header use that column; header-less CSV and text
+files are read as comma- or newline-separated IDs, like before.
+
+IDs are trimmed, de-duplicated (first occurrence wins) and validated
+before anything connects, so malformed IDs are reported up front with
+their row number instead of failing late inside connect_to_database.
+"""
+import csv  # Import csv for CSV files
+import io  # Import io to read CSV text from the raw file
+import os  # Import os for the file extension
+import posixpath  # Import posixpath to resolve paths inside the workbook ZIP
+import re  # Import re for cell references
+import zipfile  # Import zipfile to open .xlsx workbooks
+from xml.etree.ElementTree import iterparse  # Import iterparse for streaming XML
+
+SITE_COLUMN = "siteid"  # Header of the site ID column (matched case-insensitively)
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_CELL_REF = re.compile(r"([A-Z]+)")
+
+
+class SiteList:
+    """Result of reading a site list: valid IDs in order plus what was dropped."""
+
+    def __init__(self):
+        self.site_ids = []  # Valid, unique IDs in file order
+        self.duplicates = []  # (row, site_id) repeated after their first occurrence
+        self.invalid = []  # (row, value, reason)
+        self._seen = set()
+
+    def add(self, row, value, check_host=True):
+        """Validate and add one raw value found on row (1-based)."""
+        site_id = normalize(value)
+        if not site_id:
+            return  # Blank cells are not worth reporting
+        reason = invalid_reason(site_id, check_host)
+        if reason:
+            self.invalid.append((row, str(value).strip(), reason))
+        elif site_id in self._seen:
+            self.duplicates.append((row, site_id))
+        else:
+            self._seen.add(site_id)
+            self.site_ids.append(site_id)
+
+    def summary(self):
+        """One-line description of what was read, for the log."""
+        text = f"{len(self.site_ids)} site IDs"
+        if self.duplicates:
+            text += f", {len(self.duplicates)} duplicates skipped"
+        if self.invalid:
+            text += f", {len(self.invalid)} invalid"
+        return text
+
+
+def normalize(value):
+    """Trim a raw cell value; numeric cells like 13100.0 become '13100'."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip()
+    if text.endswith(".0") and text[:-2].isdigit():
+        text = text[:-2]  # Numbers stored as text by Excel exports
+    return text
+
+
+def invalid_reason(site_id, check_host=True):
+    """
+    Return why site_id is unusable, or None. With check_host the ID must map
+    to a store host (see engine.format_site_id): digits only, the first three
+    and the rest each a valid IP octet.
+    """
+    if not site_id.isdigit():
+        return "not a number"
+    if check_host:
+        if len(site_id) < 4:
+            return "too short"
+        if int(site_id[:3]) > 255 or int(site_id[3:]) > 255:
+            return "does not map to a store IP address"
+    return None
+
+
+def parse_site_ids(text, check_host=True):
+    """Read comma- or newline-separated IDs from text (also used for --sites)."""
+    sites = SiteList()
+    parts = text.split(",") if "," in text else text.splitlines()
+    for number, value in enumerate(parts, start=1):
+        sites.add(number, value, check_host)
+    return sites
+
+
+def read_site_list(path, check_host=True):
+    """Read a .xlsx, .csv or .txt site list and return a SiteList."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".xlsx":
+        return _read_xlsx(path, check_host)
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        text = f.read()
+    if ext == ".csv":
+        first = next(csv.reader(io.StringIO(text)), [])
+        if any(cell.strip().lower() == SITE_COLUMN for cell in first):
+            return _read_csv_column(text, check_host)
+    return parse_site_ids(text, check_host)
+
+
+def _read_csv_column(text, check_host):
+    sites = SiteList()
+    reader = csv.reader(io.StringIO(text))
+    header = [cell.strip().lower() for cell in next(reader)]
+    column = header.index(SITE_COLUMN)
+    for number, row in enumerate(reader, start=2):
+        if column < len(row):
+            sites.add(number, row[column], check_host)
+    return sites
+
+
+def _column_index(ref):
+    """'C12' -> 2 (zero-based column)."""
+    letters = _CELL_REF.match(ref).group(1)
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+
+def _first_sheet_path(workbook):
+    """Path of the first worksheet inside the ZIP, following workbook.xml and its rels."""
+    with workbook.open("xl/workbook.xml") as f:
+        for _, elem in iterparse(f):
+            if elem.tag == _NS_MAIN + "sheet":
+                rel_id = elem.get(_NS_REL + "id")
+                break
+        else:
+            raise ValueError("Workbook has no sheets.")
+    with workbook.open("xl/_rels/workbook.xml.rels") as f:
+        for _, elem in iterparse(f):
+            if elem.tag == _NS_PKG_REL + "Relationship" and elem.get("Id") == rel_id:
+                target = elem.get("Target")
+                return target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+    raise ValueError("Workbook relationships do not list the first sheet.")
+
+
+def _shared_strings(workbook):
+    """List of the workbook's shared strings (empty if it has none)."""
+    try:
+        f = workbook.open("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    strings = []
+    with f:
+        for _, elem in iterparse(f):
+            if elem.tag == _NS_MAIN + "si":
+                strings.append("".join(t.text or "" for t in elem.iter(_NS_MAIN + "t")))  # Rich text has several runs
+                elem.clear()
+    return strings
+
+
+def _iter_rows(workbook, sheet_path, strings):
+    """Yield (row_number, {column_index: value}) for each row of the sheet."""
+    with workbook.open(sheet_path) as f:
+        for _, elem in iterparse(f):
+            if elem.tag != _NS_MAIN + "row":
+                continue
+            cells = {}
+            for position, cell in enumerate(elem.iter(_NS_MAIN + "c")):
+                ref = cell.get("r")
+                column = _column_index(ref) if ref else position
+                kind = cell.get("t")
+                if kind == "inlineStr":
+                    value = "".join(t.text or "" for t in cell.iter(_NS_MAIN + "t"))
+                else:
+                    v = cell.find(_NS_MAIN + "v")
+                    value = v.text if v is not None else None
+                    if kind == "s" and value is not None:
+                        value = strings[int(value)]
+                cells[column] = value
+            yield int(elem.get("r") or 0), cells
+            elem.clear()  # Keep memory flat for large sheets
+
+
+def _read_xlsx(path, check_host):
+    sites = SiteList()
+    with zipfile.ZipFile(path) as workbook:
+        strings = _shared_strings(workbook)
+        column = None
+        for number, cells in _iter_rows(workbook, _first_sheet_path(workbook), strings):
+            if column is None:
+                column = next((index for index, value in cells.items()
+                               if value is not None and str(value).strip().lower() == SITE_COLUMN), None)
+                if column is None:
+                    raise ValueError("Excel file must contain a column named 'siteid'.")
+                continue  # Header row
+            sites.add(number, cells.get(column), check_host)
+    if column is None:
+        raise ValueError("Excel file must contain a column named 'siteid'.")
+    return sites
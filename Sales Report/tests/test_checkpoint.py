@@ -0,0 +1,77 @@
+import os
+import time
+
+import pytest
+
+from checkpoint import RunCheckpoint, prune_runs
+
+
+class FakeArchive:
+    def __init__(self):
+        self.entries = {}
+
+    def add(self, name, text):
+        self.entries[name] = text
+
+
+@pytest.fixture
+def run(tmp_path):
+    return RunCheckpoint.create(["1", "2", "3", "4"], str(tmp_path), from_date="2024-05-01", to_date="2024-05-31",
+                                username="sa", database="AXDB", ip_series_choice="16", daily=False)
+
+
+def test_pending_and_failed_after_a_partial_run(run, tmp_path):
+    run.record_success("1", "report 1")
+    run.record_failure("2", "timeout")
+    reopened = RunCheckpoint.open(run.run_id, str(tmp_path))
+    assert reopened.pending() == ["2", "3", "4"]
+    assert reopened.failed() == {"2": "timeout"}
+    assert reopened.parameters()["database"] == "AXDB"
+
+
+def test_last_outcome_wins(run):
+    run.record_failure("2", "timeout")
+    run.record_success("2", "report 2")
+    run.record_failure("3", "first")
+    run.record_failure("3", "second")
+    assert run.failed() == {"3": "second"}
+    assert run.pending() == ["1", "3", "4"]
+
+
+def test_torn_state_line_is_ignored(run):
+    run.record_success("1", "report 1")
+    with open(os.path.join(run.path, "state.jsonl"), "a", encoding="utf-8") as f:
+        f.write('{"site": "2", "sta')  # Interrupted write
+    assert run.pending() == ["2", "3", "4"]
+
+
+def test_success_without_report_file_is_pending(run):
+    run.record_success("1", "report 1")
+    os.remove(os.path.join(run.path, "reports", "1.txt"))
+    assert "1" in run.pending()
+
+
+def test_copy_reports_includes_daily_entries_and_honours_skip(run):
+    run.record_success("1", {"1.txt": "range", "1_2024-05-01.txt": "day"})
+    run.record_success("2", "report 2")
+    archive = FakeArchive()
+    assert run.copy_reports_to(archive, skip={"2"}) == 1
+    assert archive.entries == {"1.txt": "range", "1_2024-05-01.txt": "day"}
+
+
+def test_latest_and_unknown_runs(run, tmp_path):
+    assert RunCheckpoint.latest(str(tmp_path)) == run.run_id
+    assert RunCheckpoint.latest(str(tmp_path / "missing")) is None
+    with pytest.raises(FileNotFoundError):
+        RunCheckpoint.open("nope", str(tmp_path))
+
+
+def test_prune_removes_only_stale_runs(run, tmp_path):
+    stale = time.time() - 30 * 86400
+    os.utime(os.path.join(run.path, "manifest.json"), (stale, stale))
+    fresh = RunCheckpoint.create(["9"], str(tmp_path / "other"))
+    assert prune_runs(str(tmp_path), keep_days=7) == [run.run_id]
+    assert not os.path.exists(run.path)
+    assert prune_runs(str(tmp_path / "other"), keep_days=7) == []
+    fresh.delete()
+    assert not os.path.exists(fresh.path)
@@ -0,0 +1,96 @@
+from datetime import date
+from decimal import Decimal as D
+
+from daycache import DayCache, merge_rows, split_daily_rows
+from queries import PROFILES
+
+FULL = PROFILES["full"]
+STANDARD = PROFILES["standard"]
+
+# REPORT_QUERY shape: (ISHEADER, ACXCORPCODE, name, NETSALEAMT, DISCAMT, NETRETAMT, RETDISC, SALECOUNT, RETCNT)
+DAY1 = [
+    (1, -1, "CASH", D("100.50"), D("2.00"), D("-10.00"), D("0.50"), 10, 1),
+    (1, -1, "CARD", D("40.00"), D("0.00"), D("0.00"), D("0.00"), 3, 0),
+    (0, "101", "PARTNER A", D("12.25"), 0, 0, 0, 2, 0),
+    (4, 0, "OMS CASH COLLECTION", D("5.00"), 0, 0, 0, 0, 0),
+]
+DAY2 = [
+    (1, -1, "CASH", D("200.00"), D("1.00"), D("0.00"), D("0.00"), 20, 0),
+    (0, "101", "PARTNER A", D("7.75"), 0, 0, 0, 1, 0),
+    (0, "102", "PARTNER B", D("3.00"), 0, 0, 0, 1, 0),
+]
+RANGE = [  # What REPORT_QUERY returns for both days together
+    (1, -1, "CASH", D("300.50"), D("3.00"), D("-10.00"), D("0.50"), 30, 1),
+    (1, -1, "CARD", D("40.00"), D("0.00"), D("0.00"), D("0.00"), 3, 0),
+    (0, "101", "PARTNER A", D("20.00"), 0, 0, 0, 3, 0),
+    (0, "102", "PARTNER B", D("3.00"), 0, 0, 0, 1, 0),
+    (4, 0, "OMS CASH COLLECTION", D("5.00"), 0, 0, 0, 0, 0),
+]
+
+
+def key(row):
+    return (row[0], str(row[1]), row[2])
+
+
+def test_merged_days_equal_the_range_rows():
+    merged = merge_rows([DAY1, DAY2], FULL)
+    assert sorted(merged, key=key) == sorted(RANGE, key=key)
+    assert merged[0][:3] == (1, -1, "CASH")  # First appearance order is kept
+
+
+def test_missing_oms_row_is_added_only_when_the_section_is_queried():
+    days = [DAY2, [row for row in DAY1 if row[0] != 4]]
+    full = merge_rows(days, FULL)
+    assert (4, 0, "OMS CASH COLLECTION", D("0"), 0, 0, 0, 0, 0) in full
+    assert not any(row[0] == 4 for row in merge_rows(days, STANDARD))
+    assert merge_rows([], FULL) == [(4, 0, "OMS CASH COLLECTION", D("0"), 0, 0, 0, 0, 0)]  # A range without sales
+
+
+def test_none_amounts_are_treated_as_missing():
+    merged = merge_rows([[(2, "1", "HEALINGCARD-CASH", None, 0, 0, 0, 0, 0)],
+                         [(2, "1", "HEALINGCARD-CASH", D("4.00"), 0, 0, 0, 0, 0)]], STANDARD)
+    assert merged == [(2, "1", "HEALINGCARD-CASH", D("4.00"), 0, 0, 0, 0, 0)]
+
+
+def daily(day, rows):
+    """DAILY_REPORT_QUERY rows: REPORT_QUERY rows with BDATE after ISHEADER."""
+    return [(row[0], day) + row[1:] for row in rows]
+
+
+def test_split_daily_rows_restores_the_report_shape():
+    by_day = split_daily_rows(daily("2024-05-01", DAY1) + daily("2024-05-02", DAY2))
+    assert by_day == {date(2024, 5, 1): DAY1, date(2024, 5, 2): DAY2}
+
+
+def test_get_report_caches_closed_days_and_refetches_the_open_day(tmp_path):
+    rows = {"2024-05-01": DAY1, "2024-05-02": DAY2, "2024-05-03": []}
+    calls = []
+
+    def fetch_days(start, end):
+        calls.append((start, end))
+        days = [d for d in sorted(rows) if start <= d <= end]
+        return [row for d in days for row in daily(d, rows[d])], "STORE 13100"
+
+    cache = DayCache(str(tmp_path / "days.sqlite3"))
+    today = date(2024, 5, 3)
+    result, name = cache.get_report("13100", "AXDB", "2024-05-01", "2024-05-03", fetch_days, today=today,
+                                    sections=FULL)
+    assert calls == [("2024-05-01", "2024-05-03")]
+    assert name == "STORE 13100"
+    assert sorted(result, key=key) == sorted(RANGE, key=key)
+
+    rows["2024-05-03"] = [(1, -1, "CASH", D("1.00"), D("0.00"), D("0.00"), D("0.00"), 1, 0)]  # Today is still selling
+    result, name = cache.get_report("13100", "AXDB", "2024-05-01", "2024-05-03", fetch_days, today=today,
+                                    sections=FULL)
+    assert calls[1:] == [("2024-05-03", "2024-05-03")]  # Only the open day is queried again
+    assert name == "STORE 13100"  # Read back from the cache
+    assert dict((key(row), row) for row in result)[(1, "-1", "CASH")][3] == D("301.50")
+
+    cache.get_report("13100", "AXDB", "2024-05-01", "2024-05-02", fetch_days, today=today, sections=FULL)
+    assert len(calls) == 2  # Closed days only: nothing to fetch
+    cache.get_report("13100", "AXDB", "2024-05-01", "2024-05-02", fetch_days, today=today, sections=STANDARD)
+    assert calls[2:] == [("2024-05-01", "2024-05-02")]  # Other sections are cached separately
+    cache.get_report("13100", "AXDB", "2024-05-01", "2024-05-02", fetch_days, refresh=True, today=today,
+                     sections=FULL)
+    assert calls[3:] == [("2024-05-01", "2024-05-02")]
+    cache.close()
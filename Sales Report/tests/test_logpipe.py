@@ -0,0 +1,21 @@
+import logging
+
+from logpipe import LogQueue
+
+
+def test_full_queue_drops_the_oldest_lines_and_says_so():
+    log_queue = LogQueue(logger=logging.getLogger("test_logpipe"), maxsize=3)
+    for i in range(5):
+        log_queue.put(f"line {i}")
+    lines = log_queue.drain()
+    assert lines[0] == "... 2 older log lines dropped; the log file has them all."
+    assert [line.split(" - ", 1)[1] for line in lines[1:]] == ["line 2", "line 3", "line 4"]
+    assert log_queue.drain() == []  # The notice is only shown once
+
+
+def test_drain_respects_the_limit():
+    log_queue = LogQueue(logger=logging.getLogger("test_logpipe"), maxsize=10)
+    for i in range(4):
+        log_queue.put(f"line {i}")
+    assert len(log_queue.drain(3)) == 3
+    assert len(log_queue.drain()) == 1
@@ -0,0 +1,18 @@
+import random
+from datetime import datetime
+
+from bench_render import synthetic_result
+from renderer import ReportRenderer
+from report import format_report
+
+
+def test_render_and_render_many_match_format_report():
+    rnd = random.Random(3)
+    now = datetime(2024, 5, 31, 9, 30)
+    batch = [(synthetic_result(rnd, rnd.randint(0, 30)), f"{13100 + i}", f"STORE {i}",
+              "2024-05-01", "2024-05-31" if i % 2 else "2024-05-15") for i in range(40)]
+    batch.append(([], "13999", "EMPTY STORE", "2024-05-01", "2024-05-31"))  # No rows at all
+    expected = [format_report(result, sid, name, f, t, now=now) for result, sid, name, f, t in batch]
+    renderer = ReportRenderer()
+    assert [renderer.render(result, sid, name, f, t, now=now) for result, sid, name, f, t in batch] == expected
+    assert renderer.render_many(batch, now=now) == expected
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import engine
+from hostmap import SiteHostMap
+from scheduler import AdaptiveScheduler
+
+
+class Transient(Exception):
+    pass
+
+
+def run_all(scheduler, items, task, **kwargs):
+    return {item: (result, error, attempts) for item, result, error, attempts in scheduler.run(items, task, **kwargs)}
+
+
+def test_transient_errors_are_retried_until_success():
+    calls = {}
+
+    def task(item):
+        calls[item] = calls.get(item, 0) + 1
+        if calls[item] < 3:
+            raise Transient(item)
+        return item.upper()
+
+    scheduler = AdaptiveScheduler(initial=2, max_retries=2, backoff_base=0.001,
+                                  is_transient=lambda e: isinstance(e, Transient))
+    retried = []
+    results = run_all(scheduler, ["a", "b"], task, on_retry=lambda item, attempt, delay, error: retried.append(item))
+    assert results == {"a": ("A", None, 3), "b": ("B", None, 3)}
+    assert scheduler.retries == 4
+    assert sorted(retried) == ["a", "a", "b", "b"]
+
+
+def test_retry_budget_is_limited():
+    def task(item):
+        raise Transient(item)
+
+    scheduler = AdaptiveScheduler(initial=1, max_retries=1, backoff_base=0.001, is_transient=lambda e: True)
+    result, error, attempts = run_all(scheduler, ["a"], task)["a"]
+    assert isinstance(error, Transient) and attempts == 2
+
+
+def test_permanent_errors_are_not_retried():
+    def task(item):
+        raise ValueError(item)
+
+    scheduler = AdaptiveScheduler(initial=1, backoff_base=0.001)
+    result, error, attempts = run_all(scheduler, ["a"], task)["a"]
+    assert isinstance(error, ValueError) and attempts == 1
+    assert scheduler.retries == 0
+
+
+def test_priority_items_start_first():
+    started = []
+    scheduler = AdaptiveScheduler(initial=1, min_concurrency=1, max_concurrency=1)
+    run_all(scheduler, ["a", "b", "c", "d"], started.append, priority=["c", "x", "b"])
+    assert started == ["c", "b", "a", "d"]
+
+
+def test_subnet_caps_hold_for_single_and_multiple_keys():
+    lock = threading.Lock()
+    current = {"a": 0, "b": 0}
+    peak = {"a": 0, "b": 0}
+    keys = {i: ("a", "b") if i % 2 else "a" for i in range(30)}  # Odd items may be on either subnet
+
+    def task(item):
+        subnets = keys[item] if isinstance(keys[item], tuple) else (keys[item],)
+        with lock:
+            for key in subnets:
+                current[key] += 1
+                peak[key] = max(peak[key], current[key])
+        time.sleep(0.005)
+        with lock:
+            for key in subnets:
+                current[key] -= 1
+
+    scheduler = AdaptiveScheduler(initial=20, max_concurrency=20, subnet_caps={"a": 4, "b": 2})
+    results = run_all(scheduler, list(keys), task, subnet_of=keys.get)
+    assert len(results) == 30 and all(error is None for _, error, _ in results.values())
+    assert peak["a"] <= 4 and peak["b"] <= 2
+
+
+def test_subnet_of_uses_known_host_only_within_the_chosen_series(tmp_path, monkeypatch):
+    host_map = SiteHostMap(str(tmp_path / "hosts.json"))
+    host_map.set("13100", "10.28.131.0")  # Learned during an auto run
+    monkeypatch.setattr(engine, "HOST_MAP", host_map)
+    assert engine.subnet_of("13100", "auto") == "10.28"
+    assert engine.subnet_of("13100", "28") == "10.28"
+    assert engine.subnet_of("13100", "16") == "10.16"  # connect_to_database ignores the 10.28 host here
+    assert engine.subnet_of("99999", "auto") == ("10.16", "10.28")
+    assert engine.subnet_of("13100", "16", custom_ip="192.168.1.5") == "custom"
+
+
+def test_concurrency_grows_when_healthy_and_shrinks_on_errors():
+    scheduler = AdaptiveScheduler(initial=10, min_concurrency=2, max_concurrency=12, window=4)
+    for _ in range(8):
+        scheduler._record(0.1, False)
+    assert scheduler.limit == 12  # Two healthy windows: +1 each, capped at max
+    for _ in range(4):
+        scheduler._record(0.1, True)
+    assert scheduler.limit == 8  # Error window: multiplicative decrease
+    for _ in range(40):
+        scheduler._record(0.1, True)
+    assert scheduler.limit == 2  # Never below min_concurrency
@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from service import ReportService, make_server
+
+REQUEST = {"sites": ["13100", "13101"], "from_date": "2024-05-01", "to_date": "2024-05-31"}
+
+
+@pytest.fixture
+def service(tmp_path):
+    return ReportService(str(tmp_path), username="svcuser", password="svcpw", database="AXDB")  # Not started: jobs stay queued
+
+
+def test_submit_uses_the_service_credentials_as_a_set(service):
+    job = service.submit(dict(REQUEST))
+    assert job.status == "queued"
+    assert job.site_ids == ["13100", "13101"]
+    assert (job.params["username"], job.password, job.params["database"]) == ("svcuser", "svcpw", "AXDB")
+    assert "password" not in job.params
+    assert service.queued() == 1
+
+
+@pytest.mark.parametrize("partial", [{"username": "otheruser"}, {"password": "x"}, {"database": "OTHER"}])
+def test_partial_credentials_are_rejected(service, partial):
+    with pytest.raises(ValueError, match="together"):
+        service.submit(dict(REQUEST, **partial))
+
+
+def test_own_credentials_keep_the_default_database(service):
+    job = service.submit(dict(REQUEST, username="u", password="p"))
+    assert (job.params["username"], job.password, job.params["database"]) == ("u", "p", "AXDB")
+
+
+@pytest.mark.parametrize("change, message", [
+    ({"sites": ""}, "'sites' is required"),
+    ({"sites": "abc"}, "No valid site IDs"),
+    ({"from_date": "2024-13-01"}, "'from_date'"),
+    ({"to_date": None}, "'to_date'"),
+    ({"profile": "huge"}, "Unknown profile"),
+    ({"ip_series": "99"}, "'ip_series'"),
+    ({"archive_format": "rar"}, "Unknown archive format"),
+    ({"compress_level": "9"}, "'compress_level' must be an integer"),
+    ({"compress_level": 42}, "Compression level"),
+])
+def test_invalid_requests_are_rejected(service, change, message):
+    with pytest.raises(ValueError, match=message):
+        service.submit(dict(REQUEST, **change))
+
+
+def test_missing_service_defaults_are_reported(tmp_path):
+    bare = ReportService(str(tmp_path))
+    with pytest.raises(ValueError, match="Missing"):
+        bare.submit(dict(REQUEST))
+
+
+def test_cancel_queued_job(service):
+    job = service.submit(dict(REQUEST))
+    assert service.cancel(job.id)
+    assert job.status == "cancelled"
+
+
+def test_leftover_results_are_cleared(service, tmp_path):
+    for name in ("0123456789ab.zip", "0123456789ab.tar.gz", ".SiteReports-x.zip.part", "notes.zip"):
+        (tmp_path / name).write_text("x")
+    assert service.clear_leftovers() == 3
+    assert os.listdir(tmp_path) == ["notes.zip"]
+
+
+@pytest.fixture
+def server(service):
+    server = make_server(service, "127.0.0.1", 0, token="secret")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _get(url, token=None):
+    request = urllib.request.Request(url)
+    if token:
+        request.add_header("Authorization", f"Bearer {token}")
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_http_requires_the_token(server):
+    assert _get(f"{server}/jobs")[0] == 401
+    assert _get(f"{server}/jobs", token="wrong")[0] == 401
+    assert _get(f"{server}/jobs", token="secret") == (200, {"jobs": []})
+
+
+def test_http_errors(server, service):
+    job = service.submit(dict(REQUEST))
+    assert _get(f"{server}/jobs/nope", token="secret")[0] == 404
+    assert _get(f"{server}/jobs/{job.id}?since=abc", token="secret")[0] == 400
+    assert _get(f"{server}/jobs/{job.id}/result", token="secret")[0] == 409
+    status, data = _get(f"{server}/jobs/{job.id}?since=0", token="secret")
+    assert status == 200 and data["status"] == "queued" and data["log"]
@@ -0,0 +1,93 @@
+import time
+
+from archive import EntryPacker
+from shard import ShardBoard, parse_address
+
+
+def make_board(sites=("1", "2", "3", "4", "5"), shard_size=2, lease_timeout=60.0, max_attempts=3):
+    completed = []
+    board = ShardBoard(list(sites), {"from_date": "2024-05-01"}, shard_size=shard_size, lease_timeout=lease_timeout,
+                       max_attempts=max_attempts, on_complete=lambda reports, failures: completed.append((reports, failures)))
+    return board, completed
+
+
+def test_lease_hands_out_shards_in_order_then_waits_then_ends():
+    board, completed = make_board()
+    assert board.total == 3
+    leases = [board.lease("w1") for _ in range(3)]
+    assert [task["sites"] for task in leases] == [["1", "2"], ["3", "4"], ["5"]]
+    assert leases[0]["job"] == {"from_date": "2024-05-01"}
+    assert board.lease("w2") == {"wait": 1.0}  # Everything is leased
+    for task in leases:
+        assert board.complete("w1", task["shard"], {sid: "ok" for sid in task["sites"]}, {})
+    assert board.done()
+    assert board.lease("w2") is None
+    assert len(completed) == 3
+
+
+def test_heartbeat_only_extends_the_holders_lease():
+    board, _ = make_board()
+    task = board.lease("w1")
+    assert board.heartbeat("w1", task["shard"])
+    assert not board.heartbeat("w2", task["shard"])
+    assert not board.heartbeat("w1", 99)
+
+
+def test_expired_lease_is_reassigned_first():
+    board, _ = make_board(lease_timeout=0.01)
+    first = board.lease("w1")
+    time.sleep(0.02)
+    board.expire()
+    again = board.lease("w2")
+    assert again["shard"] == first["shard"]  # Requeued ahead of untouched shards
+    assert not board.heartbeat("w1", first["shard"])  # The old holder lost it
+
+
+def test_release_worker_requeues_its_shards():
+    board, _ = make_board()
+    first = board.lease("w1")
+    board.lease("w2")
+    board.release_worker("w1")
+    assert board.lease("w3")["shard"] == first["shard"]
+
+
+def test_shard_is_abandoned_after_max_attempts():
+    board, completed = make_board(sites=("1", "2"), lease_timeout=0.0, max_attempts=2)
+    for _ in range(2):
+        board.lease("w")
+        board.expire()
+    assert board.done()
+    reports, failures = completed[-1]
+    assert reports == {} and set(failures) == {"1", "2"}
+    assert "abandoned after 2 attempts" in failures["1"]
+
+
+def test_first_result_wins_but_late_result_replaces_abandonment():
+    board, completed = make_board(sites=("1",), lease_timeout=0.0, max_attempts=1)
+    task = board.lease("w1")
+    board.expire()  # Abandoned
+    assert board.complete("w1", task["shard"], {"1": "report"}, {})  # Late but real
+    assert completed[-1] == ({"1": "report"}, {})
+    assert not board.complete("w2", task["shard"], {"1": "again"}, {})  # Duplicate dropped
+
+
+def test_workers_are_dismissed_once_the_run_is_over():
+    board, _ = make_board(sites=("1",))
+    task = board.lease("w1")
+    assert board.lease("w2") == {"wait": 1.0}
+    board.complete("w1", task["shard"], {"1": "ok"}, {})
+    assert not board.all_dismissed()
+    assert board.lease("w1") is None
+    assert board.lease("w2") is None
+    assert board.all_dismissed()
+
+
+def test_lease_carries_the_packer():
+    packer = EntryPacker("tar.gz", 1)
+    board = ShardBoard(["1"], {}, packer=packer)
+    assert board.lease("w")["packer"] is packer
+
+
+def test_parse_address():
+    assert parse_address("host:50555") == ("host", 50555)
+    assert parse_address(":7") == ("127.0.0.1", 7)